@@ -0,0 +1,92 @@
+"""
+Latency benchmark of the flattened forest predictor (src/flat_forest.py) against sklearn.
+
+Loads the trained forest and the test features written by the pipeline, exports the forest as flat
+arrays, memory-maps them back, checks that predict/predict_proba match sklearn exactly and times
+both predictors at each batch size. Run from the repository root after `dvc repro`:
+
+    python benchmarks/forest_predict.py
+    python benchmarks/forest_predict.py --batch-sizes 1 32 4096 --repeat 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+
+import numpy as np  # noqa: E402
+
+
+def time_call(func, repeat: int) -> dict:
+    """
+    Call func `repeat` times (after one warm-up call) and return the min and median wall time in milliseconds.
+    """
+    func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return {"min_ms": min(samples), "median_ms": statistics.median(samples)}
+
+
+def batch_of(X, size: int):
+    """
+    The first `size` rows of X, repeating X when it has fewer rows.
+    """
+    from scipy import sparse
+
+    if X.shape[0] >= size:
+        return X[:size]
+    return sparse.vstack([X] * (size // X.shape[0] + 1), format="csr")[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="models/random_forest_model.joblib")
+    parser.add_argument("--data-dir", default="reduced_data")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256, 1024, 4096])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    import joblib
+    from feature_store import load_features, split_paths
+    from flat_forest import FlatForest
+
+    model = joblib.load(args.model)
+    X, _ = load_features(*split_paths(args.data_dir, "test"))
+    with tempfile.TemporaryDirectory() as flat_dir:
+        FlatForest.from_sklearn(model).save(flat_dir)
+        flat = FlatForest.load(flat_dir, mmap=True)
+
+        results = {"n_estimators": flat.n_estimators, "n_nodes": int(len(flat.feature)), "batches": {}}
+        for size in args.batch_sizes:
+            batch = batch_of(X, size)
+            exact = (np.array_equal(flat.predict_proba(batch), model.predict_proba(batch))
+                     and np.array_equal(flat.predict(batch), model.predict(batch)))
+            if not exact:
+                raise AssertionError(f"Flat forest predictions differ from sklearn at batch size {size}")
+            sklearn_timing = time_call(lambda: model.predict(batch), args.repeat)
+            flat_timing = time_call(lambda: flat.predict(batch), args.repeat)
+            results["batches"][str(size)] = {
+                "sklearn": sklearn_timing,
+                "flat_forest": flat_timing,
+                "speedup": sklearn_timing["median_ms"] / flat_timing["median_ms"],
+            }
+            print(f"batch {size:>6}: sklearn {sklearn_timing['median_ms']:9.2f} ms  "
+                  f"flat {flat_timing['median_ms']:9.2f} ms  ({results['batches'][str(size)]['speedup']:.1f}x)")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Import-time benchmark for the pipeline modules.
+
+Each module is imported in a fresh interpreter (from a scratch working directory, so the
+log files the modules create do not land in the repository) and the wall time is recorded.
+With --baseline-ref the same measurement is taken for the src/ tree of another git revision,
+which shows the effect of deferring heavy imports.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --baseline-ref HEAD~1 --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ("data_injection", "pre_processing", "feature_engineering", "model", "model_eval")
+
+
+def time_import(module: str, src_dir: str, repeat: int) -> dict:
+    """
+    Import module `repeat` times in fresh interpreters and return the min and median wall time in seconds.
+    """
+    env = dict(os.environ, PYTHONPATH=src_dir)
+    samples = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, "-c", f"import {module}"], cwd=workdir, env=env,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            samples.append(time.perf_counter() - start)
+            if result.returncode != 0:
+                return {"error": result.stderr.strip().splitlines()[-1]}
+    return {"min_s": min(samples), "median_s": statistics.median(samples)}
+
+
+def export_src(ref: str, target_dir: str) -> str:
+    """
+    Extract src/ at the given git revision into target_dir and return the extracted src path.
+    """
+    archive = os.path.join(target_dir, "src.tar")
+    with open(archive, "wb") as f:
+        subprocess.run(["git", "archive", ref, "src"], cwd=REPO_ROOT, stdout=f, check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(target_dir)
+    return os.path.join(target_dir, "src")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline-ref", help="git revision to compare against")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {"current": {m: time_import(m, os.path.join(REPO_ROOT, "src"), args.repeat) for m in MODULES}}
+    if args.baseline_ref:
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline_src = export_src(args.baseline_ref, tmp)
+            results["baseline"] = {m: time_import(m, baseline_src, args.repeat) for m in MODULES}
+
+    print(f"{'module':<22}{'current (s)':>14}" + (f"{'baseline (s)':>15}{'speedup':>10}" if args.baseline_ref else ""))
+    for module in MODULES:
+        current = results["current"][module]
+        line = f"{module:<22}{current.get('median_s', float('nan')):>14.3f}"
+        if args.baseline_ref:
+            baseline = results["baseline"][module]
+            speedup = baseline.get("median_s", float("nan")) / current.get("median_s", float("nan"))
+            line += f"{baseline.get('median_s', float('nan')):>15.3f}{speedup:>9.1f}x"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Localhost load generator for the micro-batching prediction server (src/serving.py).
+
+A fixed number of concurrent clients, each on its own keep-alive connection, send POST /predict
+requests with one text each until the request budget is spent. The client-side latency percentiles
+and throughput are printed together with the server's own /metrics (batch sizes, queue wait).
+
+    python src/serving.py --port 8080 &
+    python benchmarks/load_generator.py --port 8080 --concurrency 64 --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+WORDS = ("good", "bad", "great", "terrible", "product", "service", "delivery", "price", "quality",
+         "love", "hate", "fine", "okay", "slow", "fast", "broken", "works", "again", "never", "recommend")
+
+
+def synthetic_texts(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(5, 30))) for _ in range(count)]
+
+
+def load_texts(path: str, column: str = "text") -> list:
+    """
+    Read request texts from a CSV or Parquet table, e.g. raw_data/test_data.csv.
+    """
+    import pandas as pd
+
+    df = pd.read_parquet(path, columns=[column]) if path.endswith(".parquet") else pd.read_csv(path, usecols=[column])
+    return df[column].dropna().astype(str).tolist()
+
+
+async def _request(reader, writer, host: str, method: str, path: str, payload: dict = None) -> dict:
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    response = json.loads(await reader.readexactly(length))
+    if not status_line.startswith(b"HTTP/1.1 200"):
+        raise RuntimeError(f"{method} {path} failed: {status_line.decode().strip()} {response}")
+    return response
+
+
+async def _client(host: str, port: int, texts: list, budget: list, latencies: list) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while budget[0] > 0:
+            budget[0] -= 1
+            text = texts[budget[0] % len(texts)]
+            start = time.perf_counter()
+            await _request(reader, writer, host, "POST", "/predict", {"text": text})
+            latencies.append((time.perf_counter() - start) * 1000.0)
+    finally:
+        writer.close()
+
+
+async def run_load(host: str, port: int, texts: list, concurrency: int, requests: int) -> dict:
+    latencies = []
+    budget = [requests]
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, texts, budget, latencies) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    server_metrics = await _request(reader, writer, host, "GET", "/metrics")
+    writer.close()
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "requests_per_s": len(latencies) / elapsed,
+        "latency_ms": {"p50": quantiles[49], "p95": quantiles[94], "p99": quantiles[98], "max": latencies[-1]},
+        "server": {
+            "mean_batch_size": server_metrics["mean_batch_size"],
+            "batches": server_metrics["batches"],
+            "queue_wait_p99_ms": server_metrics["queue_wait_ms"]["p99"],
+            "batch_latency_p99_ms": server_metrics["batch_latency_ms"]["p99"],
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--texts", help="CSV/Parquet table with a text column (default: synthetic texts)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.host not in ("127.0.0.1", "localhost", "::1"):
+        parser.error("the load generator only targets localhost")
+    texts = load_texts(args.texts) if args.texts else synthetic_texts(1000)
+    results = asyncio.run(run_load(args.host, args.port, texts, args.concurrency, args.requests))
+
+    print(json.dumps(results, indent=4))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Offline benchmark suite for the pipeline stages on synthetic corpora (benchmarks/synthetic_corpus.py).
+
+For every corpus size the suite generates the corpus, splits it 80/20 and measures, with the
+instrumentation of src/perf.py (wall time, CPU time, peak RSS, rows per second):
+
+    preprocess_data            text normalization (transform_data) and label encoding
+    apply_tfidf_vectorization  TF-IDF fit and transform
+    sparse_write / sparse_read the .npz feature files of vectorized_data/
+    dense_write / dense_read   the legacy dense CSV export, skipped above --dense-limit-mb
+    train_model                forest training with the model_training params
+    evaluate_model             prediction on the test split
+
+Everything runs in a scratch directory without network access; NLTK data is taken from
+resources.nltk_data_dir in params.yaml. Results are written as JSON, and --compare reports the
+change against a stored baseline, exiting with status 1 on a throughput or memory regression.
+
+    python benchmarks/suite.py --sizes 10000 100000 --output benchmarks/baseline.json
+    python benchmarks/suite.py --sizes 10000 100000 --compare benchmarks/baseline.json
+    python benchmarks/suite.py --sizes 1000000 --n-jobs -1 --output results_1m.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "benchmarks"))
+
+import yaml  # noqa: E402
+
+BENCHMARKS = ("preprocess_data", "apply_tfidf_vectorization", "sparse_write", "sparse_read",
+              "dense_write", "dense_read", "train_model", "evaluate_model")
+MEASURES = ("wall_s", "cpu_s", "peak_rss_mb", "rows", "rows_per_s")
+
+
+def measure(name: str, rows: int, func):
+    """
+    Run func under perf.track and return its result and measurements.
+    """
+    import perf
+
+    perf.reset()
+    with perf.track(f"bench:{name}", rows=rows):
+        result = func()
+    section = perf.snapshot()[f"bench:{name}"]
+    return result, {measure_name: section.get(measure_name) for measure_name in MEASURES}
+
+
+def run_size(n_rows: int, params: dict, seed: int, n_jobs: int, dense_limit_mb: float, work_dir: str) -> dict:
+    """
+    Run every benchmark on one corpus size.
+    """
+    import numpy as np
+    import pandas as pd
+    from sklearn.preprocessing import LabelEncoder
+
+    import feature_engineering
+    import model
+    import model_eval
+    import pre_processing
+    from feature_store import load_features
+    from synthetic_corpus import generate_corpus
+
+    feature_params = params['feature_engineering']
+    results = {}
+    corpus, results["generate_corpus"] = measure("generate_corpus", n_rows, lambda: generate_corpus(n_rows, seed))
+    n_train = int(n_rows * 0.8)
+    train_raw, test_raw = corpus.iloc[:n_train], corpus.iloc[n_train:]
+
+    executor = pre_processing.create_executor(n_jobs)
+    try:
+        def preprocess():
+            encoder = LabelEncoder()
+            return (pre_processing.preprocess_data(train_raw, executor=executor, label_encoder=encoder),
+                    pre_processing.preprocess_data(test_raw, executor=executor, label_encoder=encoder))
+        (train_df, test_df), results["preprocess_data"] = measure("preprocess_data", n_rows, preprocess)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    (x_train, x_test, y_train, y_test), results["apply_tfidf_vectorization"] = measure(
+        "apply_tfidf_vectorization", n_rows,
+        lambda: feature_engineering.apply_tfidf_vectorization(train_df, test_df, "text", feature_params['max_features']))
+
+    features_path = os.path.join(work_dir, "x_train_tfidf.npz")
+    labels_path = os.path.join(work_dir, "y_train.npy")
+    _, results["sparse_write"] = measure("sparse_write", n_train,
+                                         lambda: feature_engineering.save_sparse_data(x_train, y_train, features_path, labels_path))
+    _, results["sparse_read"] = measure("sparse_read", n_train, lambda: load_features(features_path, labels_path))
+    results["sparse_write"]["bytes"] = os.path.getsize(features_path)
+
+    dense_mb = x_train.shape[0] * x_train.shape[1] * 8 / 2 ** 20
+    if dense_mb <= dense_limit_mb:
+        dense_path = os.path.join(work_dir, "x_train_tfidf.csv")
+        _, results["dense_write"] = measure("dense_write", n_train,
+                                            lambda: feature_engineering.export_dense_csv(x_train, y_train, dense_path))
+        _, results["dense_read"] = measure("dense_read", n_train, lambda: pd.read_csv(dense_path))
+        results["dense_write"]["bytes"] = os.path.getsize(dense_path)
+    else:
+        skipped = {"skipped": f"dense matrix of {dense_mb:.0f} MB exceeds --dense-limit-mb {dense_limit_mb:.0f}"}
+        results["dense_write"] = results["dense_read"] = skipped
+
+    trained, results["train_model"] = measure(
+        "train_model", n_train, lambda: model.train_model(x_train, y_train, params['model_training'], n_jobs=n_jobs))
+    metrics, results["evaluate_model"] = measure(
+        "evaluate_model", x_test.shape[0],
+        lambda: model_eval.evaluate_model(trained, x_test, y_test, average=params['model_evaluation']['average']))
+    results["accuracy"] = metrics["accuracy"]
+    results["n_features"] = int(x_train.shape[1])
+    results["label_distribution"] = np.bincount(y_train).tolist()
+    return results
+
+
+def environment() -> dict:
+    import numpy as np
+    import pandas as pd
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Print the throughput and peak memory of current against baseline and return the regressions:
+    rows_per_s down by more than tolerance, or peak_rss_mb up by more than tolerance.
+    """
+    regressions = []
+    print(f"{'size':>8}  {'benchmark':<26} {'rows/s':>12} {'baseline':>12} {'change':>8} {'peak MB':>9} {'change':>8}")
+    for size, benchmarks in current["results"].items():
+        for name in BENCHMARKS:
+            now = benchmarks.get(name, {})
+            before = baseline.get("results", {}).get(size, {}).get(name, {})
+            if not now.get("rows_per_s") or not before.get("rows_per_s"):
+                continue
+            speed = now["rows_per_s"] / before["rows_per_s"] - 1.0
+            memory = (now["peak_rss_mb"] / before["peak_rss_mb"] - 1.0
+                      if now.get("peak_rss_mb") and before.get("peak_rss_mb") else 0.0)
+            flag = ""
+            if speed < -tolerance or memory > tolerance:
+                regressions.append({"size": size, "benchmark": name, "throughput_change": speed, "memory_change": memory})
+                flag = "  REGRESSION"
+            print(f"{size:>8}  {name:<26} {now['rows_per_s']:>12.0f} {before['rows_per_s']:>12.0f} {speed:>+8.1%} "
+                  f"{now.get('peak_rss_mb') or 0:>9.0f} {memory:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--params", default=os.path.join(REPO_ROOT, "params.yaml"))
+    parser.add_argument("--n-jobs", type=int, default=1, help="Workers for preprocessing and training (-1: every core)")
+    parser.add_argument("--n-estimators", type=int, help="Override model_training.n_estimators")
+    parser.add_argument("--dense-limit-mb", type=float, default=512.0, help="Skip the dense CSV benchmarks above this size")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --output run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown or memory growth")
+    args = parser.parse_args()
+
+    with open(args.params, "r") as f:
+        params = yaml.safe_load(f)
+    if args.n_estimators:
+        params['model_training']['n_estimators'] = args.n_estimators
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    nltk_data_dir = params.get('resources', {}).get('nltk_data_dir')
+    if nltk_data_dir:
+        nltk_data_dir = os.path.join(os.path.dirname(os.path.abspath(args.params)), nltk_data_dir)
+
+    # The pipeline modules create logs/ in the working directory, so run them in a scratch one
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        import pre_processing
+        pre_processing.configure_normalizer(nltk_data_dir=nltk_data_dir)
+
+        report = {"environment": environment(), "seed": args.seed, "n_jobs": args.n_jobs,
+                  "model_training": params['model_training'],
+                  "max_features": params['feature_engineering']['max_features'], "results": {}}
+        for size in args.sizes:
+            print(f"Benchmarking {size} rows", flush=True)
+            report["results"][str(size)] = run_size(size, params, args.seed, args.n_jobs, args.dense_limit_mb, work_dir)
+            for name in BENCHMARKS:
+                result = report["results"][str(size)][name]
+                if "skipped" in result:
+                    print(f"  {name:<26} skipped")
+                else:
+                    print(f"  {name:<26} {result['wall_s']:8.2f} s  {result['rows_per_s']:12.0f} rows/s  "
+                          f"{result['peak_rss_mb'] or 0:8.0f} MB peak")
+        os.chdir(REPO_ROOT)
+
+    if output:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(report, f, indent=4)
+    if baseline_path:
+        with open(baseline_path, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Deterministic synthetic text/label corpus for the benchmark suite (benchmarks/suite.py).
+
+Word frequencies follow a Zipf-Mandelbrot law over a vocabulary of English stopwords and
+generated pseudo-words with inflected variants (-s, -ed, -ing, ...), so stopword removal and
+stemming do a realistic amount of work. Each label has its own set of mid-frequency signal words,
+so a classifier has something to learn. Documents have log-normally distributed lengths.
+
+Rows are generated in fixed blocks of BLOCK_ROWS, each from its own seeded generator, so the
+output only depends on the seed: a 10k corpus is the first 10k rows of the 1M corpus with the
+same seed. No network access and no input data are needed.
+
+    python benchmarks/synthetic_corpus.py --rows 100000 --output corpus_100k.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+BLOCK_ROWS = 10000
+LABELS = ("negative", "neutral", "positive")
+LABEL_WEIGHTS = (0.31, 0.33, 0.36)
+STOPWORDS = ("the", "i", "and", "to", "a", "of", "it", "is", "in", "my", "this", "that", "for", "you",
+             "was", "with", "but", "on", "have", "be", "so", "not", "are", "just", "me", "at", "all",
+             "they", "its", "if", "or", "what", "can", "do", "about", "an", "from", "your", "some")
+SUFFIXES = ("", "s", "ed", "ing", "er", "ly", "ness")
+ONSETS = ("b", "br", "c", "ch", "d", "dr", "f", "g", "gr", "h", "k", "l", "m", "n", "p", "pl", "r",
+          "s", "sh", "st", "t", "tr", "v", "w")
+VOWELS = ("a", "e", "i", "o", "u", "ai", "ea", "ou")
+CODAS = ("", "", "n", "r", "s", "t", "l", "m", "nd", "rt")
+
+
+def build_vocabulary(size: int = 30000, seed: int = 0) -> np.ndarray:
+    """
+    The stopwords followed by `size` distinct pseudo-words, in frequency rank order.
+    Words are generated as stems plus a suffix, so several ranks share one stem.
+    """
+    rng = np.random.default_rng([seed, 0])
+    words = list(STOPWORDS)
+    seen = set(words)
+    while len(words) < len(STOPWORDS) + size:
+        syllables = rng.integers(1, 4)
+        stem = "".join(ONSETS[rng.integers(len(ONSETS))] + VOWELS[rng.integers(len(VOWELS))]
+                       + CODAS[rng.integers(len(CODAS))] for _ in range(syllables))
+        for suffix in SUFFIXES[:rng.integers(1, len(SUFFIXES) + 1)]:
+            word = stem + suffix
+            if word not in seen and len(words) < len(STOPWORDS) + size:
+                seen.add(word)
+                words.append(word)
+    return np.asarray(words, dtype=object)
+
+
+def zipf_probabilities(size: int, exponent: float = 1.07, shift: float = 2.7) -> np.ndarray:
+    """
+    Zipf-Mandelbrot rank probabilities, p(rank) proportional to 1 / (rank + shift) ** exponent.
+    """
+    weights = 1.0 / (np.arange(1, size + 1) + shift) ** exponent
+    return weights / weights.sum()
+
+
+def _generate_block(block: int, n_rows: int, vocabulary: np.ndarray, cumulative: np.ndarray,
+                    signal_words: np.ndarray, seed: int, mean_tokens: float, signal_share: float) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, block + 1])
+    labels = rng.choice(len(LABELS), size=n_rows, p=LABEL_WEIGHTS)
+    lengths = np.clip(rng.lognormal(np.log(mean_tokens), 0.6, size=n_rows).astype(np.int64), 3, 400)
+    total = int(lengths.sum())
+    tokens = np.searchsorted(cumulative, rng.random(total) * cumulative[-1], side="right")
+    row_of_token = np.repeat(np.arange(n_rows), lengths)
+    is_signal = rng.random(total) < signal_share
+    tokens[is_signal] = signal_words[labels[row_of_token[is_signal]],
+                                     rng.integers(signal_words.shape[1], size=int(is_signal.sum()))]
+    words = vocabulary[tokens]
+    ends = np.cumsum(lengths)
+    texts = [" ".join(words[end - length:end]) for end, length in zip(ends, lengths)]
+    # A little surface noise for the tokenizer: capitalized openings and trailing punctuation
+    punctuation = rng.choice(["", ".", "!", "?", "..."], size=n_rows, p=[0.4, 0.3, 0.15, 0.1, 0.05])
+    texts = [text[:1].upper() + text[1:] + mark for text, mark in zip(texts, punctuation)]
+    return pd.DataFrame({"text": texts, "label": np.asarray(LABELS, dtype=object)[labels]})
+
+
+def iter_corpus(n_rows: int, seed: int = 0, vocabulary_size: int = 30000, mean_tokens: float = 18.0,
+                signal_share: float = 0.15):
+    """
+    Yield the corpus as DataFrames of up to BLOCK_ROWS rows with a text and a label column.
+    """
+    vocabulary = build_vocabulary(vocabulary_size, seed)
+    cumulative = np.cumsum(zipf_probabilities(len(vocabulary)))
+    rng = np.random.default_rng([seed, 0, 1])
+    # Signal words come from the mid-frequency ranks, disjoint between labels
+    candidates = rng.permutation(np.arange(len(STOPWORDS) + 200, len(STOPWORDS) + 5000))
+    signal_words = candidates[:len(LABELS) * 100].reshape(len(LABELS), 100)
+    for block, start in enumerate(range(0, n_rows, BLOCK_ROWS)):
+        yield _generate_block(block, min(BLOCK_ROWS, n_rows - start), vocabulary, cumulative, signal_words,
+                              seed, mean_tokens, signal_share)
+
+
+def generate_corpus(n_rows: int, seed: int = 0, **options) -> pd.DataFrame:
+    """
+    The whole corpus as one DataFrame; see iter_corpus for the options.
+    """
+    return pd.concat(iter_corpus(n_rows, seed, **options), ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="CSV file to write")
+    args = parser.parse_args()
+
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_dir, exist_ok=True)
+    for index, block in enumerate(iter_corpus(args.rows, args.seed)):
+        block.to_csv(args.output, mode="a" if index else "w", header=not index, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Equivalence report and throughput benchmark of the "regex" tokenizer against nltk.word_tokenize.
+
+TextNormalizer keeps only the alphanumeric tokens of nltk.word_tokenize; data_preprocessing.tokenizer
+"regex" extracts them with one compiled regex instead. On a corpus (a CSV with a text column, by
+default the synthetic benchmark corpus) this reports:
+
+    agreement   rows whose token lists are identical, token precision and recall of the regex
+                tokens against the NLTK ones (as multisets per row), and the tokens that differ
+                most often, with example rows
+    throughput  rows per second of the bare tokenizers on lowercased text, and of the whole
+                TextNormalizer (tokenizing, stopword removal and stemming) on the Series
+
+    python benchmarks/tokenizer_equivalence.py --input raw_data/train_data.csv
+    python benchmarks/tokenizer_equivalence.py --rows 100000 --output tokenizer_report.json
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "benchmarks"))
+
+import yaml  # noqa: E402
+
+
+def load_texts(input_path: str, text_column: str, rows: int, seed: int) -> list:
+    """
+    The non-empty texts of the input CSV, or of a synthetic corpus when no input is given.
+    """
+    import pandas as pd
+
+    if input_path:
+        texts = pd.read_csv(input_path, usecols=[text_column], nrows=rows)[text_column]
+    else:
+        from synthetic_corpus import generate_corpus
+        texts = generate_corpus(rows, seed)["text"]
+    return texts.dropna().astype(str).tolist()
+
+
+def agreement(reference: list, candidate: list, texts: list, top: int = 20, examples: int = 5) -> dict:
+    """
+    Token-level agreement of candidate token lists with the reference ones, row by row.
+    """
+    matching_rows = 0
+    common = reference_total = candidate_total = 0
+    missing = collections.Counter()
+    extra = collections.Counter()
+    samples = []
+    for text, expected, found in zip(texts, reference, candidate):
+        if expected == found:
+            matching_rows += 1
+            common += len(expected)
+            reference_total += len(expected)
+            candidate_total += len(found)
+            continue
+        expected_counts = collections.Counter(expected)
+        found_counts = collections.Counter(found)
+        common += sum((expected_counts & found_counts).values())
+        reference_total += len(expected)
+        candidate_total += len(found)
+        missing.update(expected_counts - found_counts)
+        extra.update(found_counts - expected_counts)
+        if len(samples) < examples:
+            samples.append({"text": text[:300], "nltk_only": sorted((expected_counts - found_counts).elements()),
+                            "regex_only": sorted((found_counts - expected_counts).elements())})
+    return {
+        "rows": len(texts),
+        "matching_rows": matching_rows,
+        "row_agreement": matching_rows / len(texts) if texts else None,
+        "nltk_tokens": reference_total,
+        "regex_tokens": candidate_total,
+        "precision": common / candidate_total if candidate_total else None,
+        "recall": common / reference_total if reference_total else None,
+        "nltk_only": missing.most_common(top),
+        "regex_only": extra.most_common(top),
+        "examples": samples,
+    }
+
+
+def _rate(rows: int, func):
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    return result, {"wall_s": seconds, "rows_per_s": rows / seconds if seconds > 0 else None}
+
+
+def run(texts: list, nltk_data_dir: str = None) -> dict:
+    """
+    Tokenize the texts both ways, compare the tokens and time both tokenizers and normalizers.
+    """
+    import nltk
+    import pandas as pd
+
+    import pre_processing
+
+    # Building the normalizer verifies (and points NLTK at) the pinned data
+    nltk_normalizer = pre_processing.TextNormalizer(nltk_data_dir=nltk_data_dir)
+    regex_normalizer = pre_processing.TextNormalizer(nltk_data_dir=nltk_data_dir, tokenizer="regex")
+    lowered = [text.lower() for text in texts]
+
+    reference, nltk_tokenize = _rate(len(texts), lambda: [
+        [token for token in nltk.word_tokenize(text) if token.isalnum()] for text in lowered])
+    candidate, regex_tokenize = _rate(len(texts), lambda: [pre_processing.regex_tokenize(text) for text in lowered])
+
+    series = pd.Series(texts, dtype=object)
+    nltk_cleaned, nltk_normalize = _rate(len(texts), lambda: nltk_normalizer.transform_many(series))
+    regex_cleaned, regex_normalize = _rate(len(texts), lambda: regex_normalizer.transform_many(series))
+
+    return {
+        "agreement": agreement(reference, candidate, texts),
+        "cleaned_row_agreement": float((nltk_cleaned.values == regex_cleaned.values).mean()) if texts else None,
+        "throughput": {
+            "tokenize": {"nltk": nltk_tokenize, "regex": regex_tokenize,
+                         "speedup": nltk_tokenize["wall_s"] / regex_tokenize["wall_s"]},
+            "normalize": {"nltk": nltk_normalize, "regex": regex_normalize,
+                          "speedup": nltk_normalize["wall_s"] / regex_normalize["wall_s"]},
+        },
+        "fingerprints": {"nltk": nltk_normalizer.fingerprint, "regex": regex_normalizer.fingerprint},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="CSV file with a text column (default: synthetic corpus)")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--rows", type=int, default=50000, help="Rows to read or generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--params", default=os.path.join(REPO_ROOT, "params.yaml"))
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    with open(args.params, "r") as f:
+        params = yaml.safe_load(f)
+    nltk_data_dir = params.get('resources', {}).get('nltk_data_dir')
+    if nltk_data_dir:
+        nltk_data_dir = os.path.join(os.path.dirname(os.path.abspath(args.params)), nltk_data_dir)
+
+    input_path = os.path.abspath(args.input) if args.input else None
+    texts = load_texts(input_path, args.text_column, args.rows, args.seed)
+    # The pipeline modules create logs/ in the working directory, so run them in a scratch one
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        report = run(texts, nltk_data_dir)
+        os.chdir(REPO_ROOT)
+    report["input"] = input_path or f"synthetic corpus, seed {args.seed}"
+
+    result = report["agreement"]
+    print(f"Rows: {result['rows']}, identical token lists: {result['matching_rows']} ({result['row_agreement']:.4%})")
+    print(f"Token precision {result['precision']:.6f}, recall {result['recall']:.6f}; "
+          f"cleaned rows identical: {report['cleaned_row_agreement']:.4%}")
+    for side in ("nltk_only", "regex_only"):
+        if result[side]:
+            print(f"Most frequent {side} tokens: " + ", ".join(f"{token} ({count})" for token, count in result[side][:10]))
+    for name, timing in report["throughput"].items():
+        print(f"{name:<10} nltk {timing['nltk']['rows_per_s']:>10.0f} rows/s  regex {timing['regex']['rows_per_s']:>10.0f} rows/s  "
+              f"{timing['speedup']:.1f}x")
+
+    if args.output:
+        output = os.path.abspath(args.output)
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Comparison of the model_training trainer backends on a synthetic corpus (benchmarks/synthetic_corpus.py).
+
+The corpus is normalized, split 80/20 and TF-IDF vectorized once with the params.yaml settings;
+then every trainer (the random forest and the sparse linear models sgd, logistic_regression and
+linear_svm, with their model_training parameters) is trained on the same CSR matrix and reports:
+
+    train_s            training wall time, under the perf.py instrumentation (also cpu_s, peak_rss_mb)
+    predict_rows_per_s predict throughput on the whole test split
+    single_row_ms      min and median latency of predicting one row, the serving case
+    accuracy           accuracy on the test split
+    model_mb           size of the pickled model
+
+sgd_out_of_core trains sgd with partial_fit over --shards row shards of the training matrix, as
+model_training does on sharded features (training.out_of_core, training.epochs).
+
+    python benchmarks/trainers.py --rows 100000
+    python benchmarks/trainers.py --rows 20000 --trainers random_forest sgd --n-estimators 50 --output trainers.json
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "benchmarks"))
+
+import yaml  # noqa: E402
+
+TRAINERS = ("random_forest", "sgd", "sgd_out_of_core", "logistic_regression", "linear_svm")
+
+
+def build_features(n_rows: int, params: dict, seed: int, n_jobs: int, nltk_data_dir: str = None) -> tuple:
+    """
+    Normalize, split and vectorize a synthetic corpus like the pipeline stages do.
+    """
+    from sklearn.preprocessing import LabelEncoder
+
+    import feature_engineering
+    import pre_processing
+    from synthetic_corpus import generate_corpus
+
+    corpus = generate_corpus(n_rows, seed)
+    n_train = int(n_rows * 0.8)
+    train_raw, test_raw = corpus.iloc[:n_train], corpus.iloc[n_train:]
+    pre_processing.configure_normalizer(nltk_data_dir=nltk_data_dir,
+                                        tokenizer=params['data_preprocessing'].get('tokenizer', "nltk"))
+    executor = pre_processing.create_executor(n_jobs)
+    try:
+        encoder = LabelEncoder()
+        train_df = pre_processing.preprocess_data(train_raw, executor=executor, label_encoder=encoder)
+        test_df = pre_processing.preprocess_data(test_raw, executor=executor, label_encoder=encoder)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    feature_params = params['feature_engineering']
+    return feature_engineering.apply_tfidf_vectorization(train_df, test_df, "text", feature_params['max_features'])
+
+
+def _model_mb(trained) -> float:
+    import joblib
+
+    buffer = io.BytesIO()
+    joblib.dump(trained, buffer)
+    return buffer.tell() / 2 ** 20
+
+
+def single_row_latency(trained, X, repeat: int) -> dict:
+    """
+    Min and median wall time in milliseconds of predicting one row, cycling through the rows of X.
+    """
+    trained.predict(X[:1])
+    samples = []
+    for index in range(repeat):
+        row = X[index % X.shape[0]]
+        start = time.perf_counter()
+        trained.predict(row)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return {"min_ms": min(samples), "median_ms": statistics.median(samples)}
+
+
+def run_trainer(name: str, features: tuple, training_params: dict, n_jobs: int, shards: int, epochs: int,
+                repeat: int) -> dict:
+    """
+    Train one trainer on the features and measure it.
+    """
+    import numpy as np
+
+    import model
+    import perf
+    from sklearn.metrics import accuracy_score
+
+    x_train, x_test, y_train, y_test = features
+    perf.reset()
+    with perf.track("bench:train", rows=x_train.shape[0]):
+        if name == "sgd_out_of_core":
+            bounds = np.linspace(0, x_train.shape[0], shards + 1).astype(int)
+            batches = lambda: ((x_train[start:stop], y_train[start:stop]) for start, stop in zip(bounds[:-1], bounds[1:]))
+            trained = model.train_out_of_core(batches, np.unique(y_train), dict(training_params, trainer="sgd"),
+                                              n_jobs=n_jobs, epochs=epochs)
+        else:
+            trained = model.train_model(x_train, y_train, dict(training_params, trainer=name), n_jobs=n_jobs)
+    train = perf.snapshot()["bench:train"]
+
+    start = time.perf_counter()
+    y_pred = trained.predict(x_test)
+    predict_s = time.perf_counter() - start
+    return {
+        "estimator": type(trained).__name__,
+        "train_s": train["wall_s"],
+        "train_cpu_s": train["cpu_s"],
+        "train_peak_rss_mb": train["peak_rss_mb"],
+        "predict_s": predict_s,
+        "predict_rows_per_s": x_test.shape[0] / predict_s if predict_s > 0 else None,
+        "single_row_ms": single_row_latency(trained, x_test, repeat),
+        "accuracy": float(accuracy_score(y_test, y_pred)),
+        "model_mb": _model_mb(trained),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000, help="Rows of the synthetic corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trainers", nargs="+", choices=TRAINERS, default=list(TRAINERS))
+    parser.add_argument("--params", default=os.path.join(REPO_ROOT, "params.yaml"))
+    parser.add_argument("--n-jobs", type=int, default=1, help="Workers for preprocessing and training (-1: every core)")
+    parser.add_argument("--n-estimators", type=int, help="Override model_training.n_estimators")
+    parser.add_argument("--shards", type=int, default=8, help="Training shards of sgd_out_of_core")
+    parser.add_argument("--epochs", type=int, help="Passes of sgd_out_of_core (default: training.epochs)")
+    parser.add_argument("--repeat", type=int, default=200, help="Single-row predictions per trainer")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    with open(args.params, "r") as f:
+        params = yaml.safe_load(f)
+    nltk_data_dir = params.get('resources', {}).get('nltk_data_dir')
+    if nltk_data_dir:
+        nltk_data_dir = os.path.join(os.path.dirname(os.path.abspath(args.params)), nltk_data_dir)
+    training_params = dict(params['model_training'])
+    if args.n_estimators:
+        training_params['n_estimators'] = args.n_estimators
+    epochs = args.epochs or params.get('training', {}).get('epochs', 5)
+
+    results = {"rows": args.rows, "seed": args.seed, "trainers": {}}
+    # The pipeline modules create logs/ in the working directory, so run them in a scratch one
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        features = build_features(args.rows, params, args.seed, args.n_jobs, nltk_data_dir)
+        results["n_features"] = int(features[0].shape[1])
+        for name in args.trainers:
+            results["trainers"][name] = run_trainer(name, features, training_params, args.n_jobs, args.shards,
+                                                    epochs, args.repeat)
+        os.chdir(REPO_ROOT)
+
+    forest = results["trainers"].get("random_forest")
+    print(f"{'trainer':<22}{'train s':>10}{'predict rows/s':>16}{'1-row ms':>10}{'accuracy':>10}{'model MB':>10}")
+    for name, result in results["trainers"].items():
+        line = (f"{name:<22}{result['train_s']:>10.2f}{result['predict_rows_per_s']:>16.0f}"
+                f"{result['single_row_ms']['median_ms']:>10.3f}{result['accuracy']:>10.4f}{result['model_mb']:>10.2f}")
+        if forest and name != "random_forest":
+            line += f"  ({forest['train_s'] / result['train_s']:.1f}x faster to train, accuracy {result['accuracy'] - forest['accuracy']:+.4f})"
+        print(line)
+
+    if args.output:
+        output = os.path.abspath(args.output)
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import argparse
+import logging
+import os
+import queue
+import threading
+import time
+import pandas as pd
+import yaml
+
+from concurrent.futures import Executor
+from pre_processing import configure_normalizer, create_executor, transform_series
+from tabular_io import TableAppender, iter_table
+
+logs_dir = "logs"
+os.makedirs(logs_dir, exist_ok=True)
+log_file = os.path.join(logs_dir, "batch_scoring.log")
+logger = logging.getLogger("batch_scoring")
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.INFO)
+
+file_handler = logging.FileHandler(log_file)
+file_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+logger.addHandler(file_handler)
+
+_DONE = object()
+# Rows sent to a normalization worker at a time
+WORKER_CHUNK_SIZE = 2000
+
+
+def score_chunk(bundle, chunk: pd.DataFrame, text_column: str = "text", executor: Executor = None) -> pd.DataFrame:
+    """
+    Score one chunk of raw posts: the input columns plus predicted_label and one proba_<label> column per class.
+    With a process pool from create_scoring_executor the text normalization is spread over its workers.
+    """
+    texts = chunk[text_column].fillna("").astype(str)
+    if executor is None:
+        probabilities = bundle.predict_proba_texts(texts.tolist())
+    else:
+        from inference import model_proba
+        cleaned = transform_series(texts, executor=executor, chunk_size=WORKER_CHUNK_SIZE)
+        probabilities = model_proba(bundle.model, bundle.vectorizer.transform(cleaned.tolist()))
+    labels = bundle.proba_classes
+    scored = chunk.reset_index(drop=True)
+    scored["predicted_label"] = labels[probabilities.argmax(axis=1)]
+    for column, label in enumerate(labels):
+        scored[f"proba_{label}"] = probabilities[:, column]
+    return scored
+
+
+class _Stage(threading.Thread):
+    """
+    Pipeline thread that records its failure, so the caller can stop the other stages and re-raise it.
+    """
+
+    def __init__(self, name: str, target, failed: threading.Event):
+        super().__init__(name=name, daemon=True)
+        self._target_func = target
+        self.failed = failed
+        self.error = None
+
+    def run(self) -> None:
+        try:
+            self._target_func()
+        except BaseException as e:
+            self.error = e
+            self.failed.set()
+
+
+def create_scoring_executor(bundle, n_jobs: int, nltk_data_dir: str = None):
+    """
+    Process pool whose workers normalize text exactly like the bundle's normalizer, or None when n_jobs is 1.
+    """
+    if n_jobs is None or n_jobs == 1:
+        return None
+    configure_normalizer(language=bundle.normalizer.language, nltk_data_dir=nltk_data_dir,
+                         tokenizer=bundle.normalizer.tokenizer)
+    return create_executor(n_jobs)
+
+
+def _put(q: queue.Queue, item, failed: threading.Event) -> bool:
+    """
+    Put with backpressure, giving up when another stage has failed.
+    """
+    while not failed.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, failed: threading.Event):
+    while not failed.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def score_file(bundle, input_path: str, output_path: str, text_column: str = "text", chunk_size: int = 50000,
+               queue_depth: int = 2, executor: Executor = None, report_every: float = 10.0) -> dict:
+    """
+    Stream a CSV/Parquet file of raw posts through the inference bundle and append the scored rows to output_path.
+    Reading, scoring and writing run in three threads connected by bounded queues, so at most
+    about 2 * queue_depth + 3 chunks are in memory at any time.
+
+    Args:
+        bundle (InferenceBundle): The loaded bundle.
+        input_path (str): CSV or Parquet input with a text column.
+        output_path (str): CSV or Parquet output; the format follows the extension.
+        text_column (str): Name of the column holding the raw text.
+        chunk_size (int): Rows per chunk.
+        queue_depth (int): Chunks buffered between two stages.
+        executor (Executor): Optional process pool from create_scoring_executor for text normalization.
+        report_every (float): Seconds between progress log lines.
+    Returns:
+        dict: Rows scored, elapsed seconds and rows per second.
+    """
+    try:
+        logger.info(f"Scoring {input_path} in chunks of {chunk_size} rows into {output_path}")
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        read_queue = queue.Queue(maxsize=queue_depth)
+        write_queue = queue.Queue(maxsize=queue_depth)
+        failed = threading.Event()
+        progress = {"rows": 0, "score_s": 0.0}
+        start = time.perf_counter()
+
+        def read():
+            for chunk in iter_table(input_path, chunk_size=chunk_size):
+                if not _put(read_queue, chunk, failed):
+                    return
+            _put(read_queue, _DONE, failed)
+
+        def score():
+            while True:
+                chunk = _get(read_queue, failed)
+                if chunk is _DONE:
+                    break
+                chunk_start = time.perf_counter()
+                scored = score_chunk(bundle, chunk, text_column, executor=executor)
+                progress["score_s"] += time.perf_counter() - chunk_start
+                if not _put(write_queue, scored, failed):
+                    return
+            _put(write_queue, _DONE, failed)
+
+        def write():
+            last_report = time.perf_counter()
+            with TableAppender(output_path) as appender:
+                while True:
+                    scored = _get(write_queue, failed)
+                    if scored is _DONE:
+                        break
+                    appender.append(scored)
+                    progress["rows"] += len(scored)
+                    now = time.perf_counter()
+                    if now - last_report >= report_every:
+                        logger.info(f"Scored {progress['rows']} rows ({progress['rows'] / (now - start):.0f} rows/s)")
+                        last_report = now
+
+        stages = [_Stage("reader", read, failed), _Stage("scorer", score, failed), _Stage("writer", write, failed)]
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+        for stage in stages:
+            if stage.error is not None:
+                raise stage.error
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "rows": progress["rows"],
+            "elapsed_s": elapsed,
+            "rows_per_s": progress["rows"] / elapsed if elapsed else 0.0,
+            "scoring_s": progress["score_s"],
+        }
+        logger.info(f"Scored {stats['rows']} rows in {elapsed:.1f}s ({stats['rows_per_s']:.0f} rows/s, "
+                    f"{progress['score_s']:.1f}s spent scoring)")
+        return stats
+    except Exception as e:
+        logger.error(f"Error scoring {input_path}. Error: {e}")
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a large CSV/Parquet file of raw posts with the inference bundle.")
+    parser.add_argument("input", help="CSV or Parquet file with a text column")
+    parser.add_argument("output", help="CSV or Parquet file for the scored rows")
+    parser.add_argument("--params", default="params.yaml", help="Path to params.yaml")
+    parser.add_argument("--bundle", help="Inference bundle directory (default: models/inference_bundle)")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--queue-depth", type=int, default=2, help="Chunks buffered between pipeline stages")
+    parser.add_argument("--n-jobs", type=int, default=1, help="Worker processes for text normalization (-1: every core)")
+    args = parser.parse_args()
+
+    with open(args.params, 'r') as f:
+        params = yaml.safe_load(f)
+
+    from inference import BUNDLE_DIR, load_bundle
+
+    nltk_data_dir = params.get('resources', {}).get('nltk_data_dir')
+    bundle = load_bundle(args.bundle or BUNDLE_DIR, nltk_data_dir=nltk_data_dir)
+    executor = create_scoring_executor(bundle, args.n_jobs, nltk_data_dir)
+    try:
+        score_file(bundle, args.input, args.output, text_column=args.text_column,
+                   chunk_size=args.chunk_size, queue_depth=args.queue_depth, executor=executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import argparse
+import logging
+import os
+import shutil
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import yaml
+
+from feature_store import open_shared_matrix, save_shared_matrix
+from tabular_io import CLEANED_DTYPES, read_table, table_path
+
+logs_dir = "logs"
+os.makedirs(logs_dir, exist_ok=True)
+log_file = os.path.join(logs_dir, "cross_validation.log")
+logger = logging.getLogger("cross_validation")
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.INFO)
+
+file_handler = logging.FileHandler(log_file)
+file_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+logger.addHandler(file_handler)
+
+SCORES = ("accuracy", "precision", "recall")
+
+
+def load_labelled_data(params: dict, include_test: bool = True) -> pd.DataFrame:
+    """
+    The cleaned training data, followed by the cleaned test data when include_test is set.
+    """
+    fmt = params.get('storage', {}).get('format', 'csv')
+    columns = [params['feature_engineering']['text_column'], "label"]
+    stems = ["train_data_cleaned", "test_data_cleaned"] if include_test else ["train_data_cleaned"]
+    frames = [read_table(table_path("cleaned_data", stem, fmt), columns=columns, dtypes=CLEANED_DTYPES) for stem in stems]
+    return pd.concat(frames, ignore_index=True)
+
+
+def build_count_matrix(texts, feature_params: dict):
+    """
+    Raw term counts of every document, before any vocabulary selection or IDF weighting.
+
+    Counts only depend on the document itself, so this matrix is computed once for all folds; the
+    statistics that look across documents are learned per fold by fold_features. In tfidf mode
+    the columns are every term of the corpus in the order TfidfVectorizer would sort them; in
+    hashing mode they are the hash buckets of build_hashing_vectorizer.
+    """
+    if feature_params.get('vectorizer', 'tfidf') == 'hashing':
+        from feature_engineering import build_hashing_vectorizer
+        return build_hashing_vectorizer(feature_params['n_features']).transform(texts)
+    from sklearn.feature_extraction.text import CountVectorizer
+    return CountVectorizer().fit_transform(texts)
+
+
+def select_vocabulary(train_counts, max_features: int = None) -> np.ndarray:
+    """
+    Columns TfidfVectorizer(max_features=max_features) would keep when fitted on these documents:
+    the terms that occur in them, limited to the max_features most frequent ones.
+    """
+    train_counts = train_counts.tocsr()
+    document_frequency = np.bincount(train_counts.indices, minlength=train_counts.shape[1])
+    terms = np.flatnonzero(document_frequency)
+    if max_features is None or len(terms) <= max_features:
+        return terms
+    term_frequency = np.bincount(train_counts.indices, weights=train_counts.data, minlength=train_counts.shape[1])
+    # Same integer sort as sklearn's _limit_features, so ties are broken the same way
+    keep = (-term_frequency[terms].astype(np.int64)).argsort()[:max_features]
+    return np.sort(terms[keep])
+
+
+def fold_features(counts, train_index: np.ndarray, test_index: np.ndarray, feature_params: dict) -> tuple:
+    """
+    TF-IDF features of one fold, with the vocabulary and IDF fitted on the fold's training rows only.
+    """
+    from sklearn.feature_extraction.text import TfidfTransformer
+
+    train_counts = counts[train_index].astype(np.float64)
+    test_counts = counts[test_index].astype(np.float64)
+    if feature_params.get('vectorizer', 'tfidf') != 'hashing':
+        vocabulary = select_vocabulary(train_counts, feature_params['max_features'])
+        train_counts = train_counts[:, vocabulary]
+        test_counts = test_counts[:, vocabulary]
+    transformer = TfidfTransformer().fit(train_counts)
+    return transformer.transform(train_counts).tocsr(), transformer.transform(test_counts).tocsr()
+
+
+def split_folds(labels: np.ndarray, n_splits: int, stratified: bool = True, shuffle: bool = True,
+                random_state: int = None) -> list:
+    """
+    (train_index, test_index) pairs of a StratifiedKFold or KFold split.
+    """
+    from sklearn.model_selection import KFold, StratifiedKFold
+
+    splitter_class = StratifiedKFold if stratified else KFold
+    splitter = splitter_class(n_splits=n_splits, shuffle=shuffle, random_state=random_state if shuffle else None)
+    return list(splitter.split(np.zeros(len(labels)), labels))
+
+
+def run_fold(fold: int, data_dir: str, train_index: np.ndarray, test_index: np.ndarray, feature_params: dict,
+             model_params: dict, average: str) -> dict:
+    """
+    Vectorize, train and evaluate one fold in a worker process, reading the memory-mapped counts.
+    """
+    import model
+    import model_eval
+
+    start = time.perf_counter()
+    counts = open_shared_matrix(data_dir, "counts")
+    labels = np.load(os.path.join(data_dir, "labels.npy"), mmap_mode="r")
+    x_train, x_test = fold_features(counts, train_index, test_index, feature_params)
+    # Folds already run in parallel, so every trainer builds its trees on one core
+    trained = model.train_model(x_train, labels[train_index], model_params, n_jobs=1)
+    metrics = model_eval.evaluate_model(trained, x_test, labels[test_index], average=average)
+    metrics.pop("classification_report", None)
+    metrics.update(fold=fold, n_features=int(x_train.shape[1]), train_rows=len(train_index),
+                   test_rows=len(test_index), seconds=time.perf_counter() - start)
+    return metrics
+
+
+def summarize_folds(folds: list) -> dict:
+    """
+    Mean and standard deviation of every score over the folds.
+    """
+    summary = {}
+    for score in SCORES:
+        values = [fold[score] for fold in folds]
+        summary[f"mean_{score}"] = statistics.fmean(values)
+        summary[f"std_{score}"] = statistics.stdev(values) if len(values) > 1 else 0.0
+    return summary
+
+
+def cross_validate(params: dict) -> dict:
+    """
+    k-fold cross-validation of the feature engineering and model parameters in params.
+
+    The term counts of all labelled documents are computed once and written to
+    cross_validation.work_dir as a memory-mapped sparse matrix. Every fold then runs in its own
+    worker process, which maps the shared counts read-only, fits the vocabulary and IDF on its
+    training rows, trains the model and scores the held-out rows.
+
+    Args:
+        params (dict): The contents of params.yaml, including the cross_validation section.
+    Returns:
+        dict: The per-fold metrics under "folds" and their mean and standard deviation under "summary".
+    """
+    try:
+        cv_params = params['cross_validation']
+        feature_params = params['feature_engineering']
+        work_dir = cv_params.get('work_dir', "cache/cross_validation")
+        n_jobs = cv_params.get('n_jobs', -1)
+        if n_jobs is None or n_jobs < 0:
+            n_jobs = os.cpu_count() or 1
+
+        data = load_labelled_data(params, include_test=cv_params.get('include_test', True))
+        labels = data["label"].to_numpy()
+        folds = split_folds(labels, cv_params['n_splits'], stratified=cv_params.get('stratified', True),
+                            shuffle=cv_params.get('shuffle', True), random_state=cv_params.get('random_state'))
+        logger.info(f"Cross-validating on {len(data)} rows with {len(folds)} folds and {min(n_jobs, len(folds))} workers")
+
+        data_dir = os.path.join(work_dir, "data")
+        shutil.rmtree(data_dir, ignore_errors=True)
+        counts = build_count_matrix(data[feature_params['text_column']].fillna('').values, feature_params)
+        save_shared_matrix(counts, data_dir, "counts", layout="csr")
+        np.save(os.path.join(data_dir, "labels.npy"), labels)
+        logger.debug(f"Count matrix of shape {counts.shape} with {counts.nnz} non-zero entries written to {data_dir}")
+        del counts, data
+
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(folds))) as executor:
+            futures = [
+                executor.submit(run_fold, fold, data_dir, train_index, test_index, feature_params,
+                                params['model_training'], params['model_evaluation']['average'])
+                for fold, (train_index, test_index) in enumerate(folds)
+            ]
+            fold_metrics = [future.result() for future in futures]
+        for metrics in fold_metrics:
+            logger.info(f"Fold {metrics['fold']}: accuracy {metrics['accuracy']:.4f}, precision {metrics['precision']:.4f}, "
+                        f"recall {metrics['recall']:.4f} ({metrics['seconds']:.1f}s)")
+
+        summary = summarize_folds(fold_metrics)
+        logger.info(f"Mean accuracy {summary['mean_accuracy']:.4f} +/- {summary['std_accuracy']:.4f}")
+        return {"n_splits": len(folds), "stratified": cv_params.get('stratified', True), "summary": summary, "folds": fold_metrics}
+    except Exception as e:
+        logger.error(f"Error during cross-validation. Error: {e}")
+        raise
+
+
+def log_cross_validation(results: dict, params: dict, live_dir: str) -> None:
+    """
+    Log every fold as one dvclive step, followed by the aggregate scores.
+    """
+    from dvclive import Live
+    import model_eval
+
+    with Live(dir=live_dir, save_dvc_exp=False, dvcyaml=False) as live:
+        for metrics in results["folds"]:
+            model_eval.log_to_live(live, metrics, params['model_training'], params['feature_engineering'])
+            live.next_step()
+        live.log_params({"n_splits": results["n_splits"], "stratified": results["stratified"]})
+        for name, value in results["summary"].items():
+            live.log_metric(f"cv/{name}", value, plot=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="k-fold cross-validation of the pipeline parameters.")
+    parser.add_argument("--params", default="params.yaml", help="Path to params.yaml")
+    parser.add_argument("--output", default="metrics/cv_metrics.json", help="Where to write the fold metrics")
+    args = parser.parse_args()
+
+    with open(args.params, 'r') as f:
+        params = yaml.safe_load(f)
+    results = cross_validate(params)
+
+    import model_eval
+    model_eval.save_metrics_to_json(results, args.output)
+    log_cross_validation(results, params, os.path.join(params['cross_validation'].get('work_dir', "cache/cross_validation"), "dvclive"))
+
+
+if __name__ == "__main__":
+    main()
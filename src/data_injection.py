@@ -1,8 +1,13 @@
 import logging 
 import pandas as pd
 import os
+import json
 import yaml
-from sklearn.model_selection import train_test_split
+import numpy as np
+import perf
+from dedup import Deduplicator
+from data_source import resolve_source
+from tabular_io import TableAppender, table_path, write_table
 
 logs_dir = "logs"
 os.makedirs(logs_dir, exist_ok=True)
@@ -27,19 +32,22 @@ logger.addHandler(file_handler)
 
 
 
-def data_save (url: str) -> pd.DataFrame:
+@perf.timed(rows=len)
+def data_save (url: str, cache_dir: str = "cache/sources") -> pd.DataFrame:
     """
     Inject data from a CSV file into a pandas DataFrame.
 
     Args:
-        file_path (str): The path to the CSV file.
+        url (str): An http(s) URL, a file:// URL or a local path to the CSV file.
+            Remote files are served from the local download cache when unchanged.
+        cache_dir (str): Directory of the download cache.
     Returns:
         pd.DataFrame: The DataFrame containing the injected data.   
         https://raw.githubusercontent.com/Sanket22g/dataset/refs/heads/main/reddit_artist_posts_sentiment.csv    
     """
     try:
         logger.info(f"Starting data injection from URL: {url}")
-        df = pd.read_csv(url)
+        df = pd.read_csv(resolve_source(url, cache_dir))
         logger.debug(f"Data injection completed successfully. Number of records: {len(df)} from {url} ")
         return df
     except pd.errors.ParserError as pw:
@@ -62,45 +70,243 @@ def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
         logger.error(f"Error during data preprocessing. Error: {e}")
         raise
 
-def save_data_to_csv(train_data: pd.DataFrame, test_data: pd.DataFrame, path:str) -> None:
+DEDUP_REPORT_PATH = "metrics/dedup.json"
+SPLIT_MODES = ("random", "hash")
+
+
+def hash_split(df: pd.DataFrame, key_columns: list, test_size: float, random_state: int = None) -> np.ndarray:
+    """
+    Assign rows to the test split from a stable hash of their key columns, independently of every other row.
+    A row keeps its split when rows are added, removed or reordered, and rows with equal keys (e.g. reposts
+    of one text) always land on the same side. Each row goes to test with probability test_size, so the
+    split is stratified only in expectation: every label is split in the test_size proportion up to
+    sampling noise, which log_split_balance reports and warns about. Exact per-label proportions would
+    need each row's split to depend on the other rows of its label, losing the stability above.
+
+    Args:
+        df (pd.DataFrame): The rows to assign.
+        key_columns (list): The columns that identify a row.
+        test_size (float): The test share.
+        random_state (int): Salt of the hash; a different value gives a different, equally stable split.
+    Returns:
+        np.ndarray: True for the rows of the test split.
+    """
+    hash_key = f"{random_state or 0:016d}"[-16:]
+    hashes = pd.util.hash_pandas_object(df[list(key_columns)], index=False, hash_key=hash_key).to_numpy()
+    # The top 53 bits as a uniform float in [0, 1)
+    return (hashes >> np.uint64(11)).astype(np.float64) / float(2 ** 53) < test_size
+
+
+def log_split_balance(train_counts: pd.Series, test_counts: pd.Series, test_size: float, tolerance: float = None) -> dict:
     """
-    Save the training and testing DataFrames to CSV files.
+    Log the test share of every label, which hash splits only match test_size in expectation, and warn
+    about the labels whose share is further than tolerance from test_size.
+
+    Args:
+        train_counts (pd.Series): Rows per label in the training split (value_counts).
+        test_counts (pd.Series): Rows per label in the testing split.
+        test_size (float): The target test share.
+        tolerance (float): Allowed absolute difference between a label's test share and test_size; None never warns.
+    Returns:
+        dict: label -> share of its rows in the test split.
+    """
+    shares = {}
+    for label in sorted(train_counts.index.union(test_counts.index), key=str):
+        n_test = int(test_counts.get(label, 0))
+        n_total = n_test + int(train_counts.get(label, 0))
+        if n_total:
+            shares[str(label)] = n_test / n_total
+    logger.info("Test share per label (target %.3f): %s", test_size,
+                ", ".join(f"{label} {share:.3f}" for label, share in shares.items()))
+    skewed = {label: share for label, share in shares.items() if tolerance is not None and abs(share - test_size) > tolerance}
+    if skewed:
+        logger.warning("Test share of %s differs from test_size %.3f by more than split_tolerance %.3f; the hash split "
+                       "is only stratified in expectation, so small labels need more rows or a larger tolerance",
+                       ", ".join(f"{label} ({share:.3f})" for label, share in skewed.items()), test_size, tolerance)
+    return shares
+
+
+def create_deduplicator(dedup_params: dict) -> Deduplicator:
+    """
+    Build the near-duplicate filter from the data_injection.dedup params, or None when it is disabled.
+    """
+    if not dedup_params or not dedup_params.get('enabled', False):
+        return None
+    return Deduplicator(threshold=dedup_params.get('threshold', 0.85), num_perm=dedup_params.get('num_perm', 128),
+                        shingle_size=dedup_params.get('shingle_size', 5), seed=dedup_params.get('seed', 1))
+
+
+@perf.timed(rows="df")
+def remove_duplicates(df: pd.DataFrame, deduplicator: Deduplicator, text_column: str = "text") -> pd.DataFrame:
+    """
+    Drop the rows whose text is an exact or near duplicate of an earlier row, keeping the first occurrence.
+    The deduplicator keeps its index between calls, so chunks of a stream are checked against every earlier chunk.
+
+    Args:
+        df (pd.DataFrame): The rows to check, after dropna.
+        deduplicator (Deduplicator): The filter from create_deduplicator.
+        text_column (str): The column holding the text.
+    Returns:
+        pd.DataFrame: The rows that are kept.
+    """
+    try:
+        keep = deduplicator.filter(df[text_column])
+        logger.debug(f"Removed {int((~keep).sum())} duplicate rows out of {len(df)}")
+        return df[keep]
+    except Exception as e:
+        logger.error(f"Error during duplicate removal. Error: {e}")
+        raise
+
+
+def save_dedup_report(deduplicator: Deduplicator, path: str = DEDUP_REPORT_PATH) -> dict:
+    """
+    Log the duplicate removal totals and write them, with example removals, to a JSON report.
+    A disabled deduplicator (None) still writes the report, as {"enabled": false}, since DVC tracks it as a metric.
+    """
+    try:
+        if deduplicator is None:
+            report = {"enabled": False}
+        else:
+            report = {"enabled": True, **deduplicator.summary()}
+            logger.info(f"Duplicate removal: {report['removed']} of {report['rows']} rows removed "
+                        f"({report['exact_duplicates']} exact, {report['near_duplicates']} near duplicates at "
+                        f"similarity >= {report['threshold']})")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=4)
+        return report
+    except Exception as e:
+        logger.error(f"Error saving duplicate removal report to {path}. Error: {e}")
+        raise
+
+
+def save_data_to_csv(train_data: pd.DataFrame, test_data: pd.DataFrame, path:str, fmt: str = "csv") -> None:
+    """
+    Save the training and testing DataFrames to CSV (or Parquet) files.
 
     Args:
         train_data (pd.DataFrame): The training DataFrame.
         test_data (pd.DataFrame): The testing DataFrame.
-        train_path (str): The file path to save the training data CSV.
-        test_path (str): The file path to save the testing data CSV.
+        path (str): The directory to save train_data and test_data in.
+        fmt (str): The storage format, "csv" or "parquet".
     """
     try:
-        raw_data_dir = "raw_data"
+        raw_data_dir = path
         os.makedirs(raw_data_dir, exist_ok=True)
-        train_data.to_csv(os.path.join(raw_data_dir, "train_data.csv"), index=False)
-        test_data.to_csv(os.path.join(raw_data_dir, "test_data.csv"), index=False)
+        write_table(train_data, table_path(raw_data_dir, "train_data", fmt))
+        write_table(test_data, table_path(raw_data_dir, "test_data", fmt))
         logger.info(f"Training and testing data saved successfully to {raw_data_dir} directory.")
     except Exception as e:
-        logger.error(f"Error saving data to CSV files. Error: {e}")
+        logger.error(f"Error saving data to {fmt} files. Error: {e}")
+        raise
+
+def stream_data(url: str, chunk_size: int, test_size: float, random_state: int, cache_dir: str = "cache/sources", path: str = "raw_data", fmt: str = "csv",
+                deduplicator: Deduplicator = None, split: str = "random", split_key: list = ("text",), target: str = "label",
+                split_tolerance: float = None) -> tuple:
+    """
+    Streaming variant of data_save -> preprocess_data -> train_test_split -> save_data_to_csv.
+    The CSV is read chunk_size rows at a time; each chunk is cleaned, every row is sent to the test
+    split with probability test_size (from a seeded generator, or from hash_split with split="hash"),
+    and the rows are appended to the train/test files, so the full frame is never held in memory.
+    With a deduplicator, duplicates of rows from this or any earlier chunk are dropped before the split.
+
+    Returns:
+        tuple: The number of training and testing rows written.
+    """
+    try:
+        logger.info(f"Streaming data injection from URL: {url} in chunks of {chunk_size} rows")
+        os.makedirs(path, exist_ok=True)
+        rng = np.random.default_rng(random_state)
+        n_train = n_test = 0
+        train_counts, test_counts = [], []
+        with TableAppender(table_path(path, "train_data", fmt)) as train_writer, \
+                TableAppender(table_path(path, "test_data", fmt)) as test_writer:
+            for chunk in pd.read_csv(resolve_source(url, cache_dir), chunksize=chunk_size):
+                chunk = preprocess_data(chunk)
+                if deduplicator is not None:
+                    chunk = remove_duplicates(chunk, deduplicator)
+                if split == "hash":
+                    is_test = hash_split(chunk, split_key, test_size, random_state)
+                else:
+                    is_test = rng.random(len(chunk)) < test_size
+                train_writer.append(chunk[~is_test])
+                test_writer.append(chunk[is_test])
+                n_train += int((~is_test).sum())
+                n_test += int(is_test.sum())
+                train_counts.append(chunk.loc[~is_test, target].value_counts())
+                test_counts.append(chunk.loc[is_test, target].value_counts())
+        logger.info(f"Streamed {n_train} training and {n_test} testing records to {path} directory.")
+        if train_counts:
+            log_split_balance(pd.concat(train_counts).groupby(level=0).sum(), pd.concat(test_counts).groupby(level=0).sum(), test_size,
+                              split_tolerance if split == "hash" else None)
+        return n_train, n_test
+    except pd.errors.ParserError as pw:
+        logger.error(f"Parsing error while streaming the CSV file from URL: {url}. Error: {pw}")
+        raise
+    except Exception as e:
+        logger.error(f"Error during streaming data injection from URL: {url}. Error: {e}")
         raise
 
-def main():
+@perf.stage("data_injection")
+def main(params: dict = None, write: bool = True):
+    """
+    Run the data injection stage.
+
+    Args:
+        params (dict): Parsed params.yaml; read from disk when not given.
+        write (bool): Write raw_data/. The in-process pipeline runner may defer this.
+    Returns:
+        tuple: The training and testing DataFrames, or None in streaming mode (chunk_size set),
+        which always writes raw_data/ directly.
+    """
     try:
         # Load parameters
-        with open('params.yaml', 'r') as f:
-            params = yaml.safe_load(f)
+        if params is None:
+            with open('params.yaml', 'r') as f:
+                params = yaml.safe_load(f)
         
         data_params = params['data_injection']
         
         logger.info("Data injection process started.")
         url = data_params['url']
-        df = data_save(url) 
+        cache_dir = data_params.get('cache_dir', "cache/sources")
+        fmt = params.get('storage', {}).get('format', 'csv')
+        deduplicator = create_deduplicator(data_params.get('dedup'))
+        split = data_params.get('split', 'random')
+        split_key = data_params.get('split_key', ['text'])
+        split_tolerance = data_params.get('split_tolerance')
+        if split not in SPLIT_MODES:
+            raise ValueError(f"Unknown split mode '{split}', expected one of {SPLIT_MODES}")
+        if data_params.get('chunk_size'):
+            stream_data(url, data_params['chunk_size'], data_params['test_size'], data_params['random_state'], cache_dir=cache_dir, fmt=fmt,
+                        deduplicator=deduplicator, split=split, split_key=split_key, split_tolerance=split_tolerance)
+            save_dedup_report(deduplicator)
+            logger.info("Data injection process completed successfully.")
+            return None
+
+        df = data_save(url, cache_dir) 
         df_cleaned = preprocess_data(df)
-        train_data, test_data = train_test_split(
-            df_cleaned, 
-            test_size=data_params['test_size'], 
-            random_state=data_params['random_state']
-        )
-        save_data_to_csv(train_data, test_data, path="raw_data")
+        if deduplicator is not None:
+            # Before the split, so no repost ends up on both sides
+            df_cleaned = remove_duplicates(df_cleaned, deduplicator)
+        save_dedup_report(deduplicator)
+        if split == "hash":
+            # Rows stay in source order, so data appended to the source is appended to both splits
+            is_test = hash_split(df_cleaned, split_key, data_params['test_size'], data_params['random_state'])
+            train_data, test_data = df_cleaned[~is_test], df_cleaned[is_test]
+            log_split_balance(train_data['label'].value_counts(), test_data['label'].value_counts(), data_params['test_size'],
+                              split_tolerance)
+        else:
+            from sklearn.model_selection import train_test_split
+            train_data, test_data = train_test_split(
+                df_cleaned, 
+                test_size=data_params['test_size'], 
+                random_state=data_params['random_state']
+            )
+        if write:
+            save_data_to_csv(train_data, test_data, path="raw_data", fmt=fmt)
         logger.info("Data injection process completed successfully.")
+        return train_data, test_data
     except Exception as e:
         logger.error(f"Data injection process failed. Error: {e}")
         raise
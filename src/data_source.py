@@ -0,0 +1,149 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# Child of the data_injection logger, so messages go to that stage's handlers
+logger = logging.getLogger("data_injection.source")
+
+CHUNK_BYTES = 1 << 20
+
+
+def resolve_source(source: str, cache_dir: str = "cache/sources", timeout: float = 60) -> str:
+    """
+    Turn a data source into a local file path.
+    http(s) URLs are downloaded into a content-addressed cache, file:// URLs and plain paths are used in place.
+
+    Args:
+        source (str): An http(s) URL, a file:// URL or a local path.
+        cache_dir (str): Directory of the download cache.
+        timeout (float): Network timeout in seconds.
+    Returns:
+        str: Path of a local file holding the source bytes.
+    """
+    parsed = urllib.parse.urlparse(source)
+    if parsed.scheme in ("http", "https"):
+        return fetch_url(source, cache_dir, timeout)
+    if parsed.scheme == "file":
+        path = urllib.request.url2pathname(parsed.path)
+    elif parsed.scheme == "" or len(parsed.scheme) == 1:
+        # No scheme, or a Windows drive letter
+        path = source
+    else:
+        raise ValueError(f"Unsupported data source scheme '{parsed.scheme}' in {source}")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Data source not found: {path}")
+    return path
+
+
+def _load_index(cache_dir: str) -> dict:
+    index_path = os.path.join(cache_dir, "index.json")
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, "r") as f:
+        return json.load(f)
+
+
+def _save_index(cache_dir: str, index: dict) -> None:
+    index_path = os.path.join(cache_dir, "index.json")
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f, indent=4)
+    os.replace(tmp_path, index_path)
+
+
+def _object_path(cache_dir: str, digest: str) -> str:
+    return os.path.join(cache_dir, "objects", digest[:2], digest)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cached_object(cache_dir: str, entry: dict) -> str:
+    """
+    Return the cached object of an index entry if it exists and still matches its digest, else None.
+    """
+    if not entry:
+        return None
+    path = _object_path(cache_dir, entry["sha256"])
+    if os.path.exists(path) and os.path.getsize(path) == entry["size"] and _sha256(path) == entry["sha256"]:
+        return path
+    logger.warning(f"Cached object {entry['sha256']} is missing or corrupt; downloading again")
+    return None
+
+
+def fetch_url(url: str, cache_dir: str = "cache/sources", timeout: float = 60) -> str:
+    """
+    Download a URL into the content-addressed cache and return the cached file path.
+    Objects are stored under their SHA-256. The index keeps the ETag and Last-Modified of each URL,
+    so a repeated fetch is a conditional request and an unchanged source is served from the cache.
+    When the network is unreachable a verified cached copy is used instead.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    index = _load_index(cache_dir)
+    entry = index.get(url)
+    cached = _cached_object(cache_dir, entry)
+
+    request = urllib.request.Request(url)
+    if cached:
+        if entry.get("etag"):
+            request.add_header("If-None-Match", entry["etag"])
+        if entry.get("last_modified"):
+            request.add_header("If-Modified-Since", entry["last_modified"])
+
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as he:
+        if he.code == 304 and cached:
+            logger.info(f"Source unchanged since last fetch, using cached copy of {url}")
+            return cached
+        raise
+    except (urllib.error.URLError, OSError) as e:
+        if cached:
+            logger.warning(f"Could not reach {url} ({e}); using cached copy fetched at {entry['fetched_at']}")
+            return cached
+        raise
+
+    with response:
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for block in iter(lambda: response.read(CHUNK_BYTES), b""):
+                    digest.update(block)
+                    f.write(block)
+                    size += len(block)
+            object_path = _object_path(cache_dir, digest.hexdigest())
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            if os.path.exists(object_path):
+                os.remove(tmp_path)
+            else:
+                shutil.move(tmp_path, object_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        headers = response.headers
+
+    index[url] = {
+        "sha256": digest.hexdigest(),
+        "size": size,
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "fetched_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    _save_index(cache_dir, index)
+    logger.debug(f"Fetched {size} bytes from {url} into {object_path}")
+    return object_path
@@ -0,0 +1,228 @@
+import numpy as np
+import pandas as pd
+
+# Rows whose text normalizes to fewer bytes than the shingle size are padded with this byte
+_PAD = b"\x00"
+# Multiplier of the polynomial rolling hash over the bytes of a shingle
+_ROLLING_BASE = np.uint64(0x100000001B3)
+# Shingles and permutations hashed at once; the (permutations x shingles) block stays small enough for the CPU cache
+_BATCH_SHINGLES = 1 << 14
+_PERMUTATION_BLOCK = 8
+
+
+def normalize_texts(texts: pd.Series) -> pd.Series:
+    """
+    Lowercase, collapse whitespace and strip, so reposts that differ only in case or spacing match exactly.
+    """
+    return texts.astype(str).str.lower().str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def lsh_bands(threshold: float, num_perm: int) -> tuple:
+    """
+    The number of bands and rows per band whose LSH threshold (1 / bands) ** (1 / rows) is closest
+    to the similarity threshold; signatures sharing one band become candidate duplicates.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+def shingle_hashes(texts: list, shingle_size: int) -> tuple:
+    """
+    64-bit hashes of every shingle_size-byte window of each UTF-8 encoded text, computed for all texts at once.
+
+    Returns:
+        tuple: The hashes ordered by text, and the offset of each text's first hash.
+    """
+    encoded = [text.encode("utf-8") for text in texts]
+    encoded = [data if len(data) >= shingle_size else data + _PAD * (shingle_size - len(data)) for data in encoded]
+    lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+    buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+    n_windows = len(buffer) - shingle_size + 1
+    hashes = np.zeros(n_windows, dtype=np.uint64)
+    for offset in range(shingle_size):
+        hashes *= _ROLLING_BASE
+        hashes += buffer[offset:offset + n_windows]
+    # Keep only the windows that lie inside one text
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    window_counts = lengths - shingle_size + 1
+    keep = np.repeat(starts, window_counts) + _ragged_arange(window_counts)
+    offsets = np.concatenate(([0], np.cumsum(window_counts)[:-1]))
+    return hashes[keep], offsets
+
+
+def _ragged_arange(counts: np.ndarray) -> np.ndarray:
+    """
+    Concatenated np.arange(count) for every count.
+    """
+    total = int(counts.sum())
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.arange(total, dtype=np.int64) - offsets
+
+
+class MinHasher:
+    """
+    MinHash signatures of texts over their byte shingles.
+
+    Each of the num_perm hash functions is a multiply-add-shift hash (a * x + b mod 2**64) >> 32 of the
+    64-bit shingle hash, and a signature holds the minimum of every function over the text's shingles.
+    The fraction of equal signature entries of two texts estimates the Jaccard similarity of their
+    shingle sets. All texts of a batch are hashed together with numpy, in blocks that bound memory.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def signatures(self, texts: list) -> np.ndarray:
+        """
+        The (len(texts), num_perm) uint32 signature matrix.
+        """
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        start = 0
+        while start < len(texts):
+            # Grow the batch until it holds about _BATCH_SHINGLES shingles
+            stop, budget = start, 0
+            while stop < len(texts) and (stop == start or budget < _BATCH_SHINGLES):
+                budget += max(len(texts[stop]), self.shingle_size)
+                stop += 1
+            hashes, offsets = shingle_hashes(texts[start:stop], self.shingle_size)
+            values = np.empty((_PERMUTATION_BLOCK, len(hashes)), dtype=np.uint64)
+            for first in range(0, self.num_perm, _PERMUTATION_BLOCK):
+                block = slice(first, first + _PERMUTATION_BLOCK)
+                out = values[:len(self.a[block])]
+                np.multiply(self.a[block, None], hashes[None, :], out=out)
+                out += self.b[block, None]
+                out >>= np.uint64(32)
+                signatures[start:stop, block] = np.minimum.reduceat(out, offsets, axis=1).T
+            start = stop
+        return signatures
+
+
+class Deduplicator:
+    """
+    Streaming exact and near-duplicate filter with MinHash and locality-sensitive hashing.
+
+    Texts are normalized (normalize_texts); a text is an exact duplicate when its normalized form was
+    seen before, and a near duplicate when its estimated Jaccard similarity to a kept text is at least
+    threshold. Signatures are split into bands (lsh_bands) and only texts sharing a band bucket are
+    compared, so the cost grows linearly with the number of rows. The index persists across calls of
+    filter, so chunks of a stream are deduplicated against everything kept before them, and the first
+    occurrence is always the one kept.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, shingle_size: int = 5, seed: int = 1,
+                 max_examples: int = 20):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"Similarity threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self.bands, self.rows_per_band = lsh_bands(threshold, num_perm)
+        self.band_multipliers = np.random.default_rng([seed, 1]).integers(
+            0, 2 ** 63, size=self.rows_per_band, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.max_examples = max_examples
+        self._exact = {}
+        self._buckets = [{} for _ in range(self.bands)]
+        self._kept = np.empty((1024, num_perm), dtype=np.uint32)
+        self._kept_rows = []
+        self.report = {"rows": 0, "exact_duplicates": 0, "near_duplicates": 0, "examples": []}
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """
+        One 64-bit bucket key per row and band.
+        """
+        n_rows = signatures.shape[0]
+        bands = signatures[:, :self.bands * self.rows_per_band].reshape(n_rows, self.bands, self.rows_per_band)
+        return (bands.astype(np.uint64) * self.band_multipliers).sum(axis=2)
+
+    def _keep(self, signature: np.ndarray, row) -> int:
+        position = len(self._kept_rows)
+        if position == len(self._kept):
+            self._kept = np.concatenate((self._kept, np.empty_like(self._kept)))
+        self._kept[position] = signature
+        self._kept_rows.append(row)
+        return position
+
+    def _example(self, kind: str, row, kept: int, similarity: float, text: str) -> None:
+        if len(self.report["examples"]) < self.max_examples:
+            self.report["examples"].append({"type": kind, "row": _plain(row), "duplicate_of": _plain(self._kept_rows[kept]),
+                                            "similarity": round(float(similarity), 4), "text": text[:200]})
+
+    def filter(self, texts: pd.Series) -> np.ndarray:
+        """
+        Boolean mask of the texts to keep; the index labels of texts identify rows in the report.
+        """
+        normalized = normalize_texts(texts)
+        digests = pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+        values = normalized.tolist()
+        keep = np.zeros(len(values), dtype=bool)
+
+        # Repeats of texts kept by earlier calls never reach the MinHash stage
+        candidates = []
+        for position, digest in enumerate(digests.tolist()):
+            if digest in self._exact:
+                self.report["exact_duplicates"] += 1
+                self._example("exact", texts.index[position], self._exact[digest], 1.0, values[position])
+            else:
+                candidates.append(position)
+
+        signatures = self.hasher.signatures([values[position] for position in candidates])
+        keys = self._band_keys(signatures)
+        for signature, band_keys, position in zip(signatures, keys.tolist(), candidates):
+            digest = digests[position]
+            if digest in self._exact:
+                # A repeat within this batch of a text kept a few rows earlier
+                self.report["exact_duplicates"] += 1
+                self._example("exact", texts.index[position], self._exact[digest], 1.0, values[position])
+                continue
+            matches = set()
+            for bucket, key in zip(self._buckets, band_keys):
+                matches.update(bucket.get(key, ()))
+            best, similarity = None, 0.0
+            for kept in matches:
+                estimate = np.count_nonzero(self._kept[kept] == signature) / self.hasher.num_perm
+                if estimate > similarity:
+                    best, similarity = kept, estimate
+            if best is not None and similarity >= self.threshold:
+                self.report["near_duplicates"] += 1
+                self._example("near", texts.index[position], best, similarity, values[position])
+                continue
+            kept = self._keep(signature, texts.index[position])
+            self._exact[digest] = kept
+            for bucket, key in zip(self._buckets, band_keys):
+                bucket.setdefault(key, []).append(kept)
+            keep[position] = True
+        self.report["rows"] += len(values)
+        return keep
+
+    def summary(self) -> dict:
+        """
+        The removal report: rows seen, exact and near duplicates removed, rows kept and example removals.
+        """
+        removed = self.report["exact_duplicates"] + self.report["near_duplicates"]
+        return {
+            "threshold": self.threshold,
+            "num_perm": self.hasher.num_perm,
+            "shingle_size": self.hasher.shingle_size,
+            "bands": self.bands,
+            "rows_per_band": self.rows_per_band,
+            "rows": self.report["rows"],
+            "exact_duplicates": self.report["exact_duplicates"],
+            "near_duplicates": self.report["near_duplicates"],
+            "removed": removed,
+            "kept": self.report["rows"] - removed,
+            "removed_fraction": removed / self.report["rows"] if self.report["rows"] else 0.0,
+            "examples": self.report["examples"],
+        }
+
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
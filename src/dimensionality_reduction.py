@@ -0,0 +1,272 @@
+import io
+import logging
+import os
+import shutil
+import time
+import numpy as np
+import yaml
+
+import perf
+from feature_store import REDUCER_FILE, load_features, remove_split_outputs, split_paths
+
+logs_dir = "logs"
+os.makedirs(logs_dir, exist_ok=True)
+log_file = os.path.join(logs_dir, "dimensionality_reduction.log")
+logger = logging.getLogger("dimensionality_reduction")
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.INFO)
+
+file_handler = logging.FileHandler(log_file)
+file_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+logger.addHandler(file_handler)
+
+METHODS = ("none", "chi2", "mutual_info", "svd")
+METRICS_PATH = "metrics/dimensionality_reduction.json"
+
+
+def build_reducer(method: str, n_components: int, n_features: int, random_state: int = None):
+    """
+    Create the unfitted transform for a reduction method, or None for "none".
+
+    Args:
+        method (str): "chi2" or "mutual_info" keep the n_components best-scoring TF-IDF columns;
+            "svd" projects onto n_components TruncatedSVD components; "none" keeps every column.
+        n_components (int): Number of output features, capped to what the input allows.
+        n_features (int): Number of input features.
+        random_state (int): Seed of the SVD solver and of the mutual information estimator.
+    Returns:
+        The sklearn transformer, or None.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown reduction method '{method}', expected one of {METHODS}")
+    if method == "none":
+        return None
+    if method == "svd":
+        from sklearn.decomposition import TruncatedSVD
+        return TruncatedSVD(n_components=min(n_components, n_features - 1), random_state=random_state)
+
+    import functools
+    from sklearn.feature_selection import SelectKBest, chi2, mutual_info_classif
+    if method == "chi2":
+        score_func = chi2
+    else:
+        # Sparse input is scored as discrete features; fit_reducer passes term presence
+        score_func = functools.partial(mutual_info_classif, discrete_features=True, random_state=random_state)
+    return SelectKBest(score_func=score_func, k=min(n_components, n_features))
+
+
+@perf.timed(rows="X_train")
+def fit_reducer(reducer, method: str, X_train, y_train):
+    """
+    Fit the reducer on the training features and return it.
+    Mutual information is computed on term presence (x > 0), which keeps the features discrete.
+    """
+    try:
+        logger.info(f"Fitting {method} reduction on {X_train.shape[0]} rows and {X_train.shape[1]} features")
+        if method == "mutual_info":
+            presence = X_train.copy()
+            presence.data = (presence.data > 0).astype(np.float32)
+            reducer.fit(presence, y_train)
+        else:
+            reducer.fit(X_train, y_train)
+        return reducer
+    except Exception as e:
+        logger.error(f"Error fitting the {method} reduction. Error: {e}")
+        raise
+
+
+def reduce_features(reducer, X):
+    """
+    Apply a fitted reducer and return CSR features (SVD components are dense, stored in CSR like the rest).
+    """
+    from scipy import sparse
+    return sparse.csr_matrix(reducer.transform(X), dtype=np.float64)
+
+
+def _model_size_mb(model) -> float:
+    import joblib
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.tell() / 2 ** 20
+
+
+def probe_model(X_train, y_train, X_test, y_test, model_params: dict, n_jobs: int = None, average: str = "weighted") -> dict:
+    """
+    Train the model_params trainer (the forest by default) and report its accuracy, training and prediction time and size.
+    """
+    import model
+    import model_eval
+
+    start = time.perf_counter()
+    trained = model.train_model(X_train, y_train, model_params, n_jobs=n_jobs)
+    train_s = time.perf_counter() - start
+    start = time.perf_counter()
+    metrics = model_eval.evaluate_model(trained, X_test, y_test, average=average)
+    predict_s = time.perf_counter() - start
+    return {
+        "n_features": int(X_train.shape[1]),
+        "accuracy": metrics["accuracy"],
+        "train_s": train_s,
+        "predict_s": predict_s,
+        "model_mb": _model_size_mb(trained),
+    }
+
+
+def tradeoff_report(full: dict, reduced: dict, tolerance: float) -> dict:
+    """
+    Compare the probe forests on the full and on the reduced features.
+    """
+    accuracy_drop = full["accuracy"] - reduced["accuracy"]
+    return {
+        "full": full,
+        "reduced": reduced,
+        "accuracy_drop": accuracy_drop,
+        "accuracy_tolerance": tolerance,
+        "within_tolerance": accuracy_drop <= tolerance,
+        "train_speedup": full["train_s"] / reduced["train_s"] if reduced["train_s"] else None,
+        "predict_speedup": full["predict_s"] / reduced["predict_s"] if reduced["predict_s"] else None,
+        "model_size_ratio": reduced["model_mb"] / full["model_mb"] if full["model_mb"] else None,
+    }
+
+
+def link_features(source_dir: str, target_dir: str) -> None:
+    """
+    Make the splits of source_dir available unchanged in target_dir, hard-linking files where possible.
+    """
+    for split in ("train", "test"):
+        remove_split_outputs(target_dir, split)
+        for path in split_paths(source_dir, split):
+            target = os.path.join(target_dir, os.path.basename(path))
+            if os.path.isdir(path):
+                shutil.copytree(path, target, copy_function=_link_or_copy)
+            else:
+                _link_or_copy(path, target)
+
+
+def _link_or_copy(source: str, target: str) -> None:
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def save_reduced_data(x_train, x_test, y_train, y_test, reduced_data_dir: str = "reduced_data") -> None:
+    """
+    Write the reduced features in the single-file layout of vectorized_data/.
+    """
+    from feature_engineering import save_sparse_data
+
+    os.makedirs(reduced_data_dir, exist_ok=True)
+    for split, features, labels in (("train", x_train, y_train), ("test", x_test, y_test)):
+        remove_split_outputs(reduced_data_dir, split)
+        save_sparse_data(features, labels, *split_paths(reduced_data_dir, split))
+    logger.debug(f"Reduced training and testing data saved successfully to {reduced_data_dir} directory.")
+
+
+def save_reducer(reducer, reduced_data_dir: str = "reduced_data") -> None:
+    """
+    Persist the fitted reducer for the inference bundle; None means the vectorizer output is used as is.
+    """
+    import joblib
+
+    os.makedirs(reduced_data_dir, exist_ok=True)
+    joblib.dump(reducer, os.path.join(reduced_data_dir, REDUCER_FILE))
+
+
+@perf.stage("dimensionality_reduction")
+def main(params: dict = None, X_train=None, y_train=None, X_test=None, y_test=None, write: bool = True,
+         writer=None):
+    """
+    Run the dimensionality reduction stage.
+
+    :param params: Parsed params.yaml; read from disk when not given
+    :param X_train: Training features; read from vectorized_data/ when not given
+    :param y_train: Training labels
+    :param X_test: Testing features; read from vectorized_data/ when not given
+    :param y_test: Testing labels
+    :param write: Write reduced_data/. The in-process pipeline runner may defer this.
+        The metrics are always written
+    :param writer: With write False, the ArtifactWriter of the in-process runner, which writes the fitted
+        reducer (reduced_data/reducer.joblib); without one nothing is written to reduced_data/ unless
+        the features were not passed in
+    :return: The reduced (x_train, x_test, y_train, y_test), or None with method "none" when the
+        features were not passed in; reduced_data/ then links to vectorized_data/
+    :rtype: tuple
+    """
+    try:
+        import model_eval
+
+        if params is None:
+            with open('params.yaml', 'r') as f:
+                params = yaml.safe_load(f)
+
+        reduction_params = params.get('dimensionality_reduction', {})
+        method = reduction_params.get('method', 'none')
+        vectorized_data_dir = "vectorized_data"
+        reduced_data_dir = "reduced_data"
+
+        logger.info(f"Starting dimensionality reduction with method: {method}")
+        if method == "none":
+            # Nothing is reduced, so no probe forests are trained whatever report_tradeoff says
+            model_eval.save_metrics_to_json({"method": method}, METRICS_PATH)
+            # A None reducer tells the inference bundle to use the vectorizer output as is
+            if X_train is None or X_test is None:
+                # The features are read back from disk, so reduced_data/ must be written
+                save_reducer(None, reduced_data_dir)
+                link_features(vectorized_data_dir, reduced_data_dir)
+                return None
+            if write:
+                save_reducer(None, reduced_data_dir)
+                link_features(vectorized_data_dir, reduced_data_dir)
+            elif writer is not None:
+                writer.write(save_reducer, None, reduced_data_dir)
+            return X_train, X_test, y_train, y_test
+
+        if X_train is None or X_test is None:
+            X_train, y_train = load_features(*split_paths(vectorized_data_dir, "train"))
+            X_test, y_test = load_features(*split_paths(vectorized_data_dir, "test"))
+        reducer = build_reducer(method, reduction_params.get('n_components', 500), X_train.shape[1],
+                                reduction_params.get('random_state'))
+        fit_reducer(reducer, method, X_train, y_train)
+        X_train_reduced = reduce_features(reducer, X_train)
+        X_test_reduced = reduce_features(reducer, X_test)
+        logger.info(f"Reduced {X_train.shape[1]} features to {X_train_reduced.shape[1]}")
+
+        report = {"method": method, "n_features": int(X_train_reduced.shape[1])}
+        if reduction_params.get('report_tradeoff', True):
+            probe_params = dict(params['model_training'])
+            if reduction_params.get('probe_estimators'):
+                probe_params['n_estimators'] = reduction_params['probe_estimators']
+            n_jobs = params.get('training', {}).get('n_jobs')
+            average = params['model_evaluation']['average']
+            full = probe_model(X_train, y_train, X_test, y_test, probe_params, n_jobs, average)
+            reduced = probe_model(X_train_reduced, y_train, X_test_reduced, y_test, probe_params, n_jobs, average)
+            report.update(tradeoff_report(full, reduced, reduction_params.get('accuracy_tolerance', 0.01)))
+            logger.info(f"Accuracy {full['accuracy']:.4f} -> {reduced['accuracy']:.4f}, training {report['train_speedup']:.1f}x "
+                        f"and prediction {report['predict_speedup']:.1f}x faster, model {report['model_size_ratio']:.2f}x the size")
+            if not report["within_tolerance"]:
+                logger.warning(f"Accuracy dropped by {report['accuracy_drop']:.4f}, more than the tolerance of {report['accuracy_tolerance']}")
+        model_eval.save_metrics_to_json(report, METRICS_PATH)
+
+        if write:
+            save_reducer(reducer, reduced_data_dir)
+            save_reduced_data(X_train_reduced, X_test_reduced, y_train, y_test, reduced_data_dir)
+        elif writer is not None:
+            writer.write(save_reducer, reducer, reduced_data_dir)
+        return X_train_reduced, X_test_reduced, y_train, y_test
+    except Exception as e:
+        logger.error(f"Error in main function for dimensionality reduction. Error: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
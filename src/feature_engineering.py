@@ -2,7 +2,10 @@ import pandas as pd
 import logging 
 import os
 import yaml
-from sklearn.feature_extraction.text import TfidfVectorizer
+import numpy as np
+import perf
+from feature_store import VECTORIZER_FILE, remove_split_outputs, save_shard
+from tabular_io import CLEANED_DTYPES, iter_table, read_table, table_path
 
 
 logs_dir = "logs"
@@ -45,7 +48,8 @@ def load_data(file_path: str) -> pd.DataFrame:
         raise
 
 
-def apply_tfidf_vectorization(train_data: pd.DataFrame, test_data: pd.DataFrame, text_column: str, max_features: int):
+@perf.timed(rows=lambda result: result[0].shape[0] + result[1].shape[0])
+def apply_tfidf_vectorization(train_data: pd.DataFrame, test_data: pd.DataFrame, text_column: str, max_features: int, vectorizer: "TfidfVectorizer" = None):
     """
     Apply TF-IDF vectorization to the text data in the specified column of the training and testing DataFrames.
 
@@ -54,28 +58,28 @@ def apply_tfidf_vectorization(train_data: pd.DataFrame, test_data: pd.DataFrame,
         test_data (pd.DataFrame): The testing DataFrame.
         text_column (str): The name of the column containing text data to be vectorized.
         max_features (int): The maximum number of features to be extracted by the TF-IDF vectorizer.
+        vectorizer (TfidfVectorizer): Optional unfitted vectorizer to fit, so the caller can keep it.
     Returns:
-        tuple: A tuple containing the TF-IDF vectorized training and testing data as sparse matrices.
+        tuple: The TF-IDF vectorized training and testing data as CSR matrices, followed by
+        the training and testing labels as numpy arrays.
     """
     try:
         logger.info(f"Applying TF-IDF vectorization to column: {text_column} with max_features: {max_features}")
-        tfidf_vectorizer = TfidfVectorizer(max_features=max_features)
-        x_train=train_data["text"].fillna('').values
-        x_test=test_data["text"].fillna('').values
+        if vectorizer is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            vectorizer = TfidfVectorizer(max_features=max_features)
+        tfidf_vectorizer = vectorizer
+        x_train=train_data[text_column].fillna('').values
+        x_test=test_data[text_column].fillna('').values
 
         y_train=train_data["label"].values
         y_test=test_data["label"].values
 
-        x_train_tfidf = tfidf_vectorizer.fit_transform(x_train)
-        x_test_tfidf = tfidf_vectorizer.transform(x_test)
+        x_train_tfidf = tfidf_vectorizer.fit_transform(x_train).tocsr()
+        x_test_tfidf = tfidf_vectorizer.transform(x_test).tocsr()
 
-        x_train_df=pd.DataFrame(x_train_tfidf.toarray())
-        x_train_df["label"]=y_train
-
-        x_test_df=pd.DataFrame(x_test_tfidf.toarray())
-        x_test_df["label"]=y_test
-        logger.debug(f"TF-IDF vectorization completed successfully. Shape of training data: {x_train_df.shape}, Shape of testing data: {x_test_df.shape}")
-        return x_train_df, x_test_df
+        logger.debug(f"TF-IDF vectorization completed successfully. Shape of training data: {x_train_tfidf.shape}, Shape of testing data: {x_test_tfidf.shape}, Non-zero entries: {x_train_tfidf.nnz + x_test_tfidf.nnz}")
+        return x_train_tfidf, x_test_tfidf, y_train, y_test
     except KeyError as ke:
         logger.error(f"Key error during TF-IDF vectorization. Error: {ke}")
         raise
@@ -84,35 +88,255 @@ def apply_tfidf_vectorization(train_data: pd.DataFrame, test_data: pd.DataFrame,
         raise
 
 
-def main():
+def save_sparse_data(features, labels, features_path: str, labels_path: str) -> None:
+    """
+    Save a feature matrix in CSR form as a compressed .npz file and its labels as a .npy file.
+
+    Args:
+        features (scipy.sparse matrix): The vectorized features.
+        labels (np.ndarray): The labels, one per row of features.
+        features_path (str): The path of the .npz file for the features.
+        labels_path (str): The path of the .npy file for the labels.
+    """
+    try:
+        from scipy import sparse
+        sparse.save_npz(features_path, sparse.csr_matrix(features), compressed=True)
+        np.save(labels_path, np.asarray(labels))
+        logger.debug(f"Sparse data saved successfully to {features_path} and {labels_path}")
+    except Exception as e:
+        logger.error(f"Error saving sparse data to {features_path}. Error: {e}")
+        raise
+
+
+def build_hashing_vectorizer(n_features: int) -> "HashingVectorizer":
+    """
+    Stateless vectorizer for the streaming mode. It tokenizes like TfidfVectorizer and returns raw term counts.
+    """
+    from sklearn.feature_extraction.text import HashingVectorizer
+    return HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None)
+
+
+def iter_chunks(source, columns: list, chunk_size: int):
+    """
+    Yield chunk_size row chunks of the given columns from a CSV/Parquet path or an in-memory DataFrame.
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_size):
+            yield source.iloc[start:start + chunk_size][columns]
+    else:
+        yield from iter_table(source, columns=columns, chunk_size=chunk_size, dtypes=CLEANED_DTYPES)
+
+
+def fit_streaming_idf(source, text_column: str, vectorizer: "HashingVectorizer", chunk_size: int) -> "TfidfTransformer":
+    """
+    Compute the IDF weights of the cleaned training data in one streaming pass, counting document frequencies chunk by chunk.
+    The resulting TfidfTransformer uses the same smoothed IDF and l2 normalization as TfidfVectorizer.
+
+    Args:
+        source (str or pd.DataFrame): The cleaned training CSV, or the cleaned DataFrame itself.
+        text_column (str): The name of the column containing text data.
+        vectorizer (HashingVectorizer): The hashing vectorizer from build_hashing_vectorizer.
+        chunk_size (int): Number of rows read at a time.
+    Returns:
+        TfidfTransformer: A transformer with its idf_ set from the streamed document frequencies.
+    """
+    try:
+        logger.info(f"Computing streaming IDF in chunks of {chunk_size} rows")
+        n_features = vectorizer.n_features
+        document_frequency = np.zeros(n_features, dtype=np.int64)
+        n_documents = 0
+        for chunk in iter_chunks(source, [text_column], chunk_size):
+            counts = vectorizer.transform(chunk[text_column].fillna('').values)
+            document_frequency += np.bincount(counts.indices, minlength=n_features)
+            n_documents += counts.shape[0]
+
+        from sklearn.feature_extraction.text import TfidfTransformer
+        transformer = TfidfTransformer()
+        transformer.idf_ = np.log((1 + n_documents) / (1 + document_frequency)) + 1
+        logger.debug(f"Streaming IDF computed from {n_documents} documents, {np.count_nonzero(document_frequency)} active hash buckets")
+        return transformer
+    except Exception as e:
+        logger.error(f"Error computing streaming IDF. Error: {e}")
+        raise
+
+
+def write_hashed_shards(source, text_column: str, vectorizer: "HashingVectorizer", transformer: "TfidfTransformer",
+                        chunk_size: int, features_dir: str, labels_dir: str) -> int:
+    """
+    Stream a cleaned CSV (or DataFrame) in chunks, hash and TF-IDF weight each chunk, and write it as one sparse shard.
+    Peak memory is bounded by chunk_size rather than by the size of the corpus.
+
+    Returns:
+        int: The number of rows written.
+    """
+    try:
+        n_rows = 0
+        for index, chunk in enumerate(iter_chunks(source, [text_column, "label"], chunk_size)):
+            features = transformer.transform(vectorizer.transform(chunk[text_column].fillna('').values))
+            save_shard(features, chunk["label"].values, features_dir, labels_dir, index)
+            n_rows += len(chunk)
+        logger.debug(f"Wrote {n_rows} hashed rows to {features_dir}")
+        return n_rows
+    except Exception as e:
+        logger.error(f"Error writing hashed shards to {features_dir}. Error: {e}")
+        raise
+
+
+@perf.timed()
+def apply_hashing_vectorization(train_source, test_source, text_column: str, n_features: int, chunk_size: int, output_dir: str):
+    """
+    Out-of-core alternative to apply_tfidf_vectorization.
+    Reads the cleaned CSVs in chunks, hashes them with a stateless HashingVectorizer, weights them with an
+    IDF learned in a streaming pass over the training data, and writes sparse shards to output_dir.
+
+    Args:
+        train_source (str or pd.DataFrame): The cleaned training CSV or DataFrame.
+        test_source (str or pd.DataFrame): The cleaned testing CSV or DataFrame.
+        text_column (str): The name of the column containing text data.
+        n_features (int): Number of hash buckets.
+        chunk_size (int): Number of rows processed at a time.
+        output_dir (str): The vectorized data directory.
+    Returns:
+        tuple: The fitted hashing vectorizer and IDF transformer.
+    """
+    try:
+        logger.info(f"Applying hashing vectorization to column: {text_column} with n_features: {n_features}")
+        vectorizer = build_hashing_vectorizer(n_features)
+        transformer = fit_streaming_idf(train_source, text_column, vectorizer, chunk_size)
+        for split, source in (("train", train_source), ("test", test_source)):
+            write_hashed_shards(source, text_column, vectorizer, transformer, chunk_size,
+                                os.path.join(output_dir, f"x_{split}_tfidf"), os.path.join(output_dir, f"y_{split}"))
+        return vectorizer, transformer
+    except Exception as e:
+        logger.error(f"Error during hashing vectorization. Error: {e}")
+        raise
+
+
+def save_vectorizer(vectorizer, vectorizer_path: str) -> None:
+    """
+    Persist the fitted vectorizer, which the inference bundle needs to turn raw text into features.
+    In hashing mode this is a Pipeline of the HashingVectorizer and the streaming IDF transformer.
+    """
+    try:
+        import joblib
+        os.makedirs(os.path.dirname(vectorizer_path) or ".", exist_ok=True)
+        # TfidfVectorizer caches the id() of its stop word list, which differs between runs and would
+        # change the file's hash (and rebuild the inference bundle) on every run
+        for step in getattr(vectorizer, "named_steps", {"vectorizer": vectorizer}).values():
+            if hasattr(step, "_stop_words_id"):
+                step._stop_words_id = None
+        joblib.dump(vectorizer, vectorizer_path)
+        logger.debug(f"Vectorizer saved successfully to {vectorizer_path}")
+    except Exception as e:
+        logger.error(f"Error saving vectorizer to {vectorizer_path}. Error: {e}")
+        raise
+
+
+def export_dense_csv(features, labels, file_path: str, chunk_mb: float = 64.0) -> None:
+    """
+    Export a feature matrix as a dense CSV with a trailing label column.
+    This is the legacy layout and is only written when export_dense_csv is enabled in params.yaml.
+    Rows are densified and written in chunks of about chunk_mb, never the whole matrix at once.
+
+    Args:
+        features (scipy.sparse matrix): The vectorized features.
+        labels (np.ndarray): The labels, one per row of features.
+        file_path (str): The path of the CSV file.
+        chunk_mb (float): Size of one dense chunk in MB.
+    """
+    try:
+        features = features.tocsr()
+        chunk_rows = max(1, int(chunk_mb * 2 ** 20 / (8 * max(features.shape[1], 1))))
+        for start in range(0, max(features.shape[0], 1), chunk_rows):
+            df = pd.DataFrame(features[start:start + chunk_rows].toarray())
+            df["label"] = labels[start:start + chunk_rows]
+            df.to_csv(file_path, index=False, mode="a" if start else "w", header=not start)
+        logger.debug(f"Dense CSV exported successfully to {file_path}")
+    except Exception as e:
+        logger.error(f"Error exporting dense CSV to {file_path}. Error: {e}")
+        raise
+
+
+def save_vectorized_data(x_train, x_test, y_train, y_test, vectorized_data_dir: str = "vectorized_data", export_dense: bool = False) -> None:
+    """
+    Save both splits in the sparse layout, plus the legacy dense CSVs when export_dense is set.
+    Outputs of an earlier run in the other layout (a hashing run's shard directories) are removed first.
+    """
+    os.makedirs(vectorized_data_dir, exist_ok=True)
+    for split in ("train", "test"):
+        remove_split_outputs(vectorized_data_dir, split)
+    save_sparse_data(x_train, y_train, os.path.join(vectorized_data_dir, "x_train_tfidf.npz"), os.path.join(vectorized_data_dir, "y_train.npy"))
+    save_sparse_data(x_test, y_test, os.path.join(vectorized_data_dir, "x_test_tfidf.npz"), os.path.join(vectorized_data_dir, "y_test.npy"))
+    if export_dense:
+        export_dense_csv(x_train, y_train, os.path.join(vectorized_data_dir, "x_train_tfidf.csv"))
+        export_dense_csv(x_test, y_test, os.path.join(vectorized_data_dir, "x_test_tfidf.csv"))
+    logger.debug(f"Vectorized training and testing data saved successfully to {vectorized_data_dir} directory.")
+
+
+@perf.stage("feature_engineering")
+def main(params: dict = None, train_df: pd.DataFrame = None, test_df: pd.DataFrame = None, write: bool = True,
+         writer=None):
     """
-    Docstring for main
-    :return: Description
-    :rtype: None
+    Run the feature engineering stage.
 
+    :param params: Parsed params.yaml; read from disk when not given
+    :param train_df: Cleaned training data; read from cleaned_data/ when not given
+    :param test_df: Cleaned testing data; read from cleaned_data/ when not given
+    :param write: Write vectorized_data/. The in-process pipeline runner may defer this.
+    :param writer: With write False, the ArtifactWriter of the in-process runner, which writes the fitted
+        vectorizer (vectorized_data/vectorizer.joblib); without one nothing is written. Hashing mode
+        streams its shards and writes its vectorizer either way
+    :return: (x_train, x_test, y_train, y_test), or None in hashing mode, whose shards are always written
+    :rtype: tuple
     """
     try:
         # Load parameters
-        with open('params.yaml', 'r') as f:
-            params = yaml.safe_load(f)
+        if params is None:
+            with open('params.yaml', 'r') as f:
+                params = yaml.safe_load(f)
         
         feature_params = params['feature_engineering']
         max_features = feature_params['max_features'] 
         text_column = feature_params['text_column']
         
         logger.info("Starting main function for feature engineering")
-        train_df=pd.read_csv("cleaned_data/train_data_cleaned.csv")
-        test_df=pd.read_csv("cleaned_data/test_data_cleaned.csv")
+        fmt = params.get('storage', {}).get('format', 'csv')
+        train_path = table_path("cleaned_data", "train_data_cleaned", fmt)
+        test_path = table_path("cleaned_data", "test_data_cleaned", fmt)
+        vectorized_data_dir = "vectorized_data"
+        vectorizer_path = os.path.join(vectorized_data_dir, VECTORIZER_FILE)
+
+        if feature_params.get('vectorizer', 'tfidf') == 'hashing':
+            os.makedirs(vectorized_data_dir, exist_ok=True)
+            for split in ("train", "test"):
+                remove_split_outputs(vectorized_data_dir, split)
+            vectorizer, transformer = apply_hashing_vectorization(train_path if train_df is None else train_df,
+                                                                  test_path if test_df is None else test_df,
+                                                                  text_column=text_column,
+                                                                  n_features=feature_params['n_features'],
+                                                                  chunk_size=feature_params['chunk_size'],
+                                                                  output_dir=vectorized_data_dir)
+            from sklearn.pipeline import Pipeline
+            save_vectorizer(Pipeline([("hashing", vectorizer), ("idf", transformer)]), vectorizer_path)
+            logger.debug(f"Hashed training and testing shards saved successfully to {vectorized_data_dir} directory.")
+            return None
+
+        if train_df is None or test_df is None:
+            train_df=read_table(train_path, columns=[text_column, "label"], dtypes=CLEANED_DTYPES)
+            test_df=read_table(test_path, columns=[text_column, "label"], dtypes=CLEANED_DTYPES)
         logger.debug(f"Data loaded successfully. Train records: {len(train_df)}, Test records: {len(test_df)}")
 
-        x_train_df, x_test_df = apply_tfidf_vectorization(train_df, test_df, text_column=text_column, max_features=max_features)
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        vectorizer = TfidfVectorizer(max_features=max_features)
+        x_train, x_test, y_train, y_test = apply_tfidf_vectorization(train_df, test_df, text_column=text_column, max_features=max_features, vectorizer=vectorizer)
 
-        #store the vectorized data
-        vectorized_data_dir = "vectorized_data"
-        os.makedirs(vectorized_data_dir, exist_ok=True)
-        x_train_df.to_csv(os.path.join(vectorized_data_dir, "x_train_tfidf.csv"), index=False)
-        x_test_df.to_csv(os.path.join(vectorized_data_dir, "x_test_tfidf.csv"), index=False)
-        logger.debug(f"Vectorized training and testing data saved successfully to {vectorized_data_dir} directory.")  
+        #store the vectorizer and the vectorized data
+        if write:
+            save_vectorizer(vectorizer, vectorizer_path)
+            save_vectorized_data(x_train, x_test, y_train, y_test, vectorized_data_dir, export_dense=feature_params.get('export_dense_csv', False))
+        elif writer is not None:
+            writer.write(save_vectorizer, vectorizer, vectorizer_path)
+        return x_train, x_test, y_train, y_test
 
     except Exception as e:
         logger.error(f"Error in main function for feature engineering. Error: {e}")
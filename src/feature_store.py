@@ -0,0 +1,217 @@
+import os
+import shutil
+import numpy as np
+
+# The fitted vectorizer, stored next to the features it produced
+VECTORIZER_FILE = "vectorizer.joblib"
+# The fitted dimensionality reduction (None when disabled), stored next to the reduced features
+REDUCER_FILE = "reducer.joblib"
+
+
+def split_paths(data_dir: str, split: str) -> tuple:
+    """
+    Return the feature and label paths of one split ("train" or "test") in a vectorized data directory.
+    Sharded output (a x_<split>_tfidf/ directory of parts) takes precedence over the single-file layout.
+
+    Args:
+        data_dir (str): The vectorized data directory.
+        split (str): The split name.
+    Returns:
+        tuple: The features path and the labels path.
+    """
+    shard_dir = os.path.join(data_dir, f"x_{split}_tfidf")
+    if os.path.isdir(shard_dir):
+        return shard_dir, os.path.join(data_dir, f"y_{split}")
+    return os.path.join(data_dir, f"x_{split}_tfidf.npz"), os.path.join(data_dir, f"y_{split}.npy")
+
+
+def remove_split_outputs(data_dir: str, split: str) -> None:
+    """
+    Delete both layouts of a split so a stale shard directory never shadows a fresh .npz file (or vice versa).
+    """
+    for name in (f"x_{split}_tfidf", f"y_{split}"):
+        path = os.path.join(data_dir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        for suffix in (".npz", ".npy"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def shard_path(directory: str, index: int, suffix: str) -> str:
+    return os.path.join(directory, f"part-{index:05d}{suffix}")
+
+
+def save_shard(features, labels, features_dir: str, labels_dir: str, index: int) -> None:
+    """
+    Write one CSR feature shard and its labels as part-<index>.npz / part-<index>.npy.
+    """
+    from scipy import sparse
+
+    os.makedirs(features_dir, exist_ok=True)
+    os.makedirs(labels_dir, exist_ok=True)
+    sparse.save_npz(shard_path(features_dir, index, ".npz"), sparse.csr_matrix(features), compressed=True)
+    np.save(shard_path(labels_dir, index, ".npy"), np.asarray(labels))
+
+
+def _parts(directory: str, suffix: str) -> list:
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.startswith("part-") and name.endswith(suffix)
+    )
+
+
+def compact_labels(labels: np.ndarray) -> np.ndarray:
+    """
+    The labels in the smallest integer dtype that holds them (uint8 for a handful of classes).
+    """
+    labels = np.asarray(labels)
+    if labels.size == 0 or labels.dtype.kind not in "iu":
+        return labels
+    dtype = np.promote_types(np.min_scalar_type(labels.min()), np.min_scalar_type(labels.max()))
+    return labels.astype(dtype, copy=False)
+
+
+def compact_features(features):
+    """
+    The features as float32, the precision tree models compute in anyway; no copy when they already are.
+    """
+    return features.astype(np.float32, copy=False)
+
+
+def _load_npz(path: str, compact: bool = False):
+    """
+    sparse.load_npz as CSR; with compact the values are converted to float32 on load, so the float64
+    values array is the only full-precision copy that ever exists, and only briefly.
+    """
+    from scipy import sparse
+
+    if not compact:
+        return sparse.load_npz(path).tocsr()
+    with np.load(path, allow_pickle=False) as loaded:
+        matrix_format = loaded["format"].item()
+        matrix_format = matrix_format if isinstance(matrix_format, str) else matrix_format.decode("ascii")
+        if matrix_format != "csr":
+            return compact_features(sparse.load_npz(path).tocsr())
+        data = loaded["data"].astype(np.float32)
+        return sparse.csr_matrix((data, loaded["indices"], loaded["indptr"]), shape=tuple(loaded["shape"]))
+
+
+def load_labels(labels_path: str, compact: bool = False) -> np.ndarray:
+    """
+    Load only the labels of a split (a .npy file or a shard directory), without its features.
+    """
+    paths = _parts(labels_path, ".npy") if os.path.isdir(labels_path) else [labels_path]
+    labels = np.concatenate([np.load(path, allow_pickle=False) for path in paths])
+    return compact_labels(labels) if compact else labels
+
+
+def iter_features(features_path: str, labels_path: str, compact: bool = False):
+    """
+    Yield (features, labels) pairs: once for a single .npz/.npy pair, once per part for a shard directory.
+    With compact the features are float32 and the labels use compact_labels.
+    """
+    if os.path.isdir(features_path):
+        for features_part, labels_part in zip(_parts(features_path, ".npz"), _parts(labels_path, ".npy")):
+            yield _load_npz(features_part, compact), load_labels(labels_part, compact)
+    else:
+        yield _load_npz(features_path, compact), load_labels(labels_path, compact)
+
+
+def load_features(features_path: str, labels_path: str, compact: bool = False) -> tuple:
+    """
+    Load a whole split as one CSR matrix and one label array, stacking shards if needed.
+    """
+    from scipy import sparse
+
+    parts = list(iter_features(features_path, labels_path, compact))
+    if len(parts) == 1:
+        return parts[0]
+    if not parts:
+        raise FileNotFoundError(f"No feature shards found in {features_path}")
+    X = sparse.vstack([features for features, _ in parts], format="csr")
+    y = np.concatenate([labels for _, labels in parts])
+    return X, y
+
+
+def data_mb(features, labels=None) -> float:
+    """
+    Memory held by a feature matrix (dense or sparse) and its labels, in MB.
+    """
+    if hasattr(features, "indptr"):
+        nbytes = features.data.nbytes + features.indices.nbytes + features.indptr.nbytes
+    else:
+        nbytes = np.asarray(features).nbytes
+    if labels is not None:
+        nbytes += np.asarray(labels).nbytes
+    return nbytes / 2 ** 20
+
+
+def _npz_array_headers(path: str) -> dict:
+    """
+    Shape and dtype of every array in an .npz file, read from the .npy headers without loading the arrays.
+    """
+    import zipfile
+
+    headers = {}
+    with zipfile.ZipFile(path) as archive:
+        for name in archive.namelist():
+            with archive.open(name) as member:
+                version = np.lib.format.read_magic(member)
+                if version == (1, 0):
+                    shape, _, dtype = np.lib.format.read_array_header_1_0(member)
+                else:
+                    shape, _, dtype = np.lib.format.read_array_header_2_0(member)
+            headers[name[:-len(".npy")] if name.endswith(".npy") else name] = (shape, dtype)
+    return headers
+
+
+def estimate_split_mb(features_path: str, labels_path: str, compact: bool = False) -> float:
+    """
+    Memory that load_features would need for a split, in MB, from the file headers alone.
+    """
+    if os.path.isdir(features_path):
+        pairs = list(zip(_parts(features_path, ".npz"), _parts(labels_path, ".npy")))
+    else:
+        pairs = [(features_path, labels_path)]
+    nbytes = 0
+    for features_part, labels_part in pairs:
+        for name, (shape, dtype) in _npz_array_headers(features_part).items():
+            if name in ("data", "indices", "indptr"):
+                itemsize = 4 if compact and name == "data" else dtype.itemsize
+                nbytes += int(np.prod(shape)) * itemsize
+        labels = np.load(labels_part, mmap_mode="r", allow_pickle=False)
+        nbytes += labels.shape[0] * (1 if compact else labels.dtype.itemsize)
+    return nbytes / 2 ** 20
+
+
+def save_shared_matrix(matrix, directory: str, name: str, layout: str = "csr") -> None:
+    """
+    Write a sparse matrix as raw float32 data / int32 indices / indptr .npy files (plus its shape),
+    so any number of processes can open it read-only with open_shared_matrix without copying it.
+    layout is "csc" for training matrices (what tree fitting converts to) and "csr" for prediction.
+    """
+    from scipy import sparse
+
+    os.makedirs(directory, exist_ok=True)
+    matrix = (sparse.csc_matrix if layout == "csc" else sparse.csr_matrix)(matrix, dtype=np.float32)
+    matrix.sort_indices()
+    np.save(os.path.join(directory, f"{name}_data.npy"), matrix.data)
+    np.save(os.path.join(directory, f"{name}_indices.npy"), matrix.indices.astype(np.int32))
+    np.save(os.path.join(directory, f"{name}_indptr.npy"), matrix.indptr.astype(np.int32))
+    np.save(os.path.join(directory, f"{name}_shape.npy"), np.asarray(matrix.shape + (layout == "csc",), dtype=np.int64))
+
+
+def open_shared_matrix(directory: str, name: str):
+    """
+    Memory-map a matrix written by save_shared_matrix; the pages are shared by every process that opens it.
+    """
+    from scipy import sparse
+
+    n_rows, n_cols, is_csc = np.load(os.path.join(directory, f"{name}_shape.npy"))
+    parts = [np.load(os.path.join(directory, f"{name}_{part}.npy"), mmap_mode="r") for part in ("data", "indices", "indptr")]
+    matrix_class = sparse.csc_matrix if is_csc else sparse.csr_matrix
+    matrix = matrix_class(tuple(parts), shape=(int(n_rows), int(n_cols)), copy=False)
+    matrix.has_sorted_indices = True
+    return matrix
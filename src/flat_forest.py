@@ -0,0 +1,194 @@
+import json
+import os
+import numpy as np
+
+FLAT_FOREST_VERSION = 1
+ARRAY_NAMES = ("feature", "column", "threshold", "left_child", "value", "roots", "used_features", "classes")
+# Upper bound on the dense block of used feature columns gathered per batch
+BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def _breadth_first_order(children_left, children_right) -> np.ndarray:
+    """
+    Node ids of one tree in breadth-first order, with the two children of a node always adjacent.
+    """
+    order = [0]
+    for node in order:
+        if children_left[node] >= 0:
+            order.extend((children_left[node], children_right[node]))
+    return np.asarray(order, dtype=np.int64)
+
+
+class FlatForest:
+    """
+    A fitted RandomForestClassifier flattened into contiguous arrays, with every node of every tree
+    stored once: the split feature (-1 for leaves), the threshold, the global index of the left child
+    and the class probabilities of the node. Nodes are laid out breadth-first per tree so the right
+    child always follows the left one, and leaves point to themselves with an infinite threshold.
+    The predictor therefore walks all trees in lockstep over a batch, taking max_depth vectorized
+    steps of `node = left_child[node] + (x > threshold[node])` instead of dispatching per tree.
+
+    Only the features the forest splits on (used_features) are ever read; column maps each node to
+    its position in that list, so a CSR batch is gathered into a small dense block once per call.
+
+    Predictions match sklearn bit for bit: features are compared as float32 like sklearn's trees do,
+    leaf probabilities are computed with the same operations as DecisionTreeClassifier.predict_proba,
+    and the per-tree probabilities are summed sequentially in tree order before dividing by the number of trees.
+
+    The lockstep walk is meant for low-latency scoring of small batches. Its cost grows linearly with
+    the batch, while sklearn's per-tree traversal amortizes better: on the pipeline's forest the flat
+    predictor is about 30x faster for one row, but only breaks even at about a thousand rows and is
+    slower beyond (0.7x at 4096). Score large batches with the sklearn model; benchmarks/forest_predict.py
+    measures the crossover for a given forest and machine.
+    """
+
+    def __init__(self, feature, column, threshold, left_child, value, roots, used_features, classes,
+                 n_features: int, max_depth: int):
+        self.feature = feature
+        self.column = column
+        self.threshold = threshold
+        self.left_child = left_child
+        self.value = value
+        self.roots = roots
+        self.used_features = used_features
+        self.classes = classes
+        self.n_features = n_features
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_sklearn(cls, model) -> "FlatForest":
+        """
+        Flatten a fitted single-output RandomForestClassifier.
+        """
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests can be flattened")
+        import sklearn
+
+        n_classes = len(model.classes_)
+        # Since scikit-learn 1.4 tree_.value holds class fractions and predict_proba returns them as is
+        normalize_values = tuple(int(part) for part in sklearn.__version__.split(".")[:2]) < (1, 4)
+        features, thresholds, lefts, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            order = _breadth_first_order(tree.children_left, tree.children_right)
+            new_index = np.empty_like(order)
+            new_index[order] = np.arange(len(order))
+            is_leaf = tree.children_left[order] < 0
+            roots.append(offset)
+            features.append(np.where(is_leaf, -1, tree.feature[order]))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold[order]).astype(np.float64))
+            lefts.append(offset + np.where(is_leaf, np.arange(len(order)), new_index[tree.children_left[order]]))
+            proba = tree.value[order, 0, :n_classes].astype(np.float64)
+            if normalize_values:
+                # Same normalization as DecisionTreeClassifier.predict_proba before scikit-learn 1.4
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba = proba / normalizer
+            values.append(proba)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += tree.node_count
+        if offset > np.iinfo(np.int32).max:
+            raise ValueError(f"Forest has {offset} nodes, too many for int32 node indices")
+
+        feature = np.concatenate(features).astype(np.int32)
+        used_features = np.unique(feature[feature >= 0]).astype(np.int32)
+        column = np.where(feature >= 0, np.searchsorted(used_features, feature), 0).astype(np.int32)
+        return cls(
+            feature=feature,
+            column=column,
+            threshold=np.concatenate(thresholds),
+            left_child=np.concatenate(lefts).astype(np.int32),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int32),
+            used_features=used_features,
+            classes=np.asarray(model.classes_),
+            n_features=int(model.n_features_in_),
+            max_depth=int(max_depth),
+        )
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    def save(self, directory: str) -> None:
+        """
+        Write one .npy file per array plus meta.json, so load() can memory-map every array.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)), allow_pickle=False)
+        meta = {
+            "version": FLAT_FOREST_VERSION,
+            "n_features": self.n_features,
+            "max_depth": self.max_depth,
+            "n_estimators": self.n_estimators,
+            "n_nodes": int(len(self.feature)),
+            "n_used_features": int(len(self.used_features)),
+        }
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=4)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "FlatForest":
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            meta = json.load(f)
+        if meta.get("version") != FLAT_FOREST_VERSION:
+            raise ValueError(f"Unsupported flat forest version {meta.get('version')}, expected {FLAT_FOREST_VERSION}")
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None, allow_pickle=False)
+            for name in ARRAY_NAMES
+        }
+        return cls(n_features=meta["n_features"], max_depth=meta["max_depth"], **arrays)
+
+    def _used_columns(self, X) -> np.ndarray:
+        """
+        Dense float32 block of the used feature columns of X (CSR or dense).
+        """
+        from scipy import sparse
+
+        if sparse.issparse(X):
+            return sparse.csr_matrix(X, dtype=np.float32)[:, self.used_features].toarray()
+        return np.asarray(X, dtype=np.float32)[:, self.used_features]
+
+    def _block_rows(self) -> int:
+        return max(1, BLOCK_BYTES // (4 * max(len(self.used_features), self.n_estimators, 1)))
+
+    def apply(self, X) -> np.ndarray:
+        """
+        Global index of the leaf reached in every tree, shape (n_samples, n_estimators).
+        """
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, but the forest expects {self.n_features}")
+        block_rows = self._block_rows()
+        if X.shape[0] > block_rows:
+            return np.vstack([self.apply(X[start:start + block_rows]) for start in range(0, X.shape[0], block_rows)])
+
+        n_rows = X.shape[0]
+        dense = self._used_columns(X).reshape(-1)
+        column, threshold, left_child = self.column, self.threshold, self.left_child
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.int64) * len(self.used_features), self.n_estimators)
+        nodes = np.tile(np.asarray(self.roots, dtype=np.int64), n_rows)
+        for _ in range(self.max_depth):
+            # sklearn compares the float32 feature value, promoted to double, with the double threshold
+            go_right = np.take(dense, row_offset + np.take(column, nodes)) > np.take(threshold, nodes)
+            nodes = np.take(left_child, nodes) + go_right
+        return nodes.reshape(n_rows, self.n_estimators)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        Class probabilities, averaged over the trees exactly like RandomForestClassifier.predict_proba.
+        Faster than sklearn for small batches only; see the class docstring.
+        """
+        leaves = self.apply(X)
+        block_rows = self._block_rows()
+        total = np.empty((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        for start in range(0, X.shape[0], block_rows):
+            leaf_values = self.value[leaves[start:start + block_rows]]
+            # cumsum adds the trees one by one in order, reproducing sklearn's accumulation
+            total[start:start + block_rows] = np.cumsum(leaf_values, axis=1)[:, -1, :]
+        return total / self.n_estimators
+
+    def predict(self, X) -> np.ndarray:
+        return np.asarray(self.classes).take(np.argmax(self.predict_proba(X), axis=1), axis=0)
@@ -0,0 +1,270 @@
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import numpy as np
+import yaml
+
+from feature_store import REDUCER_FILE, VECTORIZER_FILE
+from pre_processing import LABEL_CLASSES_PATH, TextNormalizer
+
+logs_dir = "logs"
+os.makedirs(logs_dir, exist_ok=True)
+log_file = os.path.join(logs_dir, "inference.log")
+logger = logging.getLogger("inference")
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.INFO)
+
+file_handler = logging.FileHandler(log_file)
+file_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+logger.addHandler(file_handler)
+
+BUNDLE_VERSION = 1
+BUNDLE_DIR = os.path.join("models", "inference_bundle")
+MODEL_PATH = os.path.join("models", "random_forest_model.joblib")
+MANIFEST_FILE = "manifest.json"
+COMPONENT_FILES = {"vectorizer": "vectorizer.joblib", "model": "model.joblib"}
+
+
+def model_proba(model, X) -> np.ndarray:
+    """
+    Class probabilities from any trained classifier. Models without predict_proba (linear SVM,
+    hinge-loss SGD) get a softmax of their decision_function: calibrated it is not, but it ranks the
+    classes like predict does and sums to one.
+    """
+    if hasattr(model, "predict_proba"):
+        return model.predict_proba(X)
+    scores = np.asarray(model.decision_function(X), dtype=np.float64)
+    if scores.ndim == 1:
+        # Binary models return one margin, for the second class
+        scores = np.column_stack((-scores, scores))
+    scores -= scores.max(axis=1, keepdims=True)
+    np.exp(scores, out=scores)
+    scores /= scores.sum(axis=1, keepdims=True)
+    return scores
+
+
+class InferenceBundle:
+    """
+    Everything needed to score raw text: the text normalizer, the fitted vectorizer,
+    the label names in encoded order and the trained model.
+    """
+
+    def __init__(self, normalizer: TextNormalizer, vectorizer, model, classes: list, manifest: dict = None):
+        self.normalizer = normalizer
+        self.vectorizer = vectorizer
+        self.model = model
+        self.classes = np.asarray(classes, dtype=object)
+        self.manifest = manifest or {}
+
+    def transform_texts(self, texts: list):
+        """
+        Normalize and vectorize a batch of raw texts into a CSR feature matrix.
+        """
+        from scipy import sparse
+
+        normalizer = self.normalizer
+        # An SVD reduction produces dense components
+        return sparse.csr_matrix(self.vectorizer.transform([normalizer(text) for text in texts]))
+
+    def predict_texts(self, texts: list) -> list:
+        """
+        Predict the label name of each raw text in the batch.
+        """
+        if len(texts) == 0:
+            return []
+        encoded = self.model.predict(self.transform_texts(texts))
+        return self.classes[np.asarray(encoded, dtype=np.intp)].tolist()
+
+    @property
+    def proba_classes(self) -> np.ndarray:
+        """
+        Label names in the column order of predict_proba_texts.
+        """
+        return self.classes[np.asarray(self.model.classes_, dtype=np.intp)]
+
+    def predict_proba_texts(self, texts: list) -> np.ndarray:
+        """
+        Class probabilities of each raw text, with columns in the order of proba_classes.
+        """
+        return model_proba(self.model, self.transform_texts(texts))
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_bundle(bundle: InferenceBundle, bundle_dir: str = BUNDLE_DIR) -> None:
+    """
+    Write the bundle as a versioned directory: a manifest plus one uncompressed joblib file
+    per component, so the large model arrays can be memory-mapped by load_bundle.
+
+    Args:
+        bundle (InferenceBundle): The bundle to save.
+        bundle_dir (str): The output directory.
+    """
+    try:
+        import joblib
+
+        os.makedirs(bundle_dir, exist_ok=True)
+        files = {}
+        for name, file_name in COMPONENT_FILES.items():
+            path = os.path.join(bundle_dir, file_name)
+            joblib.dump(getattr(bundle, name), path)
+            files[name] = {"file": file_name, "sha256": _sha256(path)}
+
+        manifest = {
+            "bundle_version": BUNDLE_VERSION,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "normalizer": {
+                "language": bundle.normalizer.language,
+                "tokenizer": bundle.normalizer.tokenizer,
+                "fingerprint": bundle.normalizer.fingerprint,
+            },
+            "classes": bundle.classes.tolist(),
+            "vectorizer_type": type(bundle.vectorizer).__name__,
+            "model_type": type(bundle.model).__name__,
+            "files": files,
+        }
+        with open(os.path.join(bundle_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=4)
+        logger.info(f"Inference bundle saved successfully to {bundle_dir}")
+    except Exception as e:
+        logger.error(f"Error saving inference bundle to {bundle_dir}. Error: {e}")
+        raise
+
+
+def load_bundle(bundle_dir: str = BUNDLE_DIR, mmap: bool = True, nltk_data_dir: str = None, verify: bool = False) -> InferenceBundle:
+    """
+    Load a bundle written by save_bundle.
+
+    Args:
+        bundle_dir (str): The bundle directory.
+        mmap (bool): Memory-map the large numpy arrays instead of reading them into memory.
+        nltk_data_dir (str): Optional pinned NLTK data directory for the normalizer.
+        verify (bool): Check the SHA-256 of every component file before loading it.
+    Returns:
+        InferenceBundle: The loaded bundle.
+    Raises:
+        ValueError: If the bundle version is unsupported, a component is corrupt, or the normalizer
+            built here would clean text differently from the one the model was trained with.
+    """
+    try:
+        import joblib
+
+        with open(os.path.join(bundle_dir, MANIFEST_FILE), "r") as f:
+            manifest = json.load(f)
+        if manifest.get("bundle_version") != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported inference bundle version {manifest.get('bundle_version')}, expected {BUNDLE_VERSION}")
+
+        components = {}
+        for name, entry in manifest["files"].items():
+            path = os.path.join(bundle_dir, entry["file"])
+            if verify and _sha256(path) != entry["sha256"]:
+                raise ValueError(f"Inference bundle component {path} does not match its manifest digest")
+            components[name] = joblib.load(path, mmap_mode="r" if mmap else None)
+
+        normalizer_config = manifest["normalizer"]
+        normalizer = TextNormalizer(language=normalizer_config["language"], nltk_data_dir=nltk_data_dir,
+                                    tokenizer=normalizer_config.get("tokenizer", "nltk"))
+        if normalizer.fingerprint != normalizer_config["fingerprint"]:
+            raise ValueError(
+                f"Text normalizer fingerprint {normalizer.fingerprint} does not match the bundle's "
+                f"{normalizer_config['fingerprint']}; the NLTK data or version differs from training"
+            )
+
+        logger.debug(f"Inference bundle loaded successfully from {bundle_dir} (mmap={mmap})")
+        return InferenceBundle(normalizer, components["vectorizer"], components["model"], manifest["classes"], manifest)
+    except Exception as e:
+        logger.error(f"Error loading inference bundle from {bundle_dir}. Error: {e}")
+        raise
+
+
+def build_bundle(params: dict, model=None, nltk_data_dir: str = None) -> InferenceBundle:
+    """
+    Assemble a bundle from the outputs of the pre_processing, feature_engineering, dimensionality_reduction
+    and model stages.
+
+    Args:
+        params (dict): Parsed params.yaml.
+        model: The trained model; loaded from models/ when not given.
+        nltk_data_dir (str): Optional pinned NLTK data directory; defaults to resources.nltk_data_dir.
+    Returns:
+        InferenceBundle: The assembled bundle.
+    """
+    try:
+        import joblib
+
+        if nltk_data_dir is None:
+            nltk_data_dir = params.get('resources', {}).get('nltk_data_dir')
+        if model is None:
+            model = joblib.load(MODEL_PATH)
+        vectorizer = joblib.load(os.path.join("vectorized_data", VECTORIZER_FILE))
+        reducer_path = os.path.join("reduced_data", REDUCER_FILE)
+        reducer = joblib.load(reducer_path) if os.path.exists(reducer_path) else None
+        if reducer is not None:
+            # The model was trained on reduced features, so the bundle reduces what the vectorizer produces
+            from sklearn.pipeline import Pipeline
+            vectorizer = Pipeline([("vectorizer", vectorizer), ("reducer", reducer)])
+        with open(LABEL_CLASSES_PATH, "r") as f:
+            classes = json.load(f)
+        normalizer = TextNormalizer(nltk_data_dir=nltk_data_dir,
+                                    tokenizer=params.get('data_preprocessing', {}).get('tokenizer', 'nltk'))
+        return InferenceBundle(normalizer, vectorizer, model, classes)
+    except Exception as e:
+        logger.error(f"Error building inference bundle. Error: {e}")
+        raise
+
+
+def main(params: dict = None, model=None) -> None:
+    """
+    Run the inference bundle stage.
+
+    :param params: Parsed params.yaml; read from disk when not given
+    :param model: The trained model; loaded from models/ when not given
+    """
+    try:
+        if params is None:
+            with open('params.yaml', 'r') as f:
+                params = yaml.safe_load(f)
+
+        logger.info("Starting main function for the inference bundle")
+        save_bundle(build_bundle(params, model=model), BUNDLE_DIR)
+        logger.info("Inference bundle stage completed successfully")
+    except Exception as e:
+        logger.error(f"Error in main function for the inference bundle. Error: {e}")
+        raise
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Build the inference bundle, or score texts with it.")
+    parser.add_argument("--predict", nargs="+", metavar="TEXT", help="Score these texts with an existing bundle")
+    parser.add_argument("--bundle", default=BUNDLE_DIR, help=f"Bundle directory (default: {BUNDLE_DIR})")
+    args = parser.parse_args()
+
+    if not args.predict:
+        main()
+        return
+    with open('params.yaml', 'r') as f:
+        params = yaml.safe_load(f)
+    bundle = load_bundle(args.bundle, nltk_data_dir=params.get('resources', {}).get('nltk_data_dir'))
+    for text, label in zip(args.predict, bundle.predict_texts(args.predict)):
+        print(f"{label}\t{text}")
+
+
+if __name__ == "__main__":
+    cli()
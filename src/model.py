@@ -1,8 +1,14 @@
-from sklearn.ensemble import RandomForestClassifier
+import contextlib
+import hashlib
+import json
 import logging
 import os
-import pandas as pd
+import shutil
+import numpy as np
 import yaml
+import perf
+from feature_store import (compact_features, compact_labels, data_mb, estimate_split_mb, iter_features, load_features,
+                           load_labels, split_paths)
 
 logs_dir = "logs"
 os.makedirs(logs_dir, exist_ok=True)
@@ -24,52 +30,292 @@ logger.addHandler(console_handler)
 logger.addHandler(file_handler)
 
 
-def load_data(file_path: str):
+@perf.timed(rows=lambda result: result[0].shape[0])
+def load_data(features_path: str, labels_path: str, compact: bool = False):
     """
-    Load data from a CSV file into a pandas DataFrame.
+    Load a sparse feature matrix and its labels written by feature_engineering.
 
     Args:
-        file_path (str): The path to the CSV file."""
+        features_path (str): The path to the .npz file (or shard directory) holding the CSR feature matrix.
+        labels_path (str): The path to the .npy file (or shard directory) holding the labels.
+        compact (bool): Load the features as float32 and the labels in the smallest integer dtype.
+    Returns:
+        tuple: The features as a scipy CSR matrix and the labels as a numpy array."""
     
     try:
-        logger.info(f"Loading data from file: {file_path}")
-        df = pd.read_csv(file_path)
-        logger.debug(f"Data loaded successfully. Number of records: {len(df)} from {file_path}")
-        return df
-    except pd.errors.ParserError as pw:
-        logger.error(f"Parsing error while reading the CSV file: {file_path}. Error: {pw}")
+        logger.info(f"Loading data from file: {features_path}")
+        X, y = load_features(features_path, labels_path, compact=compact)
+        logger.debug(f"Data loaded successfully. Number of records: {X.shape[0]}, Number of features: {X.shape[1]} from {features_path}")
+        logger.info(f"Data in memory: {data_mb(X, y):.1f} MB ({X.dtype} features, {y.dtype} labels, {X.nnz} non-zeros)")
+        return X, y
+    except FileNotFoundError as fnfe:
+        logger.error(f"File not found while loading data: {features_path}. Error: {fnfe}")
         raise
     except Exception as e:
-        logger.error(f"Error during data loading from file: {file_path}. Error: {e}")
+        logger.error(f"Error during data loading from file: {features_path}. Error: {e}")
         raise
 
-def train_model(X_train, y_train,parm: dict)-> RandomForestClassifier:
+def check_memory_budget(features_path: str, labels_path: str, compact: bool, budget_mb: float) -> float:
+    """
+    Estimate the memory training on a split needs and stop before loading it when that exceeds budget_mb.
+    Tree fitting converts the CSR matrix to a float32 CSC copy, so training holds about twice the data.
+
+    Returns:
+        float: The estimate in MB.
+    Raises:
+        MemoryError: If the estimate exceeds budget_mb.
+    """
+    needed_mb = 2 * estimate_split_mb(features_path, labels_path, compact)
+    logger.info(f"Training needs about {needed_mb:.1f} MB for its data" + (f" (budget {budget_mb} MB)" if budget_mb else ""))
+    if budget_mb and needed_mb > budget_mb:
+        raise MemoryError(
+            f"Training data needs about {needed_mb:.1f} MB, more than memory.budget_mb ({budget_mb} MB); "
+            f"lower feature_engineering.max_features, reduce the features with dimensionality_reduction, "
+            f"train out of core with model_training.trainer sgd or raise the budget"
+        )
+    return needed_mb
+
+def data_fingerprint(X, y) -> str:
+    """
+    SHA-256 of a sparse (or dense) feature matrix and its labels, used to match checkpoints to their training data.
+    """
+    from scipy import sparse
+
+    digest = hashlib.sha256()
+    if sparse.issparse(X):
+        X = sparse.csr_matrix(X)
+        for array in (X.indptr, X.indices, X.data):
+            digest.update(np.ascontiguousarray(array).tobytes())
+    else:
+        digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(repr(X.shape).encode("utf-8"))
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()
+
+
+def _checkpoint_key(X, y, parm: dict) -> dict:
+    import sklearn
+
+    # n_estimators may grow between runs and the runtime keys do not change the trees
+    model_params = {key: value for key, value in sorted(parm.items()) if key not in ("n_estimators", "n_jobs", "warm_start", "verbose")}
+    # Trees pickled by another sklearn or numpy must not be unpickled and extended
+    return {"data": data_fingerprint(X, y), "params": json.dumps(model_params, sort_keys=True, default=str),
+            "sklearn": sklearn.__version__, "numpy": np.__version__}
+
+
+def _load_checkpoint(checkpoint_path: str, key: dict):
+    """
+    Return the checkpointed model if it was trained on the same data with the same parameters, else None.
+    """
+    import joblib
+
+    meta_path = checkpoint_path + ".json"
+    if not (os.path.exists(checkpoint_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+    if meta.get("key") != key:
+        logger.info(f"Ignoring checkpoint {checkpoint_path}: it was trained on other data, parameters or library versions")
+        return None
+    model = joblib.load(checkpoint_path)
+    logger.info(f"Resuming from checkpoint {checkpoint_path} with {len(model.estimators_)} trees")
+    return model
+
+
+def _save_checkpoint(model, checkpoint_path: str, key: dict) -> None:
+    import joblib
+
+    os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+    tmp_path = checkpoint_path + ".tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, checkpoint_path)
+    with open(checkpoint_path + ".json.tmp", 'w') as f:
+        json.dump({"key": key, "n_estimators": len(model.estimators_)}, f, indent=4)
+    os.replace(checkpoint_path + ".json.tmp", checkpoint_path + ".json")
+    logger.debug(f"Checkpoint with {len(model.estimators_)} trees saved to {checkpoint_path}")
+
+
+def _build_random_forest(params: dict, n_jobs: int = None):
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(**params)
+
+
+def _build_sgd(params: dict, n_jobs: int = None):
+    from sklearn.linear_model import SGDClassifier
+    return SGDClassifier(**dict(params, n_jobs=n_jobs) if n_jobs is not None else params)
+
+
+def _build_logistic_regression(params: dict, n_jobs: int = None):
+    from sklearn.linear_model import LogisticRegression
+    params = dict(params)
+    if params.setdefault("solver", "liblinear") == "liblinear":
+        # liblinear only fits binary problems, so each class gets its own one-vs-rest model
+        from sklearn.multiclass import OneVsRestClassifier
+        return OneVsRestClassifier(LogisticRegression(**params), n_jobs=n_jobs)
+    return LogisticRegression(**params)
+
+
+def _build_linear_svm(params: dict, n_jobs: int = None):
+    from sklearn.svm import LinearSVC
+    return LinearSVC(**params)
+
+
+# Trainer registry: model_training.trainer -> function(params, n_jobs) building the unfitted estimator
+TRAINERS = {
+    "random_forest": _build_random_forest,
+    "sgd": _build_sgd,
+    "logistic_regression": _build_logistic_regression,
+    "linear_svm": _build_linear_svm,
+}
+# Trainers whose estimators support partial_fit, and so can train out of core over feature shards
+PARTIAL_FIT_TRAINERS = {"sgd"}
+
+
+def register_trainer(name: str, builder, partial_fit: bool = False) -> None:
+    """
+    Add a trainer to the registry. builder(params, n_jobs) returns an unfitted sklearn classifier that
+    accepts CSR input; with partial_fit it must also support partial_fit for out-of-core training.
+    """
+    TRAINERS[name] = builder
+    if partial_fit:
+        PARTIAL_FIT_TRAINERS.add(name)
+
+
+def trainer_params(parm: dict) -> tuple:
+    """
+    Split model_training into the trainer name and the parameters of its estimator.
+    The forest's parameters sit directly under model_training; every other trainer reads its own
+    sub-section (model_training.sgd, model_training.logistic_regression, ...).
+
+    Returns:
+        tuple: The trainer name and its parameters.
+    """
+    params = dict(parm)
+    trainer = params.pop("trainer", "random_forest")
+    if trainer not in TRAINERS:
+        raise ValueError(f"Unknown trainer '{trainer}', expected one of {tuple(TRAINERS)}")
+    sections = {name: params.pop(name) for name in TRAINERS if isinstance(params.get(name), dict)}
+    if trainer == "random_forest":
+        return trainer, params
+    return trainer, dict(sections.get(trainer) or {})
+
+
+def is_forest(model) -> bool:
+    from sklearn.ensemble import RandomForestClassifier
+    return isinstance(model, RandomForestClassifier)
+
+
+@perf.timed(rows="X_train")
+def train_model(X_train, y_train, parm: dict, n_jobs: int = None, backend: str = None,
+                trees_per_checkpoint: int = None, checkpoint_path: str = None):
     """
-    Train a RandomForestClassifier model.
+    Train the model selected by parm's trainer (random_forest when not set) on the CSR training features.
+
+    The linear trainers (sgd, logistic_regression, linear_svm) fit directly on the sparse matrix in one call.
+    For the forest, with trees_per_checkpoint and checkpoint_path the forest is grown with warm_start in batches of
+    trees_per_checkpoint trees and checkpointed after each batch. A later run on the same data and
+    parameters resumes from the checkpoint, and a larger n_estimators only trains the missing trees.
+    sklearn draws the seed of every tree from random_state in order, so the result is the same forest
+    a single fit would build.
 
     Args:
-        X_train (pd.DataFrame): Training features.
-        y_train (pd.Series): Training labels.
+        X_train (scipy.sparse.csr_matrix): Training features.
+        y_train (np.ndarray): Training labels.
+        parm (dict): model_training in params.yaml, see trainer_params.
+        n_jobs (int): Number of parallel tree builders (or one-vs-rest fits), -1 for every core. Overrides parm's n_jobs.
+        backend (str): joblib backend for tree building ("threading", "loky", ...); sklearn's default when None.
+        trees_per_checkpoint (int): Trees added between two checkpoints; None trains in one fit.
+        checkpoint_path (str): Path of the checkpoint file.
 
     Returns:
-        RandomForestClassifier: Trained model.
+        The trained classifier.
     """
     try:
-        logger.info("Starting model training")
-        model = RandomForestClassifier(**parm)
-        model.fit(X_train, y_train)
+        from joblib import parallel_config
+        trainer, model_params = trainer_params(parm)
+        logger.info(f"Starting model training with trainer: {trainer}")
+        if trainer != "random_forest":
+            model = TRAINERS[trainer](model_params, n_jobs)
+            with parallel_config(backend=backend) if backend else contextlib.nullcontext():
+                model.fit(X_train, y_train)
+            logger.debug("Model training completed successfully")
+            return model
+
+        if n_jobs is not None:
+            model_params["n_jobs"] = n_jobs
+        n_estimators = model_params.get("n_estimators", 100)
+
+        with parallel_config(backend=backend) if backend else contextlib.nullcontext():
+            if not (trees_per_checkpoint and checkpoint_path):
+                model = _build_random_forest(model_params)
+                model.fit(X_train, y_train)
+                # The training parallelism is not kept for prediction
+                model.set_params(n_jobs=parm.get("n_jobs"))
+                logger.debug("Model training completed successfully")
+                return model
+
+            key = _checkpoint_key(X_train, y_train, model_params)
+            model = _load_checkpoint(checkpoint_path, key)
+            if model is None:
+                model = _build_random_forest(model_params)
+            elif len(model.estimators_) > n_estimators:
+                # The first n trees of a larger forest are exactly the forest a fresh fit would build
+                model.estimators_ = model.estimators_[:n_estimators]
+            model.set_params(**dict(model_params, warm_start=True))
+
+            while len(getattr(model, "estimators_", [])) < n_estimators:
+                target = min(len(getattr(model, "estimators_", [])) + trees_per_checkpoint, n_estimators)
+                model.set_params(n_estimators=target)
+                model.fit(X_train, y_train)
+                _save_checkpoint(model, checkpoint_path, key)
+                logger.info(f"Trained {target}/{n_estimators} trees")
+
+        model.set_params(n_estimators=n_estimators, n_jobs=parm.get("n_jobs"), warm_start=parm.get("warm_start", False))
         logger.debug("Model training completed successfully")
         return model
     except Exception as e:
         logger.error(f"Error during model training: {e}")
         raise
 
-def save_model(model: RandomForestClassifier, model_path: str) -> None:
+def train_out_of_core(batches, classes: np.ndarray, parm: dict, n_jobs: int = None, epochs: int = 5):
+    """
+    Train a partial_fit trainer (see PARTIAL_FIT_TRAINERS) without holding the training split in memory.
+
+    Args:
+        batches: Function returning a fresh iterator of (features, labels) pairs, e.g. the shards of iter_features.
+        classes (np.ndarray): Every label of the training split.
+        parm (dict): model_training in params.yaml.
+        n_jobs (int): Number of parallel one-vs-all fits.
+        epochs (int): Passes over the batches.
+    Returns:
+        The trained classifier.
+    """
+    try:
+        trainer, model_params = trainer_params(parm)
+        if trainer not in PARTIAL_FIT_TRAINERS:
+            raise ValueError(f"Trainer '{trainer}' does not support partial_fit; use one of {sorted(PARTIAL_FIT_TRAINERS)}")
+        logger.info(f"Starting out-of-core training with trainer: {trainer}, {epochs} epochs")
+        model = TRAINERS[trainer](model_params, n_jobs)
+        with perf.track("train_model") as section:
+            for epoch in range(epochs):
+                n_rows = 0
+                for X_batch, y_batch in batches():
+                    model.partial_fit(X_batch, y_batch, classes=classes)
+                    n_rows += X_batch.shape[0]
+                logger.debug(f"Epoch {epoch + 1}/{epochs} done over {n_rows} rows")
+            section.rows = n_rows * epochs
+        logger.debug("Model training completed successfully")
+        return model
+    except Exception as e:
+        logger.error(f"Error during out-of-core model training: {e}")
+        raise
+
+def save_model(model, model_path: str) -> None:
     """
     Save the trained model to a file.
 
     Args:
-        model (RandomForestClassifier): The trained model.
+        model: The trained classifier.
         model_path (str): The path to save the model file.
     """
     try:
@@ -87,32 +333,103 @@ def save_model(model: RandomForestClassifier, model_path: str) -> None:
         logger.error(f"Error saving the model: {e}")
         raise
 
-def main():
+def export_flat_forest(model, flat_forest_dir: str) -> None:
+    """
+    Export the trained forest as flat NumPy arrays for the low-latency FlatForest predictor.
+    Other trainers' models have no flattened form; flat_forest_dir is then left empty.
+
+    Args:
+        model: The trained model.
+        flat_forest_dir (str): The directory for the .npy files.
+    """
+    try:
+        from flat_forest import FlatForest
+        if not is_forest(model):
+            # Clear a stale forest export; the directory stays, as the DVC stage output
+            shutil.rmtree(flat_forest_dir, ignore_errors=True)
+            os.makedirs(flat_forest_dir, exist_ok=True)
+            logger.info(f"{type(model).__name__} is not a forest; no flattened forest exported")
+            return
+        logger.info(f"Exporting flattened forest to {flat_forest_dir}")
+        FlatForest.from_sklearn(model).save(flat_forest_dir)
+        logger.debug("Flattened forest exported successfully")
+    except Exception as e:
+        logger.error(f"Error exporting the flattened forest: {e}")
+        raise
+
+@perf.stage("model_training")
+def main(params: dict = None, X_train=None, y_train=None, write: bool = True):
+    """
+    Run the model training stage.
+
+    Args:
+        params (dict): Parsed params.yaml; read from disk when not given.
+        X_train (scipy.sparse.csr_matrix): Training features; read from reduced_data/ when not given.
+        y_train (np.ndarray): Training labels.
+        write (bool): Save the model file and the flattened forest. The in-process pipeline runner may defer this.
+    Returns:
+        The trained model.
+    """
     try:
         # Load parameters
-        with open('params.yaml', 'r') as f:
-            params = yaml.safe_load(f)
+        if params is None:
+            with open('params.yaml', 'r') as f:
+                params = yaml.safe_load(f)
         
         model_params = params['model_training']
+        # Runtime options live outside model_training: they change how the forest is built, not the forest
+        runtime_params = params.get('training', {})
+        checkpoint_dir = runtime_params.get('checkpoint_dir', "cache/checkpoints")
         
-        train_file_path = "vectorized_data/x_train_tfidf.csv"
-        test_file_path = "vectorized_data/x_test_tfidf.csv"
+        memory_params = params.get('memory', {})
+        compact = memory_params.get('compact', True)
+        
+        features_dir = "reduced_data"
         model_save_path = "models/random_forest_model.joblib"
+        flat_forest_dir = "models/flat_forest"
 
-        logger.info("Loading training data")
-        train_df = load_data(train_file_path)
-        logger.info("Loading testing data")
-        test_df = load_data(test_file_path)
-
-        X_train = train_df.drop("label", axis=1)
-        y_train = train_df["label"]
+        trainer, _ = trainer_params(model_params)
+        out_of_core = trainer in PARTIAL_FIT_TRAINERS and runtime_params.get('out_of_core', False)
+        if X_train is None or y_train is None:
+            train_paths = split_paths(features_dir, "train")
+            if not out_of_core:
+                try:
+                    check_memory_budget(*train_paths, compact, memory_params.get('budget_mb'))
+                except MemoryError:
+                    if trainer not in PARTIAL_FIT_TRAINERS:
+                        raise
+                    logger.warning(f"Training data exceeds memory.budget_mb; training {trainer} out of core instead")
+                    out_of_core = True
+            if out_of_core:
+                batches = lambda: iter_features(*train_paths, compact=compact)
+                classes = np.unique(load_labels(train_paths[1], compact=compact))
+            else:
+                logger.info("Loading training data")
+                X_train, y_train = load_data(*train_paths, compact=compact)
+        else:
+            if compact:
+                X_train, y_train = compact_features(X_train), compact_labels(y_train)
+            if out_of_core:
+                # Features passed in by the in-process runner are already in memory: partial_fit over row batches of them
+                chunk_rows = memory_params.get('chunk_rows', 50000)
+                batches = lambda: ((X_train[start:start + chunk_rows], y_train[start:start + chunk_rows])
+                                   for start in range(0, X_train.shape[0], chunk_rows))
+                classes = np.unique(y_train)
 
-        X_test = test_df.drop("label", axis=1)
-        y_test = test_df["label"]
+        if out_of_core:
+            model = train_out_of_core(batches, classes, model_params,
+                                      n_jobs=runtime_params.get('n_jobs'), epochs=runtime_params.get('epochs', 5))
+        else:
+            model = train_model(X_train, y_train, model_params,
+                                n_jobs=runtime_params.get('n_jobs'),
+                                backend=runtime_params.get('backend'),
+                                trees_per_checkpoint=runtime_params.get('trees_per_checkpoint'),
+                                checkpoint_path=os.path.join(checkpoint_dir, "random_forest.joblib"))
 
-        model = train_model(X_train, y_train, model_params)
-
-        save_model(model, model_save_path)
+        if write:
+            save_model(model, model_save_path)
+            export_flat_forest(model, flat_forest_dir)
+        return model
 
     except Exception as e:
         logger.error(f"Error in main function for model training: {e}")
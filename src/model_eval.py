@@ -1,11 +1,10 @@
-from sklearn.metrics import accuracy_score,precision_score,recall_score,classification_report
-import pandas as pd 
 import logging 
 import os 
-import joblib
 import json
+import numpy as np
 import yaml
-from dvclive import Live
+import perf
+from feature_store import compact_features, compact_labels, data_mb, estimate_split_mb, iter_features, load_features, split_paths
 logs_dir = "logs"
 os.makedirs(logs_dir, exist_ok=True)
 
@@ -33,6 +32,7 @@ def load_model(model_path):
     :param model_path: Path to the saved model file
     """
     try:
+        import joblib
         logger.info("Model loading started")
         model = joblib.load(model_path)
         logger.debug(f"Model loaded successfully from {model_path}")
@@ -42,27 +42,34 @@ def load_model(model_path):
         raise
 
 
-def load_data(data_path:str):
+@perf.timed(rows=lambda result: result[0].shape[0])
+def load_data(features_path:str, labels_path:str, compact: bool = False):
     """
-    Docstring for load_data
+    Load the sparse feature matrix and labels written by feature_engineering.
     
-    :param data_path: Description
-    :type data_path: str
+    :param features_path: Path to the .npz file (or shard directory) holding the CSR feature matrix
+    :type features_path: str
+    :param labels_path: Path to the .npy file (or shard directory) holding the labels
+    :type labels_path: str
+    :param compact: Load the features as float32 and the labels in the smallest integer dtype
+    :type compact: bool
     """
 
     try:
         logger.info("Data loading started")
-        df = pd.read_csv(data_path)
-        logger.debug(f"Data loaded successfully from {data_path}")
-        return df
+        X, y = load_features(features_path, labels_path, compact=compact)
+        logger.debug(f"Data loaded successfully from {features_path}. Shape: {X.shape}")
+        logger.info(f"Data in memory: {data_mb(X, y):.1f} MB ({X.dtype} features, {y.dtype} labels)")
+        return X, y
     except Exception as e:
-        logger.error(f"Failed to load data from {data_path}. Error: {e}")
+        logger.error(f"Failed to load data from {features_path}. Error: {e}")
         raise
 
 
+@perf.timed(rows="X_test")
 def evaluate_model(model, X_test, y_test, average='weighted'):
     """
-    Evaluate the model and return metrics.
+    Evaluate the model and return metrics. Any trainer backend's model works: only predict is used.
     
     :param model: Trained model
     :param X_test: Test features
@@ -71,7 +78,48 @@ def evaluate_model(model, X_test, y_test, average='weighted'):
     """
     try:
         logger.info("Model evaluation started")
-        y_pred = model.predict(X_test)
+        return score_predictions(y_test, model.predict(X_test), average=average)
+    except Exception as e:
+        logger.error(f"Error during model evaluation. Error: {e}")
+        raise
+
+
+def evaluate_in_chunks(model, batches, chunk_rows: int = 50000, average='weighted'):
+    """
+    Evaluate the model on (features, labels) batches, e.g. the shards of iter_features, predicting
+    chunk_rows rows at a time, so only one batch of the test split is in memory at a time.
+    
+    :param model: Trained model
+    :param batches: Iterable of (features, labels) pairs
+    :param chunk_rows: Rows per predict call
+    :param average: Averaging strategy for precision and recall
+    """
+    try:
+        logger.info("Chunked model evaluation started")
+        with perf.track("evaluate_model") as section:
+            y_true, y_pred = [], []
+            for X_batch, y_batch in batches:
+                for start in range(0, X_batch.shape[0], chunk_rows):
+                    y_pred.append(model.predict(X_batch[start:start + chunk_rows]))
+                y_true.append(y_batch)
+            y_true = np.concatenate(y_true)
+            section.rows = len(y_true)
+            return score_predictions(y_true, np.concatenate(y_pred), average=average)
+    except Exception as e:
+        logger.error(f"Error during chunked model evaluation. Error: {e}")
+        raise
+
+
+def score_predictions(y_test, y_pred, average='weighted'):
+    """
+    Compute and log the evaluation metrics of predictions.
+    
+    :param y_test: Test labels
+    :param y_pred: Predicted labels
+    :param average: Averaging strategy for precision and recall
+    """
+    try:
+        from sklearn.metrics import accuracy_score,precision_score,recall_score,classification_report
         
         accuracy = accuracy_score(y_test, y_pred)
         precision = precision_score(y_test, y_pred, average=average)
@@ -92,7 +140,7 @@ def evaluate_model(model, X_test, y_test, average='weighted'):
             'classification_report': report
         }
     except Exception as e:
-        logger.error(f"Error during model evaluation. Error: {e}")
+        logger.error(f"Error scoring predictions. Error: {e}")
         raise
 
 
@@ -120,53 +168,89 @@ def save_metrics_to_json(metrics: dict, output_path: str) -> None:
         raise
 
 
-def main():
+def log_to_live(live, metrics: dict, model_params: dict, feature_params: dict) -> None:
+    """
+    Log the training and feature parameters and the evaluation metrics to a dvclive Live run.
+
+    :param live: An open dvclive Live run
+    :param metrics: Metrics returned by evaluate_model
+    :param model_params: The model_training parameters
+    :param feature_params: The feature_engineering parameters
+    """
+    live.log_params(model_params)
+    live.log_param("max_features", feature_params['max_features'])
+    live.log_metric("accuracy", metrics['accuracy'])
+    live.log_metric("precision", metrics['precision'])
+    live.log_metric("recall", metrics['recall'])
+
+
+def main(params: dict = None, model=None, X_test=None, y_test=None):
     """
     Main function to evaluate the trained model.
+    The model and test data are loaded from disk unless the in-process pipeline runner passes them in.
+
+    :param params: Parsed params.yaml; read from disk when not given
+    :param model: Trained model
+    :param X_test: Test features
+    :param y_test: Test labels
+    :return: The evaluation metrics
     """
     try:
         # Load parameters
-        with open('params.yaml', 'r') as f:
-            params = yaml.safe_load(f)
+        if params is None:
+            with open('params.yaml', 'r') as f:
+                params = yaml.safe_load(f)
         
         eval_params = params['model_evaluation']
         model_params = params['model_training']
         feature_params = params['feature_engineering']
         
         logger.info("Starting model evaluation process")
+        from dvclive import Live
         
-        # Initialize DVCLive for experiment tracking
-        with Live(save_dvc_exp=True) as live:
-            
-            # Log parameters from all stages
-            live.log_params(model_params)
-            live.log_param("max_features", feature_params['max_features'])
+        # Initialize DVCLive for experiment tracking. The stage's perf report is written when the inner
+        # block ends, so it is in the workspace before Live saves the experiment
+        with Live(save_dvc_exp=True) as live, perf.stage("model_evaluation"):
             
             # Load the trained model
-            model_path = "models/random_forest_model.joblib"
-            model = load_model(model_path)
+            if model is None:
+                model_path = "models/random_forest_model.joblib"
+                model = load_model(model_path)
             
-            # Load test data
-            test_data_path = "vectorized_data/x_test_tfidf.csv"
-            test_df = load_data(test_data_path)
-            
-            # Split features and labels
-            X_test = test_df.drop("label", axis=1)
-            y_test = test_df["label"]
+            # Load test features and labels; above the memory budget, stream them instead
+            memory_params = params.get('memory', {})
+            compact = memory_params.get('compact', True)
+            budget_mb = memory_params.get('budget_mb')
+            if X_test is None or y_test is None:
+                test_paths = split_paths("reduced_data", "test")
+                needed_mb = estimate_split_mb(*test_paths, compact)
+                if budget_mb and needed_mb > budget_mb:
+                    logger.warning(f"Test data needs about {needed_mb:.1f} MB, more than memory.budget_mb ({budget_mb} MB); evaluating in chunks")
+                    metrics = evaluate_in_chunks(model, iter_features(*test_paths, compact=compact),
+                                                 chunk_rows=memory_params.get('chunk_rows', 50000), average=eval_params['average'])
+                else:
+                    X_test, y_test = load_data(*test_paths, compact=compact)
+            elif compact:
+                X_test, y_test = compact_features(X_test), compact_labels(y_test)
             
             # Evaluate the model
-            metrics = evaluate_model(model, X_test, y_test, average=eval_params['average'])
+            if X_test is not None:
+                metrics = evaluate_model(model, X_test, y_test, average=eval_params['average'])
             
-            # Log metrics with DVCLive
-            live.log_metric("accuracy", metrics['accuracy'])
-            live.log_metric("precision", metrics['precision'])
-            live.log_metric("recall", metrics['recall'])
+            # Log parameters from all stages and metrics with DVCLive
+            log_to_live(live, metrics, model_params, feature_params)
+
+            # Log the performance of every stage, this one so far included
+            perf_reports = perf.load_reports()
+            perf_reports["model_evaluation"] = {"total": {}, "sections": perf.snapshot()}
+            perf.log_to_live(live, perf_reports)
             
             # Save metrics to JSON file
             metrics_output_path = "metrics/evaluation_metrics.json"
             save_metrics_to_json(metrics, metrics_output_path)
             
             logger.info("Model evaluation completed successfully")
+        return metrics
         
     except Exception as e:
         logger.error(f"Error in main function for model evaluation. Error: {e}")
@@ -0,0 +1,270 @@
+import functools
+import glob
+import inspect
+import json
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PERF_DIR = "metrics/perf"
+
+_lock = threading.Lock()
+# Sections recorded by threads outside any stage, e.g. a benchmark's or a background writer's
+_sections = {}
+# Every open section of every thread; the peak RSS is process-wide, so all of them observe it before a reset
+_active = set()
+# Per thread: the stack of open sections and the sections of the stage running on the thread
+_local = threading.local()
+
+
+def _open_sections() -> list:
+    stack = getattr(_local, "open", None)
+    if stack is None:
+        stack = _local.open = []
+    return stack
+
+
+def _recorded() -> dict:
+    """
+    Where this thread's sections are added: its running stage's report, or _sections outside a stage.
+    """
+    sections = getattr(_local, "sections", None)
+    return _sections if sections is None else sections
+
+
+def _read_peak_rss_mb():
+    """
+    Peak resident set size of this process in MB: VmHWM on Linux, ru_maxrss elsewhere; None when unavailable.
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def _reset_peak_rss() -> None:
+    """
+    Restart the VmHWM peak from the current RSS, so a section measures its own peak (Linux only).
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _cpu_seconds() -> float:
+    """
+    CPU time of this process and of its finished child processes (e.g. process pool workers).
+    """
+    cpu = time.process_time()
+    if resource is not None:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu += children.ru_utime + children.ru_stime
+    return cpu
+
+
+def _count_rows(value) -> int:
+    if value is None:
+        return None
+    if hasattr(value, "shape"):
+        return int(value.shape[0])
+    return len(value)
+
+
+class Section:
+    """
+    Context manager that records the wall time, CPU time, peak RSS and rows of a section of a stage.
+
+    Repeated sections with the same name (e.g. one per batch) are added together. The rows can be
+    given up front or set on the returned object before the block ends:
+
+        with perf.track("read_table") as section:
+            df = pd.read_csv(path)
+            section.rows = len(df)
+
+    The peak RSS is the peak of the whole process while the section ran; on Linux it is reset at
+    the start of every section, and a nested section's peak is carried over to its enclosing one.
+    Sections nest and are reported per thread: a section opened on a background thread is neither
+    nested in nor reported by the stage running on the main thread.
+    """
+
+    def __init__(self, name: str, rows: int = None):
+        self.name = name
+        self.rows = rows
+        self.peak_rss_mb = None
+
+    def __enter__(self) -> "Section":
+        with _lock:
+            if _active:
+                peak_mb = _read_peak_rss_mb()
+                for section in _active:
+                    section._observe_peak(peak_mb)
+            _reset_peak_rss()
+            _active.add(self)
+            _open_sections().append(self)
+        self._wall = time.perf_counter()
+        self._cpu = _cpu_seconds()
+        return self
+
+    def _observe_peak(self, peak_mb) -> None:
+        if peak_mb is not None:
+            self.peak_rss_mb = peak_mb if self.peak_rss_mb is None else max(self.peak_rss_mb, peak_mb)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        wall = time.perf_counter() - self._wall
+        cpu = _cpu_seconds() - self._cpu
+        with _lock:
+            self._observe_peak(_read_peak_rss_mb())
+            _active.discard(self)
+            stack = _open_sections()
+            if self in stack:
+                stack.remove(self)
+            if stack:
+                stack[-1]._observe_peak(self.peak_rss_mb)
+            if exc_type is None:
+                _add(_recorded(), self.name, wall, cpu, self.peak_rss_mb, self.rows)
+
+
+def track(name: str, rows: int = None) -> Section:
+    return Section(name, rows)
+
+
+def _add(sections: dict, name: str, wall: float, cpu: float, peak_rss_mb, rows) -> None:
+    section = sections.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": None, "rows": None})
+    section["calls"] += 1
+    section["wall_s"] += wall
+    section["cpu_s"] += cpu
+    if peak_rss_mb is not None:
+        section["peak_rss_mb"] = max(section["peak_rss_mb"] or 0.0, peak_rss_mb)
+    if rows is not None:
+        section["rows"] = (section["rows"] or 0) + int(rows)
+
+
+def timed(name: str = None, rows=None):
+    """
+    Decorator form of track. rows is the name of an argument whose length (or number of matrix rows)
+    is the row count, or a function of the return value.
+    """
+    def decorator(func):
+        section_name = name or func.__name__
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Section(section_name) as section:
+                result = func(*args, **kwargs)
+                if isinstance(rows, str):
+                    section.rows = _count_rows(signature.bind(*args, **kwargs).arguments.get(rows))
+                elif rows is not None:
+                    section.rows = rows(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def _with_rate(section: dict) -> dict:
+    section = dict(section)
+    if section["rows"] is not None:
+        section["rows_per_s"] = section["rows"] / section["wall_s"] if section["wall_s"] > 0 else None
+    return section
+
+
+def snapshot() -> dict:
+    """
+    The sections recorded so far on this thread's stage (or outside any stage), with rows_per_s added
+    where rows are known.
+    """
+    with _lock:
+        return {name: _with_rate(section) for name, section in _recorded().items()}
+
+
+def reset() -> None:
+    with _lock:
+        _recorded().clear()
+
+
+def stage_path(stage: str, perf_dir: str = PERF_DIR) -> str:
+    return os.path.join(perf_dir, f"{stage}.json")
+
+
+class StageReport:
+    """
+    Record a whole pipeline stage and write its sections to metrics/perf/<stage>.json.
+
+    The report has the stage totals under "total" and one entry per section under "sections";
+    it is a DVC metrics file, so `dvc metrics diff` shows timing and memory changes. Usable as a
+    context manager or as a decorator of the stage's main().
+    """
+
+    def __init__(self, name: str, perf_dir: str = PERF_DIR):
+        self.name = name
+        self.perf_dir = perf_dir
+
+    def __enter__(self) -> "StageReport":
+        self._outer = getattr(_local, "sections", None)
+        _local.sections = {}
+        self._total = Section(self.name)
+        self._total.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._total.__exit__(exc_type, exc, tb)
+        sections = snapshot()
+        _local.sections = self._outer
+        if exc_type is not None:
+            return
+        report = {"total": sections.pop(self.name), "sections": sections}
+        # The stage processed as many rows as its largest section
+        report["total"]["rows"] = max((section["rows"] or 0 for section in sections.values()), default=0) or None
+        report["total"] = _with_rate(report["total"])
+        os.makedirs(self.perf_dir, exist_ok=True)
+        with open(stage_path(self.name, self.perf_dir), "w") as f:
+            json.dump(report, f, indent=4)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with StageReport(self.name, self.perf_dir):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def stage(name: str, perf_dir: str = PERF_DIR) -> StageReport:
+    return StageReport(name, perf_dir)
+
+
+def load_reports(perf_dir: str = PERF_DIR) -> dict:
+    """
+    Every stage report in perf_dir, keyed by stage name.
+    """
+    reports = {}
+    for path in sorted(glob.glob(os.path.join(perf_dir, "*.json"))):
+        with open(path, "r") as f:
+            reports[os.path.splitext(os.path.basename(path))[0]] = json.load(f)
+    return reports
+
+
+def log_to_live(live, reports: dict) -> None:
+    """
+    Log the totals and sections of stage reports to a dvclive run as perf/<stage>/<section>/<measure>.
+    """
+    for stage_name, report in reports.items():
+        entries = {"total": report["total"], **report.get("sections", {})}
+        for section_name, section in entries.items():
+            for measure in ("wall_s", "cpu_s", "peak_rss_mb", "rows_per_s"):
+                if section.get(measure) is not None:
+                    live.log_metric(f"perf/{stage_name}/{section_name}/{measure}", section[measure], plot=False)
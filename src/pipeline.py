@@ -0,0 +1,157 @@
+import argparse
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import yaml
+
+import data_injection
+import dimensionality_reduction
+import pre_processing
+import feature_engineering
+import inference
+import model
+import model_eval
+
+logs_dir = "logs"
+os.makedirs(logs_dir, exist_ok=True)
+log_file = os.path.join(logs_dir, "pipeline.log")
+logger = logging.getLogger("pipeline")
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.INFO)
+
+file_handler = logging.FileHandler(log_file)
+file_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+logger.addHandler(file_handler)
+
+ARTIFACT_MODES = ("sync", "background", "none")
+
+
+class ArtifactWriter:
+    """
+    Writes the intermediate DVC outputs of the in-process pipeline.
+    "sync" writes each artifact before the next stage starts, "background" hands it to a writer
+    thread while the next stage runs, and "none" skips it.
+    """
+
+    def __init__(self, mode: str = "background"):
+        if mode not in ARTIFACT_MODES:
+            raise ValueError(f"Unknown artifact mode '{mode}', expected one of {ARTIFACT_MODES}")
+        self.mode = mode
+        self.executor = ThreadPoolExecutor(max_workers=2) if mode == "background" else None
+        self.pending = []
+
+    def write(self, func, *args, **kwargs) -> None:
+        if self.mode == "sync":
+            func(*args, **kwargs)
+        elif self.mode == "background":
+            self.pending.append(self.executor.submit(func, *args, **kwargs))
+
+    def flush(self) -> None:
+        """
+        Wait for the background writes submitted so far and re-raise the first failure.
+        """
+        pending, self.pending = self.pending, []
+        for future in pending:
+            future.result()
+
+    def close(self) -> None:
+        """
+        Wait for every background write and re-raise the first failure.
+        """
+        if self.executor is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self.executor.shutdown()
+
+
+def run_pipeline(params: dict, artifacts: str = "background") -> dict:
+    """
+    Run data_injection -> pre_processing -> feature_engineering -> dimensionality_reduction -> model -> model_eval
+    in one process, passing DataFrames, sparse matrices and the model between stages in memory.
+    The inference bundle is written like the other artifacts.
+
+    Args:
+        params (dict): Parsed params.yaml, shared by every stage.
+        artifacts (str): "sync", "background" or "none"; see ArtifactWriter.
+    Returns:
+        dict: The evaluation metrics.
+    """
+    writer = ArtifactWriter(artifacts)
+    try:
+        logger.info(f"Starting in-process pipeline with artifacts={artifacts}")
+        fmt = params.get('storage', {}).get('format', 'csv')
+        raw = data_injection.main(params=params, write=False)
+        if raw is None:
+            # Streaming ingestion writes raw_data/ directly; pre_processing reads it back.
+            train_raw = test_raw = None
+        else:
+            train_raw, test_raw = raw
+            writer.write(data_injection.save_data_to_csv, train_raw, test_raw, path="raw_data", fmt=fmt)
+
+        train_clean, test_clean = pre_processing.main(params=params, train_df=train_raw, test_df=test_raw, write=False,
+                                                     writer=writer)
+        writer.write(pre_processing.save_cleaned_data, train_clean, test_clean, fmt=fmt)
+
+        feature_params = params['feature_engineering']
+        features = feature_engineering.main(params=params, train_df=train_clean, test_df=test_clean, write=False,
+                                            writer=writer)
+        if features is None:
+            # Hashing mode writes its shards while streaming; later stages read them back.
+            X_train = y_train = X_test = y_test = None
+        else:
+            X_train, X_test, y_train, y_test = features
+            writer.write(feature_engineering.save_vectorized_data, X_train, X_test, y_train, y_test,
+                         export_dense=feature_params.get('export_dense_csv', False))
+
+        reduced = dimensionality_reduction.main(params=params, X_train=X_train, y_train=y_train,
+                                                X_test=X_test, y_test=y_test, write=False, writer=writer)
+        if reduced is None:
+            # Without a reduction the hashed shards are linked into reduced_data/ and read back.
+            X_train = y_train = X_test = y_test = None
+        else:
+            X_train, X_test, y_train, y_test = reduced
+            writer.write(dimensionality_reduction.save_reduced_data, X_train, X_test, y_train, y_test)
+
+        trained_model = model.main(params=params, X_train=X_train, y_train=y_train, write=False)
+        # The bundle is built from the vectorizer, reducer and label mapping written above
+        writer.flush()
+        writer.write(model.save_model, trained_model, "models/random_forest_model.joblib")
+        writer.write(model.export_flat_forest, trained_model, "models/flat_forest")
+        writer.write(inference.main, params=params, model=trained_model)
+        # model_evaluation saves the DVC experiment, which must see the finished model and bundle
+        writer.flush()
+
+        metrics = model_eval.main(params=params, model=trained_model, X_test=X_test, y_test=y_test)
+        logger.info("In-process pipeline completed successfully")
+        return metrics
+    except Exception as e:
+        logger.error(f"In-process pipeline failed. Error: {e}")
+        raise
+    finally:
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every pipeline stage in a single process.")
+    parser.add_argument("--params", default="params.yaml", help="Path to params.yaml")
+    parser.add_argument("--artifacts", choices=ARTIFACT_MODES, default="background",
+                        help="How to write intermediate DVC outputs (default: background)")
+    args = parser.parse_args()
+
+    with open(args.params, 'r') as f:
+        params = yaml.safe_load(f)
+    run_pipeline(params, artifacts=args.artifacts)
+
+
+if __name__ == "__main__":
+    main()
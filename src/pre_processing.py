@@ -1,22 +1,22 @@
 import logging 
 import pandas as pd
 import os
-import string
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
-
-nltk.download('stopwords')
-nltk.download('punkt')
-ps = PorterStemmer()
+import functools
+import hashlib
+import json
+import re
+import sqlite3
+import yaml
+from concurrent.futures import Executor, ProcessPoolExecutor
+import perf
+from resources import ensure_nltk_data
+from tabular_io import CLEANED_DTYPES, RAW_DTYPES, read_table, table_path, write_table
 
 logs_dir = "logs"
 os.makedirs(logs_dir, exist_ok=True)
-log_file = os.path.join(logs_dir, "data_injection.log")
+log_file = os.path.join(logs_dir, "data_preprocessing.log")
 
-logger=logging.getLogger("data_injection")
+logger=logging.getLogger("data_preprocessing")
 logger.setLevel(logging.DEBUG)
 
 counsoler_handler=logging.StreamHandler()
@@ -33,44 +33,351 @@ logger.addHandler(counsoler_handler)
 logger.addHandler(file_handler)
 
 
+class SQLiteCache:
+    """
+    Small namespaced key/value store in a SQLite table, shared by the stem and cleaned-row caches."""
+
+    def __init__(self, path: str, table: str, namespace: str):
+        self.path = path
+        self.table = table
+        self.namespace = namespace
+
+    def _connect(self):
+        cache_dir = os.path.dirname(self.path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+        )
+        return conn
+
+    def load(self) -> dict:
+        """
+        Return every entry of this namespace as a dict."""
+        if not os.path.exists(self.path):
+            return {}
+        conn = self._connect()
+        try:
+            rows = conn.execute(f"SELECT key, value FROM {self.table} WHERE namespace = ?", (self.namespace,))
+            return dict(rows)
+        finally:
+            conn.close()
+
+    def get_many(self, keys: list, batch_size: int = 500) -> dict:
+        """
+        Return the entries for the given keys that are present in the cache."""
+        if not keys or not os.path.exists(self.path):
+            return {}
+        found = {}
+        conn = self._connect()
+        try:
+            for start in range(0, len(keys), batch_size):
+                batch = keys[start:start + batch_size]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, value FROM {self.table} WHERE namespace = ? AND key IN ({placeholders})",
+                    (self.namespace, *batch),
+                )
+                found.update(rows)
+            return found
+        finally:
+            conn.close()
+
+    def update(self, entries: dict) -> None:
+        """
+        Add new key -> value pairs; existing entries are left untouched."""
+        if not entries:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO {self.table} (namespace, key, value) VALUES (?, ?, ?)",
+                    ((self.namespace, key, value) for key, value in entries.items()),
+                )
+        finally:
+            conn.close()
+
+
+class StemCache(SQLiteCache):
+    """
+    Persistent token -> stem dictionary.
+    Entries are namespaced by the stemmer and the NLTK version, so an upgrade never
+    reuses stems computed by a different implementation."""
+
+    def __init__(self, path: str, stemmer):
+        super().__init__(path, "stems", self.namespace_for(stemmer))
+
+    @staticmethod
+    def namespace_for(stemmer) -> str:
+        import nltk
+        return f"{type(stemmer).__name__}-{getattr(stemmer, 'mode', 'default')}-nltk-{nltk.__version__}"
+
+
+class CleanedTextStore(SQLiteCache):
+    """
+    Sidecar store for incremental preprocessing: maps a content hash of a raw text to its
+    cleaned form. The namespace is the normalizer fingerprint, so cleaned rows are only
+    reused by a normalizer that would produce the same output."""
+
+    def __init__(self, path: str, fingerprint: str):
+        super().__init__(path, "cleaned_rows", fingerprint)
+
+    @staticmethod
+    def key_for(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# Bump whenever TextNormalizer changes its output, to invalidate stored cleaned rows
+NORMALIZER_VERSION = 1
+
+TOKENIZERS = ("nltk", "regex")
+
+# The "regex" tokenizer approximates, on lowercased text, the alphanumeric tokens of
+# nltk.word_tokenize without the Punkt and Treebank passes whose other tokens TextNormalizer
+# drops anyway. A run of letters and digits is a token when it starts and ends at a Treebank
+# split point: whitespace and the characters Treebank pads with spaces, the '' quote, "..",
+# "--", a comma or colon not followed by a digit, a sentence-final period, or a clitic
+# ('s, n't, 'll, ...). Leading apostrophes are split off unless they start a clitic.
+# It is not exact: on ordinary text the token lists agree for nearly every row, but on randomly
+# glued punctuation, contractions and quotes about 1% of rows differ (e.g. "\cannot", "i'm'").
+# benchmarks/tokenizer_equivalence.py measures the agreement on a given corpus.
+_SEPARATORS = r"\s;@#$%&?!*\[\](){}<>\"`«»“”‘’„\u2012-\u2015"
+_BOUNDARY = rf"(?:$|[{_SEPARATORS}]|''|\.\.|--|[,:](?!\d)|\.[\]\)}}>\"'»”’]*(?:\s|$))"
+_TOKEN_START = (rf"(?:^|(?<=[{_SEPARATORS}])|(?<='')|(?<=\.\.)|(?<=--)|(?<=[,:])(?!\d)"
+                r"|(?<=(?<!\w)')(?!(?:re|ve|ll|m|t|s|d|n)\b))")
+TOKEN_PATTERN = re.compile(
+    _TOKEN_START + rf"(?:[^\W_]+?(?=n't{_BOUNDARY})|[^\W_]+(?=(?:'(?:s|m|d|ll|re|ve)?)?{_BOUNDARY}))"
+)
+# Treebank's CONTRACTIONS2: "cannot" -> "can not", "gonna" -> "gon na", ...
+CONTRACTION_PATTERN = re.compile(r"\b(can(?=not\b)|gim(?=me\b)|gon(?=na\b)|got(?=ta\b)|lem(?=me\b)|wan(?=na\s))")
+
+
+def regex_tokenize(text: str) -> list:
+    """
+    Approximately the alphanumeric tokens nltk.word_tokenize finds in a lowercased text, extracted with one compiled regex."""
+    return TOKEN_PATTERN.findall(CONTRACTION_PATTERN.sub(r"\1 ", text))
+
+
+class TextNormalizer:
+    """
+    Compiled text normalizer used by transform_data.
+    The stopword set and the stemmer are built once, and stems are memoized in a bounded
+    LRU cache, so each token is lowercased, tokenized, filtered and stemmed in a single pass.
+    When a StemCache path is given, its stems are preloaded and newly computed ones are
+    collected in new_stems so they can be written back.
+    The tokenizer is "nltk" (nltk.word_tokenize) or "regex" (regex_tokenize, nearly the same tokens
+    without the Punkt and Treebank passes); see benchmarks/tokenizer_equivalence.py for how closely they agree.
+    NLTK is imported and its data verified (never downloaded) when the first normalizer is built."""
+
+    def __init__(self, language: str = "english", stem_cache_size: int = 100000, stem_cache: str = None, nltk_data_dir: str = None,
+                 tokenizer: str = "nltk"):
+        if tokenizer not in TOKENIZERS:
+            raise ValueError(f"Unknown tokenizer '{tokenizer}', expected one of {TOKENIZERS}")
+        ensure_nltk_data(nltk_data_dir)
+        import nltk
+        from nltk.corpus import stopwords
+        from nltk.stem import PorterStemmer
+
+        self.language = language
+        self.tokenizer = tokenizer
+        self.tokenize = nltk.word_tokenize if tokenizer == "nltk" else regex_tokenize
+        self.stop_words = frozenset(stopwords.words(language))
+        self.stemmer = PorterStemmer()
+        self.stem_cache = StemCache(stem_cache, self.stemmer) if stem_cache else None
+        self.known_stems = self.stem_cache.load() if self.stem_cache else {}
+        self.new_stems = {}
+        self.stem = functools.lru_cache(maxsize=stem_cache_size)(self._stem)
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Identifies everything that determines the output of this normalizer."""
+        parts = [str(NORMALIZER_VERSION), StemCache.namespace_for(self.stemmer), *sorted(self.stop_words)]
+        if self.tokenizer != "nltk":
+            # Appended only for other tokenizers, so existing row caches and bundles stay valid;
+            # the patterns are included so a change to them invalidates rows cleaned with the old ones
+            parts.extend((f"tokenizer={self.tokenizer}", TOKEN_PATTERN.pattern, CONTRACTION_PATTERN.pattern))
+        return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+    def _stem(self, token: str) -> str:
+        stem = self.known_stems.get(token)
+        if stem is None:
+            stem = self.stemmer.stem(token)
+            if self.stem_cache is not None:
+                self.new_stems[token] = stem
+        return stem
+
+    def pop_new_stems(self) -> dict:
+        """
+        Return the stems computed since the last call and reset the collection."""
+        new_stems, self.new_stems = self.new_stems, {}
+        return new_stems
+
+    def save_stem_cache(self) -> None:
+        """
+        Write the newly computed stems, including those merged in from worker processes, to the StemCache."""
+        if self.stem_cache is None:
+            return
+        new_stems = self.pop_new_stems()
+        self.stem_cache.update(new_stems)
+        self.known_stems.update(new_stems)
+        logger.debug(f"Stored {len(new_stems)} new stems in {self.stem_cache.path}")
+
+    def __call__(self, text: str) -> str:
+        stem = self.stem
+        stop_words = self.stop_words
+        # isalnum() tokens can never be punctuation, so the stopword check is the only other filter
+        return " ".join(
+            stem(token)
+            for token in self.tokenize(text.lower())
+            if token.isalnum() and token not in stop_words
+        )
+
+    def transform_many(self, texts: pd.Series) -> pd.Series:
+        """
+        Normalize a whole Series. With the regex tokenizer the lowercasing, contraction splitting and
+        token extraction run as bulk string operations over the Series, leaving only stopword removal
+        and stemming per token."""
+        if self.tokenizer == "nltk":
+            return texts.map(self)
+        stem = self.stem
+        stop_words = self.stop_words
+        tokens = texts.str.lower().str.replace(CONTRACTION_PATTERN, r"\1 ", regex=True).str.findall(TOKEN_PATTERN)
+        return tokens.map(lambda row: " ".join(stem(token) for token in row if token not in stop_words))
+
+
+_normalizer = None
+_normalizer_options = {}
+
+LABEL_CLASSES_PATH = os.path.join("cleaned_data", "label_classes.json")
+
+
+def configure_normalizer(**options) -> TextNormalizer:
+    """
+    Rebuild the process-wide TextNormalizer with the given TextNormalizer keyword options."""
+    global _normalizer, _normalizer_options
+    _normalizer_options = options
+    _normalizer = TextNormalizer(**options)
+    if _normalizer.stem_cache is not None:
+        logger.debug(f"Loaded {len(_normalizer.known_stems)} cached stems from {_normalizer.stem_cache.path}")
+    return _normalizer
+
+
+def get_normalizer() -> TextNormalizer:
+    """
+    Return the process-wide TextNormalizer, building it on first use."""
+    global _normalizer
+    if _normalizer is None:
+        _normalizer = TextNormalizer(**_normalizer_options)
+    return _normalizer
+
+
 def transform_data(text: str) -> str:
     """
     Transform a single text string by cleaning, removing stopwords, and stemming."""
-    text = text.lower()
-    text = nltk.word_tokenize(text)
-    
-    y = []
-    for i in text:
-        if i.isalnum():
-            y.append(i)
-    
-    text = y[:]
-    y.clear()
-    
-    for i in text:
-        if i not in stopwords.words('english') and i not in string.punctuation:
-            y.append(i)
-    
-    text = y[:]
-    y.clear()
-    
-    for i in text:
-        y.append(ps.stem(i))
-    
-    return " ".join(y)
+    return get_normalizer()(text)
+
+
+def _init_worker(normalizer_options: dict) -> None:
+    """
+    Process pool initializer: load the NLTK resources and build the normalizer once per worker."""
+    configure_normalizer(**normalizer_options)
+
+
+def _transform_chunk(texts: list) -> tuple:
+    """
+    Transform one chunk of texts inside a worker process.
+    Returns the transformed texts and the stems the worker had to compute for them."""
+    normalizer = get_normalizer()
+    return normalizer.transform_many(pd.Series(texts, dtype=object)).tolist(), normalizer.pop_new_stems()
+
+
+def transform_series(texts: pd.Series, executor: Executor = None, chunk_size: int = 10000, store: CleanedTextStore = None) -> pd.Series:
+    """
+    Apply transform_data to every entry of a Series.
+    When an executor is given the Series is split into chunks that are transformed in parallel,
+    and the results are reassembled in the original order with the original index.
+    When a CleanedTextStore is given only texts whose content hash is not stored yet are
+    transformed, each distinct text once, and the new results are added to the store.
+
+    Args:
+        texts (pd.Series): The raw texts.
+        executor (Executor): Optional process pool from create_executor.
+        chunk_size (int): Number of rows sent to a worker at a time.
+        store (CleanedTextStore): Optional sidecar store for incremental preprocessing.
+    Returns:
+        pd.Series: The transformed texts.
+    """
+    if store is not None:
+        keys = texts.map(CleanedTextStore.key_for)
+        unique = pd.Series(texts.values, index=keys.values)
+        unique = unique[~unique.index.duplicated()]
+        cleaned = store.get_many(unique.index.tolist())
+        missing = unique[~unique.index.isin(list(cleaned))]
+        logger.info(f"Incremental preprocessing: {len(unique) - len(missing)} of {len(unique)} distinct texts reused, {len(missing)} to transform")
+        new_cleaned = transform_series(missing, executor=executor, chunk_size=chunk_size)
+        new_entries = dict(zip(new_cleaned.index, new_cleaned.values))
+        store.update(new_entries)
+        cleaned.update(new_entries)
+        return pd.Series(keys.map(cleaned).values, index=texts.index, name=texts.name)
+
+    with perf.track("transform_data", rows=len(texts)):
+        if executor is None or len(texts) <= chunk_size:
+            return get_normalizer().transform_many(texts)
+        return _transform_in_chunks(texts, executor, chunk_size)
+
+
+def _transform_in_chunks(texts: pd.Series, executor: Executor, chunk_size: int) -> pd.Series:
+    chunks = [texts.iloc[start:start + chunk_size].tolist() for start in range(0, len(texts), chunk_size)]
+    logger.debug(f"Transforming {len(texts)} texts in {len(chunks)} chunks of up to {chunk_size} rows")
+    normalizer = get_normalizer()
+    cleaned = []
+    for chunk_cleaned, chunk_stems in executor.map(_transform_chunk, chunks):
+        cleaned.extend(chunk_cleaned)
+        normalizer.new_stems.update(chunk_stems)
+    return pd.Series(cleaned, index=texts.index, name=texts.name)
 
-def preprocess_data(df, text_column ="text", target="label") -> pd.DataFrame:
+
+def create_executor(n_jobs: int):
+    """
+    Create the process pool used by transform_series, or None for the serial path.
+
+    Args:
+        n_jobs (int): Number of worker processes. 1 runs serially, -1 uses every core.
+    """
+    if n_jobs is None or n_jobs == 1:
+        return None
+    if n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    logger.info(f"Starting process pool with {n_jobs} workers for text preprocessing")
+    return ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(_normalizer_options,))
+
+
+def preprocess_data(df, text_column ="text", target="label", executor: Executor = None, chunk_size: int = 10000, store: CleanedTextStore = None, label_encoder: "LabelEncoder" = None) -> pd.DataFrame:
 
     """
     Preprocess the DataFrame by handling missing values.
-    This funtion take three parameters, the dataframe, the text column and the target column. It will return the cleaned dataframe."""
+    This funtion take three parameters, the dataframe, the text column and the target column. It will return the cleaned dataframe.
+    An optional process pool from create_executor spreads the text transformation over chunk_size row chunks,
+    and an optional CleanedTextStore skips texts that were already cleaned by a previous run.
+    An already fitted label_encoder is reused so both splits share one label mapping; an unfitted one is fitted here."""
 
     try  :
         logger.info("starting data preprocessing")
         df_cleaned = df.dropna()
-        df_cleaned[text_column] = df_cleaned[text_column].apply(transform_data)
-        le = LabelEncoder()
-        df_cleaned[target] = le.fit_transform(df_cleaned[target])
+        df_cleaned[text_column] = transform_series(df_cleaned[text_column], executor=executor, chunk_size=chunk_size, store=store)
+        if label_encoder is None:
+            from sklearn.preprocessing import LabelEncoder
+            label_encoder = LabelEncoder()
+        if hasattr(label_encoder, "classes_"):
+            encoded = label_encoder.transform(df_cleaned[target])
+        else:
+            encoded = label_encoder.fit_transform(df_cleaned[target])
+        df_cleaned[target] = encoded.astype(CLEANED_DTYPES["label"])
         logger.debug(f"Data preprocessing completed successfully. Number of records after cleaning: {len(df_cleaned)}")
         return df_cleaned
     except KeyError as ke:
@@ -80,35 +387,98 @@ def preprocess_data(df, text_column ="text", target="label") -> pd.DataFrame:
         logger.error(f"Error during data preprocessing. Error: {e}")
         raise
 
-def main(text_column="text", target="label") -> pd.DataFrame:
+def save_cleaned_data(train_df: pd.DataFrame, test_df: pd.DataFrame, cleaned_data_dir: str = "cleaned_data", fmt: str = "csv") -> None:
+    """
+    Save the cleaned training and testing DataFrames to CSV (or Parquet) files in cleaned_data_dir.
+    """
+    try:
+        os.makedirs(cleaned_data_dir, exist_ok=True)
+        write_table(train_df, table_path(cleaned_data_dir, "train_data_cleaned", fmt))
+        write_table(test_df, table_path(cleaned_data_dir, "test_data_cleaned", fmt))
+        logger.debug(f"Cleaned training and testing data saved successfully to {cleaned_data_dir} directory.")
+    except Exception as e:
+        logger.error(f"Error saving cleaned data to {cleaned_data_dir}. Error: {e}")
+        raise
+
+def save_label_classes(label_encoder: "LabelEncoder", path: str = LABEL_CLASSES_PATH) -> None:
+    """
+    Write the label names in encoded order, so encoded predictions can be mapped back to labels.
     """
-    Docstring for main
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump([str(label) for label in label_encoder.classes_], f, indent=4)
+        logger.debug(f"Label classes saved successfully to {path}")
+    except Exception as e:
+        logger.error(f"Error saving label classes to {path}. Error: {e}")
+        raise
+
+@perf.stage("data_preprocessing")
+def main(text_column="text", target="label", params: dict = None, train_df: pd.DataFrame = None, test_df: pd.DataFrame = None, write: bool = True,
+         writer=None):
+    """
+    Run the data preprocessing stage.
     
-    :param text_column: Description
+    :param text_column: Name of the text column
     :type text_column: str
-    :param target: Description
+    :param target: Name of the label column
     :type target: str
-    :return: Description
-    :rtype: DataFrame
+    :param params: Parsed params.yaml; read from disk when not given
+    :type params: dict
+    :param train_df: Raw training data; read from raw_data/ when not given
+    :type train_df: DataFrame
+    :param test_df: Raw testing data; read from raw_data/ when not given
+    :type test_df: DataFrame
+    :param write: Write cleaned_data/. The in-process pipeline runner may defer this.
+    :type write: bool
+    :param writer: With write False, the ArtifactWriter of the in-process runner, which writes the label
+        mapping (cleaned_data/label_classes.json); without one nothing is written
+    :return: The cleaned training and testing DataFrames
+    :rtype: tuple
     """
 
     try:
+        # Load parameters
+        if params is None:
+            with open('params.yaml', 'r') as f:
+                params = yaml.safe_load(f)
+
+        preprocessing_params = params.get('data_preprocessing', {})
+        n_jobs = preprocessing_params.get('n_jobs', 1)
+        chunk_size = preprocessing_params.get('chunk_size', 10000)
+        normalizer = configure_normalizer(stem_cache=preprocessing_params.get('stem_cache'),
+                                          nltk_data_dir=params.get('resources', {}).get('nltk_data_dir'),
+                                          tokenizer=preprocessing_params.get('tokenizer', 'nltk'))
+        row_cache = preprocessing_params.get('row_cache')
+        store = CleanedTextStore(row_cache, normalizer.fingerprint) if row_cache else None
+        fmt = params.get('storage', {}).get('format', 'csv')
+
         logger.info("Starting main function for data preprocessing")
-        train_df=pd.read_csv("raw_data/train_data.csv")
-        test_df=pd.read_csv("raw_data/test_data.csv")
+        if train_df is None or test_df is None:
+            train_df=read_table(table_path("raw_data", "train_data", fmt), dtypes=RAW_DTYPES)
+            test_df=read_table(table_path("raw_data", "test_data", fmt), dtypes=RAW_DTYPES)
         logger.debug(f"Data loaded successfully. Train records: {len(train_df)}, Test records: {len(test_df)}")
 
         logger.info("Preprocessing training data")
-        train_df_cleaned = preprocess_data(train_df, text_column, target)
-        test_df_cleaned = preprocess_data(test_df, text_column, target)
+        executor = create_executor(n_jobs)
+        from sklearn.preprocessing import LabelEncoder
+        label_encoder = LabelEncoder()
+        try:
+            train_df_cleaned = preprocess_data(train_df, text_column, target, executor=executor, chunk_size=chunk_size, store=store, label_encoder=label_encoder)
+            test_df_cleaned = preprocess_data(test_df, text_column, target, executor=executor, chunk_size=chunk_size, store=store, label_encoder=label_encoder)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        normalizer.save_stem_cache()
         logger.debug(f"Data preprocessing completed for training and testing data. Train records after cleaning: {len(train_df_cleaned)}, Test records after cleaning: {len(test_df_cleaned)}")
 
-        #store the cleaned data
-        cleaned_data_dir = "cleaned_data"
-        os.makedirs(cleaned_data_dir, exist_ok=True)
-        train_df_cleaned.to_csv(os.path.join(cleaned_data_dir, "train_data_cleaned.csv"), index=False)
-        test_df_cleaned.to_csv(os.path.join(cleaned_data_dir, "test_data_cleaned.csv"), index=False)
-        logger.debug(f"Cleaned training and testing data saved successfully to {cleaned_data_dir} directory.")  
+        #store the label mapping and the cleaned data
+        if write:
+            save_label_classes(label_encoder)
+            save_cleaned_data(train_df_cleaned, test_df_cleaned, fmt=fmt)
+        elif writer is not None:
+            writer.write(save_label_classes, label_encoder)
+        return train_df_cleaned, test_df_cleaned
 
     except Exception as e:
         logger.error(f"Error in main function for data preprocessing. Error: {e}")
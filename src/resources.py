@@ -0,0 +1,107 @@
+import argparse
+import logging
+import os
+
+logs_dir = "logs"
+os.makedirs(logs_dir, exist_ok=True)
+log_file = os.path.join(logs_dir, "resources.log")
+logger = logging.getLogger("resources")
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.INFO)
+
+file_handler = logging.FileHandler(log_file)
+file_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+logger.addHandler(file_handler)
+
+# Each resource is satisfied by any one of its locations: newer NLTK releases tokenize with
+# punkt_tab, older ones with the pickled punkt model.
+NLTK_RESOURCES = {
+    "stopwords": ("corpora/stopwords",),
+    "punkt": ("tokenizers/punkt_tab/english/", "tokenizers/punkt/english.pickle"),
+}
+NLTK_PACKAGES = ("stopwords", "punkt_tab", "punkt")
+
+_verified_dirs = set()
+
+
+def ensure_nltk_data(data_dir: str = None) -> None:
+    """
+    Make sure the NLTK data used by pre_processing is available, without touching the network.
+    When data_dir is given it becomes the only NLTK search location (a pinned, local copy);
+    otherwise NLTK's default search path is used. The check runs once per process and directory.
+
+    Args:
+        data_dir (str): Optional pinned NLTK data directory.
+    Raises:
+        LookupError: If a resource is missing, with instructions on how to provision it.
+    """
+    key = os.path.abspath(data_dir) if data_dir else None
+    if key in _verified_dirs:
+        return
+
+    import nltk
+
+    if key is not None:
+        nltk.data.path[:] = [key]
+
+    missing = []
+    for name, locations in NLTK_RESOURCES.items():
+        for location in locations:
+            try:
+                nltk.data.find(location)
+                break
+            except LookupError:
+                continue
+        else:
+            missing.append(name)
+
+    if missing:
+        searched = key or ", ".join(nltk.data.path)
+        message = (
+            f"Missing NLTK data: {', '.join(missing)} (searched: {searched}). "
+            f"Provision it on a machine with network access with "
+            f"`python src/resources.py --download --dir {data_dir or 'nltk_data'}` and copy the directory "
+            f"to the build node, or set resources.nltk_data_dir in params.yaml to an existing copy."
+        )
+        logger.error(message)
+        raise LookupError(message)
+
+    _verified_dirs.add(key)
+    logger.debug(f"NLTK data verified in {key or 'the default NLTK search path'}")
+
+
+def download_nltk_data(data_dir: str) -> None:
+    """
+    Download the pinned NLTK packages into data_dir. This is the only place that uses the network.
+    """
+    import nltk
+
+    os.makedirs(data_dir, exist_ok=True)
+    for package in NLTK_PACKAGES:
+        logger.info(f"Downloading NLTK package {package} to {data_dir}")
+        if not nltk.download(package, download_dir=data_dir, quiet=True):
+            raise RuntimeError(f"Failed to download NLTK package {package} to {data_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision or verify the NLTK data used by the pipeline.")
+    parser.add_argument("--dir", default="nltk_data", help="NLTK data directory (default: nltk_data)")
+    parser.add_argument("--download", action="store_true", help="Download the packages before verifying")
+    args = parser.parse_args()
+
+    if args.download:
+        download_nltk_data(args.dir)
+    ensure_nltk_data(args.dir)
+    logger.info(f"NLTK data in {args.dir} is complete")
+
+
+if __name__ == "__main__":
+    main()
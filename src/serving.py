@@ -0,0 +1,356 @@
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import yaml
+
+logs_dir = "logs"
+os.makedirs(logs_dir, exist_ok=True)
+log_file = os.path.join(logs_dir, "serving.log")
+logger = logging.getLogger("serving")
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.INFO)
+
+file_handler = logging.FileHandler(log_file)
+file_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+logger.addHandler(file_handler)
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with the count and sum of the observations.
+    """
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-quantile (an over-estimate by at most one bucket).
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class ServerMetrics:
+    """
+    Latency histograms and throughput counters exposed on GET /metrics.
+    """
+
+    def __init__(self, max_batch_size: int):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.errors = 0
+        self.request_latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.queue_wait_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.batch_latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.batch_size = Histogram(tuple(2 ** i for i in range(max_batch_size.bit_length() + 1)))
+
+    def to_dict(self) -> dict:
+        uptime = time.monotonic() - self.started
+        return {
+            "uptime_s": uptime,
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "errors": self.errors,
+            "requests_per_s": self.requests / uptime if uptime else 0.0,
+            "texts_per_s": self.texts / uptime if uptime else 0.0,
+            "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "request_latency_ms": self.request_latency_ms.to_dict(),
+            "queue_wait_ms": self.queue_wait_ms.to_dict(),
+            "batch_latency_ms": self.batch_latency_ms.to_dict(),
+            "batch_size": self.batch_size.to_dict(),
+        }
+
+
+class MicroBatcher:
+    """
+    Collects texts from concurrent requests into batches of at most max_batch_size, waiting at most
+    max_wait_ms after the first text of a batch arrives. Each batch is scored with one vectorized
+    transform and one predict_proba call on a worker thread, so the event loop keeps accepting requests.
+    """
+
+    def __init__(self, bundle, max_batch_size: int = 64, max_wait_ms: float = 5.0, metrics: ServerMetrics = None):
+        self.bundle = bundle
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.metrics = metrics or ServerMetrics(max_batch_size)
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self._task = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown()
+
+    async def predict(self, text: str) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, time.perf_counter(), future))
+        return await future
+
+    def _score(self, texts: list) -> list:
+        probabilities = self.bundle.predict_proba_texts(texts)
+        labels = self.bundle.proba_classes.tolist()
+        best = probabilities.argmax(axis=1)
+        return [
+            {"label": labels[index], "probabilities": dict(zip(labels, row.tolist()))}
+            for index, row in zip(best, probabilities)
+        ]
+
+    async def _collect(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Whatever is already queued joins the batch without further waiting
+        while len(batch) < self.max_batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            start = time.perf_counter()
+            for _, enqueued, _ in batch:
+                self.metrics.queue_wait_ms.observe((start - enqueued) * 1000.0)
+            try:
+                results = await loop.run_in_executor(self.executor, self._score, [text for text, _, _ in batch])
+            except Exception as e:
+                logger.error(f"Error scoring a batch of {len(batch)} texts. Error: {e}")
+                self.metrics.errors += 1
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.metrics.batches += 1
+            self.metrics.texts += len(batch)
+            self.metrics.batch_size.observe(len(batch))
+            self.metrics.batch_latency_ms.observe((time.perf_counter() - start) * 1000.0)
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class PredictionServer:
+    """
+    Minimal HTTP/1.1 server (keep-alive, JSON bodies) on top of asyncio streams.
+
+    POST /predict  {"text": "..."} or {"texts": ["...", ...]}
+    GET  /metrics  latency histograms and throughput counters
+    GET  /health
+    """
+
+    def __init__(self, batcher: MicroBatcher):
+        self.batcher = batcher
+        self.metrics = batcher.metrics
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_BYTES:
+            raise ValueError(f"Request body of {length} bytes exceeds {MAX_BODY_BYTES}")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    @staticmethod
+    def _response(status: str, payload: dict, keep_alive: bool) -> bytes:
+        body = json.dumps(payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode("latin-1") + body
+
+    @staticmethod
+    def _parse(body: bytes):
+        """
+        The text (str) or texts (list) of a /predict body; ValueError for a body the client got wrong.
+        """
+        try:
+            payload = json.loads(body or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ValueError(f"Invalid JSON body: {e}")
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object with 'text' or 'texts'")
+        if "texts" in payload:
+            texts = payload["texts"]
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError("'texts' must be a list of strings")
+            return texts
+        if isinstance(payload.get("text"), str):
+            return payload["text"]
+        raise ValueError("Expected a JSON body with 'text' or 'texts'")
+
+    async def _predict(self, texts) -> dict:
+        if isinstance(texts, list):
+            return {"predictions": list(await asyncio.gather(*(self.batcher.predict(text) for text in texts)))}
+        return await self.batcher.predict(texts)
+
+    async def _route(self, method: str, path: str, body: bytes) -> tuple:
+        if method == "POST" and path == "/predict":
+            start = time.perf_counter()
+            try:
+                texts = self._parse(body)
+            except ValueError as e:
+                self.metrics.errors += 1
+                return "400 Bad Request", {"error": str(e)}
+            # Scoring failures are the server's, so they propagate to handle() and become a 500
+            result = await self._predict(texts)
+            self.metrics.requests += 1
+            self.metrics.request_latency_ms.observe((time.perf_counter() - start) * 1000.0)
+            return "200 OK", result
+        if method == "GET" and path == "/metrics":
+            return "200 OK", self.metrics.to_dict()
+        if method == "GET" and path == "/health":
+            return "200 OK", {"status": "ok"}
+        return "404 Not Found", {"error": f"No route for {method} {path}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError) as e:
+                    writer.write(self._response("400 Bad Request", {"error": str(e)}, keep_alive=False))
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "keep-alive").lower() != "close"
+                try:
+                    status, payload = await self._route(method, path, body)
+                except Exception as e:
+                    logger.error(f"Error handling {method} {path}. Error: {e}")
+                    status, payload = "500 Internal Server Error", {"error": str(e)}
+                writer.write(self._response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(bundle, host: str = "127.0.0.1", port: int = 8080, max_batch_size: int = 64, max_wait_ms: float = 5.0) -> None:
+    """
+    Serve predictions from an inference bundle until cancelled.
+
+    Args:
+        bundle (InferenceBundle): The loaded bundle.
+        host (str): Interface to bind.
+        port (int): Port to bind.
+        max_batch_size (int): Largest number of texts scored in one batch.
+        max_wait_ms (float): Longest time the first text of a batch waits for others.
+    """
+    batcher = MicroBatcher(bundle, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    batcher.start()
+    server = await asyncio.start_server(PredictionServer(batcher).handle, host, port)
+    logger.info(f"Serving predictions on http://{host}:{port} (max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the inference bundle over HTTP with micro-batching.")
+    parser.add_argument("--params", default="params.yaml", help="Path to params.yaml")
+    parser.add_argument("--host", help="Override serving.host")
+    parser.add_argument("--port", type=int, help="Override serving.port")
+    parser.add_argument("--max-batch-size", type=int, help="Override serving.max_batch_size")
+    parser.add_argument("--max-wait-ms", type=float, help="Override serving.max_wait_ms")
+    args = parser.parse_args()
+
+    with open(args.params, 'r') as f:
+        params = yaml.safe_load(f)
+    serving_params = params.get('serving', {})
+    host = args.host or serving_params.get('host', "127.0.0.1")
+    port = args.port or serving_params.get('port', 8080)
+    max_batch_size = args.max_batch_size or serving_params.get('max_batch_size', 64)
+    max_wait_ms = args.max_wait_ms if args.max_wait_ms is not None else serving_params.get('max_wait_ms', 5.0)
+
+    from inference import BUNDLE_DIR, load_bundle
+
+    bundle = load_bundle(serving_params.get('bundle_dir', BUNDLE_DIR),
+                         nltk_data_dir=params.get('resources', {}).get('nltk_data_dir'))
+    try:
+        asyncio.run(serve(bundle, host, port, max_batch_size, max_wait_ms))
+    except KeyboardInterrupt:
+        logger.info("Prediction server stopped")
+
+
+if __name__ == "__main__":
+    main()
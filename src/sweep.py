@@ -0,0 +1,215 @@
+import argparse
+import copy
+import hashlib
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import yaml
+
+from feature_store import load_features, open_shared_matrix, save_shared_matrix
+from tabular_io import CLEANED_DTYPES, read_table, table_path
+
+logs_dir = "logs"
+os.makedirs(logs_dir, exist_ok=True)
+log_file = os.path.join(logs_dir, "sweep.log")
+logger = logging.getLogger("sweep")
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.INFO)
+
+file_handler = logging.FileHandler(log_file)
+file_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+logger.addHandler(file_handler)
+
+SEARCH_SECTIONS = ("feature_engineering", "model_training")
+
+
+def expand_space(space: dict, method: str = "grid", n_trials: int = None, random_state: int = None) -> list:
+    """
+    Turn a search space {"section.key": [values]} into a list of trials, each a {"section.key": value} dict.
+    "grid" returns every combination; "random" samples n_trials distinct combinations.
+    """
+    for name in space:
+        if name.split(".", 1)[0] not in SEARCH_SECTIONS or "." not in name:
+            raise ValueError(f"Search space key '{name}' must be '<section>.<param>' with section in {SEARCH_SECTIONS}")
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    if method == "grid":
+        return grid
+    if method == "random":
+        rng = random.Random(random_state)
+        return rng.sample(grid, min(n_trials or len(grid), len(grid)))
+    raise ValueError(f"Unknown sweep method '{method}', expected 'grid' or 'random'")
+
+
+def trial_params(params: dict, overrides: dict) -> dict:
+    """
+    params.yaml with one trial's overrides applied.
+    """
+    merged = copy.deepcopy(params)
+    for name, value in overrides.items():
+        section, key = name.split(".", 1)
+        merged[section][key] = value
+    return merged
+
+
+def feature_key(feature_params: dict, data_fingerprint: str) -> str:
+    payload = json.dumps({"params": feature_params, "data": data_fingerprint}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def frame_fingerprint(*frames: pd.DataFrame) -> str:
+    digest = hashlib.sha1()
+    for frame in frames:
+        digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def build_features(train_df: pd.DataFrame, test_df: pd.DataFrame, feature_params: dict, feature_dir: str) -> None:
+    """
+    Vectorize the cleaned data for one feature configuration and store the matrices for the trainers:
+    the training matrix in CSC layout (what tree fitting converts to) and the test matrix in CSR.
+    """
+    import numpy as np
+    import feature_engineering
+
+    text_column = feature_params['text_column']
+    if feature_params.get('vectorizer', 'tfidf') == 'hashing':
+        with tempfile.TemporaryDirectory() as shard_dir:
+            feature_engineering.apply_hashing_vectorization(train_df, test_df, text_column=text_column,
+                                                            n_features=feature_params['n_features'],
+                                                            chunk_size=feature_params['chunk_size'],
+                                                            output_dir=shard_dir)
+            x_train, y_train = load_features(os.path.join(shard_dir, "x_train_tfidf"), os.path.join(shard_dir, "y_train"))
+            x_test, y_test = load_features(os.path.join(shard_dir, "x_test_tfidf"), os.path.join(shard_dir, "y_test"))
+    else:
+        x_train, x_test, y_train, y_test = feature_engineering.apply_tfidf_vectorization(
+            train_df, test_df, text_column=text_column, max_features=feature_params['max_features'])
+
+    tmp_dir = feature_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    save_shared_matrix(x_train, tmp_dir, "x_train", layout="csc")
+    save_shared_matrix(x_test, tmp_dir, "x_test", layout="csr")
+    np.save(os.path.join(tmp_dir, "y_train.npy"), np.asarray(y_train))
+    np.save(os.path.join(tmp_dir, "y_test.npy"), np.asarray(y_test))
+    os.replace(tmp_dir, feature_dir)
+
+
+def run_trial(trial_id: int, feature_dir: str, model_params: dict, average: str) -> dict:
+    """
+    Train and evaluate one trial in a worker process on the memory-mapped features.
+    """
+    import numpy as np
+    import model
+    import model_eval
+
+    start = time.perf_counter()
+    x_train = open_shared_matrix(feature_dir, "x_train")
+    x_test = open_shared_matrix(feature_dir, "x_test")
+    y_train = np.load(os.path.join(feature_dir, "y_train.npy"), mmap_mode="r")
+    y_test = np.load(os.path.join(feature_dir, "y_test.npy"), mmap_mode="r")
+    # Trials already run in parallel, so every trainer builds its trees on one core
+    trained = model.train_model(x_train, y_train, model_params, n_jobs=1)
+    train_seconds = time.perf_counter() - start
+    metrics = model_eval.evaluate_model(trained, x_test, y_test, average=average)
+    metrics["train_seconds"] = train_seconds
+    return {"trial": trial_id, "metrics": metrics}
+
+
+def run_sweep(params: dict) -> list:
+    """
+    Run the search space in params['sweep'] and return the trial results, best accuracy first.
+
+    Every distinct feature configuration is vectorized once into sweep.work_dir and memory-mapped
+    read-only by a process pool of trainers; each trial is logged to its own dvclive run.
+    """
+    try:
+        from dvclive import Live
+        import model_eval
+
+        sweep_params = params['sweep']
+        work_dir = sweep_params.get('work_dir', "cache/sweep")
+        n_jobs = sweep_params.get('n_jobs', -1)
+        if n_jobs is None or n_jobs < 0:
+            n_jobs = os.cpu_count() or 1
+        trials = expand_space(sweep_params['space'], sweep_params.get('method', 'grid'),
+                              sweep_params.get('n_trials'), sweep_params.get('random_state'))
+        logger.info(f"Starting sweep with {len(trials)} trials on {n_jobs} workers")
+
+        fmt = params.get('storage', {}).get('format', 'csv')
+        text_column = params['feature_engineering']['text_column']
+        columns = [text_column, "label"]
+        train_df = read_table(table_path("cleaned_data", "train_data_cleaned", fmt), columns=columns, dtypes=CLEANED_DTYPES)
+        test_df = read_table(table_path("cleaned_data", "test_data_cleaned", fmt), columns=columns, dtypes=CLEANED_DTYPES)
+        data_fingerprint = frame_fingerprint(train_df, test_df)
+
+        tasks = []
+        for trial_id, overrides in enumerate(trials):
+            merged = trial_params(params, overrides)
+            feature_dir = os.path.join(work_dir, "features", feature_key(merged['feature_engineering'], data_fingerprint))
+            if not os.path.isdir(feature_dir):
+                logger.info(f"Vectorizing feature configuration for trial {trial_id} into {feature_dir}")
+                os.makedirs(os.path.dirname(feature_dir), exist_ok=True)
+                build_features(train_df, test_df, merged['feature_engineering'], feature_dir)
+            tasks.append((trial_id, overrides, merged, feature_dir, merged['model_training']))
+        logger.info(f"{len({task[3] for task in tasks})} distinct feature configurations for {len(tasks)} trials")
+
+        results = []
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = {
+                executor.submit(run_trial, trial_id, feature_dir, model_params, merged['model_evaluation']['average']):
+                    (trial_id, overrides, merged)
+                for trial_id, overrides, merged, feature_dir, model_params in tasks
+            }
+            for future in as_completed(futures):
+                trial_id, overrides, merged = futures[future]
+                metrics = future.result()["metrics"]
+                with Live(dir=os.path.join(work_dir, "dvclive", f"trial-{trial_id:03d}"),
+                          save_dvc_exp=False, dvcyaml=False) as live:
+                    model_eval.log_to_live(live, metrics, merged['model_training'], merged['feature_engineering'])
+                    live.log_metric("train_seconds", metrics["train_seconds"])
+                logger.info(f"Trial {trial_id} {overrides}: accuracy {metrics['accuracy']:.4f} "
+                            f"({metrics['train_seconds']:.1f}s)")
+                metrics.pop("classification_report", None)
+                results.append({"trial": trial_id, "params": overrides, "metrics": metrics})
+
+        results.sort(key=lambda result: result["metrics"]["accuracy"], reverse=True)
+        return results
+    except Exception as e:
+        logger.error(f"Error during the sweep. Error: {e}")
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the hyperparameter sweep defined in params.yaml.")
+    parser.add_argument("--params", default="params.yaml", help="Path to params.yaml")
+    parser.add_argument("--output", default="metrics/sweep_results.json", help="Where to write the trial results")
+    args = parser.parse_args()
+
+    with open(args.params, 'r') as f:
+        params = yaml.safe_load(f)
+    results = run_sweep(params)
+
+    import model_eval
+    model_eval.save_metrics_to_json({"best": results[0] if results else None, "trials": results}, args.output)
+    if results:
+        logger.info(f"Best trial {results[0]['trial']}: {results[0]['params']} "
+                    f"accuracy {results[0]['metrics']['accuracy']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
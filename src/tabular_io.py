@@ -0,0 +1,114 @@
+import os
+import pandas as pd
+
+import perf
+
+FORMATS = {"csv": ".csv", "parquet": ".parquet"}
+
+# Explicit schemas of the text intermediates, so nothing is re-inferred on load
+RAW_DTYPES = {"text": "string", "label": "category"}
+CLEANED_DTYPES = {"text": "string", "label": "int32"}
+
+
+def table_path(directory: str, stem: str, fmt: str = "csv") -> str:
+    """
+    Return directory/stem with the file extension of the given storage format.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown storage format '{fmt}', expected one of {sorted(FORMATS)}")
+    return os.path.join(directory, stem + FORMATS[fmt])
+
+
+def _format_of(path: str) -> str:
+    for fmt, suffix in FORMATS.items():
+        if path.endswith(suffix):
+            return fmt
+    raise ValueError(f"Cannot tell the storage format of {path}")
+
+
+def _apply_dtypes(df: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    if not dtypes:
+        return df
+    present = {column: dtype for column, dtype in dtypes.items() if column in df.columns}
+    return df.astype(present) if present else df
+
+
+@perf.timed(rows="df")
+def write_table(df: pd.DataFrame, path: str, compression: str = "zstd") -> None:
+    """
+    Write a DataFrame as CSV or Parquet depending on the path's extension.
+    """
+    if _format_of(path) == "parquet":
+        df.to_parquet(path, index=False, compression=compression)
+    else:
+        df.to_csv(path, index=False)
+
+
+@perf.timed(rows=len)
+def read_table(path: str, columns: list = None, dtypes: dict = None) -> pd.DataFrame:
+    """
+    Read a CSV or Parquet table with explicit dtypes, loading only the requested columns.
+    """
+    if _format_of(path) == "parquet":
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        usecols = columns
+        csv_dtypes = {column: dtype for column, dtype in (dtypes or {}).items() if columns is None or column in columns}
+        df = pd.read_csv(path, usecols=usecols, dtype=csv_dtypes or None)
+    return _apply_dtypes(df, dtypes)
+
+
+def iter_table(path: str, columns: list = None, chunk_size: int = 50000, dtypes: dict = None):
+    """
+    Yield chunk_size row chunks of a CSV or Parquet table.
+    """
+    if _format_of(path) == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield _apply_dtypes(batch.to_pandas(), dtypes)
+    else:
+        csv_dtypes = {column: dtype for column, dtype in (dtypes or {}).items() if columns is None or column in columns}
+        for chunk in pd.read_csv(path, usecols=columns, dtype=csv_dtypes or None, chunksize=chunk_size):
+            yield _apply_dtypes(chunk, dtypes)
+
+
+class TableAppender:
+    """
+    Append DataFrame chunks to a CSV or Parquet file, for writers that never hold the whole table.
+    Parquet chunks are cast to the schema of the first chunk so they form one file.
+    """
+
+    def __init__(self, path: str, compression: str = "zstd"):
+        self.path = path
+        self.format = _format_of(path)
+        self.compression = compression
+        self._writer = None
+        self._started = False
+
+    def append(self, df: pd.DataFrame) -> None:
+        if self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._writer is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self._writer = pq.ParquetWriter(self.path, table.schema, compression=self.compression)
+            else:
+                table = pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="a" if self._started else "w", header=not self._started, index=False)
+        self._started = True
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,47 @@
+"""
+Regression test: a hash split must assign every row independently of the other rows and of their order.
+"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "benchmarks"))
+
+
+@pytest.fixture(scope="module")
+def data_injection(tmp_path_factory):
+    # The pipeline modules create logs/ in the working directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("work"))
+    try:
+        import data_injection
+        yield data_injection
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    from synthetic_corpus import generate_corpus
+    return generate_corpus(3000, seed=0)
+
+
+def _test_texts(data_injection, df: pd.DataFrame, random_state: int = 42) -> set:
+    return set(df["text"][data_injection.hash_split(df, ["text"], 0.2, random_state)])
+
+
+def test_rows_keep_their_split_when_rows_are_appended_and_shuffled(data_injection, corpus):
+    original = corpus.iloc[:2000]
+    grown = corpus.sample(frac=1.0, random_state=1)
+    before = _test_texts(data_injection, original)
+    after = _test_texts(data_injection, grown)
+    assert after & set(original["text"]) == before
+    assert 0.15 < len(after) / grown["text"].nunique() < 0.25
+
+
+def test_random_state_salts_the_split(data_injection, corpus):
+    assert _test_texts(data_injection, corpus, 1) != _test_texts(data_injection, corpus, 2)
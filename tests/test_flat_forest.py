@@ -0,0 +1,43 @@
+"""
+Regression test: the flattened forest must predict exactly like the sklearn forest it was exported from.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+
+from flat_forest import FlatForest  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def forest_and_data():
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.RandomState(0)
+    # Sparse TF-IDF-like features with three classes, as the pipeline trains on
+    X = sparse.random(600, 40, density=0.2, format="csr", random_state=rng, dtype=np.float64)
+    y = np.asarray(X[:, :3].argmax(axis=1)).ravel()
+    y[rng.rand(len(y)) < 0.1] = rng.randint(0, 3)
+    forest = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(X[:400], y[:400])
+    return forest, X[400:]
+
+
+def test_predict_proba_matches_sklearn(forest_and_data):
+    forest, X = forest_and_data
+    flat = FlatForest.from_sklearn(forest)
+    assert np.array_equal(flat.predict_proba(X), forest.predict_proba(X))
+    assert np.array_equal(flat.predict_proba(X.toarray()), forest.predict_proba(X))
+    assert np.array_equal(flat.predict(X), forest.predict(X))
+
+
+def test_memory_mapped_forest_matches_sklearn(forest_and_data, tmp_path):
+    forest, X = forest_and_data
+    FlatForest.from_sklearn(forest).save(str(tmp_path))
+    flat = FlatForest.load(str(tmp_path))
+    assert np.array_equal(flat.predict_proba(X), forest.predict_proba(X))
+    assert np.array_equal(flat.predict_proba(X[:1]), forest.predict_proba(X[:1]))
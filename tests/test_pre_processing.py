@@ -0,0 +1,111 @@
+"""
+Regression test: the compiled TextNormalizer must clean text exactly like the original per-row transform_data.
+"""
+import os
+import string
+import sys
+
+import pandas as pd
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "benchmarks"))
+
+SAMPLE = [
+    "I LOVED this product!!! Would buy again :)",
+    "It's not what I expected... can't recommend it, won't return either.",
+    "Delivery took 3 weeks; the box (and the item) arrived damaged.",
+    "\"Great\" support -- they said 'we'll call back' and never did.",
+    "e-mail me at someone@example.com or visit https://example.com/page?id=1",
+    "Running runners ran; easily, fairly, happily generalized.",
+    "Price: $19.99 (was $25), 20% off -- #deal @store",
+    "Café naïve résumé – déjà vu… 😀 ok",
+    "i'd've thought y'all'd know better, ma'am.",
+    "   ",
+    "",
+    "and the of to it is",
+    "Mr. Smith went to Washington. He arrived at 5 p.m. on Jan. 3rd.",
+    "well...it was ''amazing'' honestly",
+    "tab\tseparated\nnew line\r\nwindows",
+]
+
+
+def baseline_transform(text: str) -> str:
+    """
+    The original per-row transform_data, before the compiled normalizer.
+    """
+    import nltk
+    from nltk.corpus import stopwords
+    from nltk.stem import PorterStemmer
+
+    ps = PorterStemmer()
+    stop_words = stopwords.words('english')
+    text = nltk.word_tokenize(text.lower())
+    text = [i for i in text if i.isalnum()]
+    text = [i for i in text if i not in stop_words and i not in string.punctuation]
+    return " ".join(ps.stem(i) for i in text)
+
+
+@pytest.fixture(scope="module")
+def pre_processing(tmp_path_factory):
+    # The pipeline modules create logs/ in the working directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("work"))
+    try:
+        import pre_processing
+        yield pre_processing
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    from synthetic_corpus import generate_corpus
+    return SAMPLE + generate_corpus(2000, seed=0)["text"].tolist()
+
+
+def test_normalizer_matches_baseline(pre_processing, corpus):
+    normalizer = pre_processing.TextNormalizer()
+    mismatches = [(text, normalizer(text), baseline_transform(text)) for text in corpus
+                  if normalizer(text) != baseline_transform(text)]
+    assert mismatches == []
+
+
+def test_transform_data_and_transform_many_match_baseline(pre_processing, corpus):
+    expected = [baseline_transform(text) for text in corpus]
+    assert [pre_processing.transform_data(text) for text in corpus] == expected
+    assert pre_processing.TextNormalizer().transform_many(pd.Series(corpus, dtype=object)).tolist() == expected
+
+
+@pytest.fixture(scope="module")
+def frame(corpus):
+    labels = ["negative", "neutral", "positive"]
+    df = pd.DataFrame({"text": corpus, "label": [labels[i % 3] for i in range(len(corpus))]})
+    # A shuffled index checks that the chunks are put back in the original order and index
+    return df.sample(frac=1.0, random_state=0)
+
+
+def test_parallel_preprocessing_matches_serial(pre_processing, frame):
+    serial = pre_processing.preprocess_data(frame.copy())
+    executor = pre_processing.create_executor(2)
+    try:
+        parallel = pre_processing.preprocess_data(frame.copy(), executor=executor, chunk_size=97)
+        texts = pre_processing.transform_series(frame["text"], executor=executor, chunk_size=97)
+    finally:
+        executor.shutdown()
+    pd.testing.assert_frame_equal(parallel, serial)
+    pd.testing.assert_series_equal(texts, pre_processing.transform_series(frame["text"]))
+
+
+def test_incremental_preprocessing_matches_full_run(pre_processing, frame, tmp_path):
+    store = pre_processing.CleanedTextStore(str(tmp_path / "cleaned_rows.sqlite"),
+                                            pre_processing.get_normalizer().fingerprint)
+    first, appended = frame.iloc[:1000], frame.iloc[1000:]
+    pre_processing.preprocess_data(first.copy(), store=store)
+    assert len(store.load()) == first["text"].nunique()
+
+    grown = pd.concat([first, appended])
+    incremental = pre_processing.preprocess_data(grown.copy(), store=store)
+    pd.testing.assert_frame_equal(incremental, pre_processing.preprocess_data(grown.copy()))
+    assert len(store.load()) == grown["text"].nunique()